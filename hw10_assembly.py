@@ -0,0 +1,227 @@
+# sparse (vectorized) assembly of ProductionModel
+
+
+import numpy as np
+import scipy.sparse as sp
+from ortools.linear_solver.python import model_builder_helper as mbh
+
+from hw10_data_conversion import OpKind
+
+
+def assemble(model):
+   """
+       Builds the variables, constraints and objective of a ProductionModel as
+       arrays and loads them into model.solver in one go (pywraplp
+       LoadModelFromProto). Gives the same model as _add_variables/
+       _add_constraints/_set_objective, with the same order and names, and
+       fills model.Scrap/Stock/z/BinOp and model.constraints with the handles.
+       The BOR/BOP structure comes from model.optable (ids in the same order as
+       the RESOURCE/OPERATIONS sets), names are only used for the edges.
+       :param model: ProductionModel after _index_ops (and _tighten_big_m)
+       """
+   solver, TIME, table = model.solver, model.TIME, model.optable
+   inf = solver.infinity()
+   T = len(TIME)
+   RES, MAT, OPS = table.resources, list(model.MATERIAL), table.ops
+   nR, nM, nO = len(RES), len(MAT), len(OPS)
+   r_idx, o_idx = table.res_id, table.op_id
+   tt = np.arange(T)
+
+
+   # Columns: Scrap[t, r], Stock[t, m], then z[t, op] (and BinOp[t, op] right
+   # after it for min-buy ops), period by period, -1 where there is no variable
+   scrap_col = np.arange(T * nR).reshape(T, nR)
+   stock_col = T * nR + np.arange(T * nM).reshape(T, nM)
+   alive = np.ones((T, nO), dtype=bool)
+   for (t, op) in model.dead:
+       if op in o_idx:
+           alive[model.t_pos[t], o_idx[op]] = False
+   has_min = np.array([op in model.HAS_MIN_OPS for op in OPS], dtype=bool)
+   width = (alive * (1 + has_min)).ravel()
+   start = T * (nR + nM) + np.cumsum(width) - width
+   z_col = np.where(alive.ravel(), start, -1).reshape(T, nO)
+   bin_col = np.where((alive & has_min).ravel(), start + 1, -1).reshape(T, nO)
+   n_vars = T * (nR + nM) + int(width.sum())
+
+
+   # Variable bounds, integrality and names
+   binary = table.is_binary
+   z_ub = np.full((T, nO), inf)
+   for (t, op), b in model.op_ub.items():
+       if op in o_idx:
+           z_ub[model.t_pos[t], o_idx[op]] = b
+   for j in np.flatnonzero(table.kind == OpKind.BUY):
+       if OPS[j].startswith(('Buy_JaneyTime', 'Buy_DougTime')):
+           z_ub[:, j] = np.minimum(z_ub[:, j], [model._z_ub(t, OPS[j]) for t in TIME])
+   z_ub[:, binary] = 1
+
+
+   lb = np.zeros(n_vars)
+   ub = np.full(n_vars, inf)
+   is_int = np.zeros(n_vars, dtype=bool)
+   ub[z_col[alive]] = z_ub[alive]
+   is_int[z_col[alive]] = True
+   ub[bin_col[bin_col >= 0]] = 1
+   is_int[bin_col[bin_col >= 0]] = True
+
+
+   var_names = [None] * n_vars
+   for i, t in enumerate(TIME):
+       for j, r in enumerate(RES):
+           var_names[scrap_col[i, j]] = f'Scrap[{t, r}]'
+       for j, r in enumerate(MAT):
+           var_names[stock_col[i, j]] = f'Stock[{t, r}]'
+       for j, op in enumerate(OPS):
+           if alive[i, j]:
+               var_names[z_col[i, j]] = f'z[{t, op}]'
+               if has_min[j]:
+                   var_names[bin_col[i, j]] = f'BinOp[{t, op}]'
+
+
+   # R_Balance[t, r] is row t * nR + r:
+   # Stock[t] + Scrap + usage * z[t] - Stock[t-1] - produce * z[t - offset] == supply
+   rows, cols, vals = [], [], []
+
+
+   def add(r, c, v):
+       r, c, v = np.broadcast_arrays(r, c, v)
+       keep = c >= 0
+       rows.append(r[keep])
+       cols.append(c[keep])
+       vals.append(v[keep].astype(float))
+
+
+   m_rows = np.array([r_idx[r] for r in MAT], dtype=np.int64)
+   add(tt[:, None] * nR + m_rows, stock_col, 1.0)
+   add(tt[1:, None] * nR + m_rows, stock_col[:-1], -1.0)
+   scrap_res = model.RESOURCE.difference(model.PROD)
+   s_rows = np.array([r_idx[r] for r in RES if r in scrap_res], dtype=np.int64)
+   add(tt[:, None] * nR + s_rows, scrap_col[:, s_rows], 1.0)
+
+
+   c_ptr, c_o, c_u, _ = table.by_resource('use')
+   c_r = np.repeat(np.arange(nR), np.diff(c_ptr))
+   add(tt[:, None] * nR + c_r, z_col[:, c_o], c_u)
+
+
+   p_ptr, p_o, p_q, p_off = table.by_resource('prod')
+   p_r = np.repeat(np.arange(nR), np.diff(p_ptr))
+   # produce amount by source period, the gates use their own capacity
+   Q = np.tile(p_q, (T, 1))
+   p_k = {(OPS[p_o[k]], RES[p_r[k]]): k for k in np.flatnonzero(binary[p_o])}
+   for (t, op, r), cap in model.gate_cap.items():
+       if (op, r) in p_k:
+           Q[model.t_pos[t], p_k[op, r]] = cap
+   src = tt[:, None] - p_off[None, :]
+   ok = (src >= 0) & (src < T)
+   src = np.where(ok, src, 0)
+   add(tt[:, None] * nR + p_r, np.where(ok, z_col[src, p_o], -1), -Q[src, np.arange(len(p_r))])
+
+
+   n_rows = T * nR
+   c_lb = [model.supply.get((r, t), 0) for t in TIME for r in RES]
+   c_ub = list(c_lb)
+   con_keys = [('R_Balance', (t, r)) for t in TIME for r in RES]
+
+
+   def add_row(family, key, terms, lo, hi):
+       nonlocal n_rows
+       add(n_rows, np.array([c for c, _ in terms], dtype=np.int64),
+           np.array([v for _, v in terms], dtype=float))
+       c_lb.append(lo)
+       c_ub.append(hi)
+       con_keys.append((family, key))
+       n_rows += 1
+
+
+   # to force min nonzero operation quantities
+   for i, t in enumerate(TIME):
+       for op in model.HAS_MIN_OPS:
+           j = o_idx[op]
+           if alive[i, j]:
+               big_m = min(model.BigM, model.op_ub.get((t, op), model.BigM))
+               add_row('ForceBinOp', (t, op), [(bin_col[i, j], big_m), (z_col[i, j], -1.0)], 0.0, inf)
+               add_row('ForceMinOp', (t, op),
+                       [(z_col[i, j], 1.0), (bin_col[i, j], -model.min_buy_ops[op])], 0.0, inf)
+
+
+   # "Either/Or" Schedule Constraint
+   op_pickup, op_deliver = 'Op_Make_PickupTime', 'Op_Make_DeliverTime'
+   if (model.friday in TIME or model.window) and op_pickup in o_idx and op_deliver in o_idx:
+       jp, jd = o_idx[op_pickup], o_idx[op_deliver]
+       for i, t in enumerate(TIME):
+           if t != model.friday and alive[i, jp] and alive[i, jd]:
+               add_row('Doug_EitherOr', t, [(z_col[i, jp], 1.0), (z_col[i, jd], 1.0)], -inf, 1.0)
+
+
+   # Limit Scrap
+   for r in model.MATERIAL.difference(model.PROD):
+       if r == 'Money' or r.startswith('D_'):
+           continue
+       add_row('LimitScrap', r, [(c, 1.0) for c in scrap_col[:, r_idx[r]]],
+               -inf, model.supply.get((r, TIME[0]), 0))
+
+
+   A = sp.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                     shape=(n_rows, n_vars))
+   A.eliminate_zeros()
+
+
+   # Objective (see _set_objective for the terms)
+   obj = np.zeros(n_vars)
+   for r in model.MATERIAL.difference(model.PROD):
+       if r != 'Money':
+           obj[scrap_col[:, r_idx[r]]] -= model.scrap_pen[r]
+   for j, r in enumerate(MAT):
+       if r != 'Money':
+           obj[stock_col[:, j]] -= model.stoc_pen[r]
+   obj[stock_col[-1, MAT.index('Money')]] += 1
+
+
+   op_cost = np.zeros(nO)
+   for op, pen in model.make_pen_ops.items():
+       if op in o_idx:
+           op_cost[o_idx[op]] -= pen
+   coef = np.tile(op_cost, (T, 1))
+   # terminal Money from revenue that arrives after the time horizon
+   money = r_idx['Money']
+   for k in range(p_ptr[money], p_ptr[money + 1]):
+       coef[tt + p_off[k] > T - 1, p_o[k]] += p_q[k]
+   # price discounting
+   disc = (1.0 - model.p_disc) ** tt
+   for j in np.flatnonzero(table.kind == OpKind.SHIP):
+       cust, item = table.customers[table.ship_cust[j]], RES[table.ship_item[j]]
+       base = model.baseprice[(item, cust)]
+       coef[:, j] += model.mult[cust] * base * disc - base
+   obj[z_col[alive]] += coef[alive]
+
+
+   # Load it into the pywraplp solver
+   helper = mbh.ModelBuilderHelper()
+   helper.fill_model_from_sparse_data(lb, ub, obj, np.array(c_lb, dtype=float),
+                                      np.array(c_ub, dtype=float), A)
+   for i in np.flatnonzero(is_int):
+       helper.set_var_integrality(int(i), True)
+   for i, name in enumerate(var_names):
+       helper.set_var_name(i, name)
+   for i, (family, key) in enumerate(con_keys):
+       helper.set_constraint_name(i, f'{family}[{key}]' if family != 'LimitScrap' else f'LimitScrap[{key}')
+   helper.set_maximize(True)
+   error = solver.LoadModelFromProtoKeepNames(mbh.to_mpmodel_proto(helper))
+   if error:
+       raise RuntimeError(f"could not load the assembled model: {error}")
+
+
+   variables, constraints = solver.variables(), solver.constraints()
+   for i, t in enumerate(TIME):
+       for j, r in enumerate(RES):
+           model.Scrap[t, r] = variables[scrap_col[i, j]]
+       for j, r in enumerate(MAT):
+           model.Stock[t, r] = variables[stock_col[i, j]]
+       for j, op in enumerate(OPS):
+           if alive[i, j]:
+               model.z[t, op] = variables[z_col[i, j]]
+               if has_min[j]:
+                   model.BinOp[t, op] = variables[bin_col[i, j]]
+   for i, (family, key) in enumerate(con_keys):
+       model.constraints[family][key] = constraints[i]
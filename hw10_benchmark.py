@@ -0,0 +1,285 @@
+# build/solve benchmarks on synthetic instances in the shape of hw10_data_orig
+
+
+import argparse
+import json
+import platform
+import random
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import ortools
+
+import hw10_data_orig
+from hw10_model import load_data, model_from_data
+
+
+# instance sizes, see synthetic_data for the knobs
+SIZES = {
+   'xs': dict(n_products=4, bom_depth=2, n_customers=2, n_subs=4, n_periods=6),
+   's': dict(n_products=10, bom_depth=2, n_customers=3, n_subs=12, n_periods=10),
+   'm': dict(n_products=25, bom_depth=3, n_customers=4, n_subs=30, n_periods=20),
+   'l': dict(n_products=60, bom_depth=3, n_customers=5, n_subs=80, n_periods=30),
+   'xl': dict(n_products=120, bom_depth=4, n_customers=6, n_subs=160, n_periods=52),
+}
+
+
+# phases in the order they run (see ProductionModel.profile)
+PHASES = ['data_to_op', 'params', 'demand_to_supply', 'presolve', 'index', 'bounds',
+         'variables', 'R_Balance', 'ForceBinOp', 'Doug_EitherOr', 'LimitScrap', 'objective',
+         'assemble', 'solve', 'extract']
+SOLVE_PHASES = ['solve', 'extract']
+
+
+def synthetic_data(n_products=8, bom_depth=2, n_customers=3, n_subs=10, n_periods=6, seed=0):
+   """
+       Random data set with the structure of hw10_data_orig: raw materials that
+       are bought (ord_cost/ord_qty) or on hand (supply), bom_depth levels of made
+       items using DougTime, Janey/Doug substitutions, and per-period demand of
+       the top-level products by Store/Online/DogShow(no late)/other customers.
+       Prices are marked up over the rolled-up material and labor cost, so
+       selling is worth it.
+       :param n_products: items per BOM level (the last level is sold)
+       :param bom_depth: levels of made items above the raw materials
+       :param n_subs: substitution triples (capped at what the BOM allows)
+       :return: data dict (see hw10_model.load_data)
+       """
+   rng = random.Random(seed)
+   TIME = [f'd{i}' for i in range(n_periods)]
+   CUSTOMER = ['Store', 'Online', 'DogShow'][:n_customers]
+   CUSTOMER += [f'Cust{i}' for i in range(n_customers - len(CUSTOMER))]
+
+
+   # raw materials
+   raws = [f'Raw{i}' for i in range(max(4, n_products))]
+   ord_cost = {'JaneyTime': 20, 'DougTime': 5}
+   ord_qty = {'JaneyTime': 60, 'DougTime': 60}
+   supply = {}
+   unit_cost = {'DougTime': 5 / 60, 'JaneyTime': 20 / 60}
+   for r in raws:
+       ord_qty[r] = rng.choice([25, 60, 100, 500])
+       ord_cost[r] = round(ord_qty[r] * rng.uniform(.5, 3))
+       unit_cost[r] = ord_cost[r] / ord_qty[r]
+       if rng.random() < .7:
+           supply[(r, TIME[0])] = rng.randint(1, 3) * ord_qty[r]
+
+
+   # made items, level by level, each uses items of the level below
+   usage = {}
+   levels = [raws]
+   for depth in range(1, bom_depth + 1):
+       prefix = 'Prod' if depth == bom_depth else f'Part{depth}_'
+       items = [f'{prefix}{i}' for i in range(n_products)]
+       for item in items:
+           inputs = rng.sample(levels[-1], min(len(levels[-1]), rng.randint(2, 3)))
+           if depth > 1 and rng.random() < .3:
+               inputs.append(rng.choice(raws))
+           for r in set(inputs):
+               usage[(item, r)] = rng.randint(5, 40) if r in raws else rng.randint(1, 2)
+           usage[(item, 'DougTime')] = rng.randint(2, 15)
+           unit_cost[item] = sum(q * unit_cost[r] for (p, r), q in usage.items() if p == item)
+       levels.append(items)
+   products = levels[-1]
+
+
+   # substitutions: Janey instead of Doug, or one raw input for another
+   candidates = [(p, 'DougTime', 'JaneyTime') for lvl in levels[1:] for p in lvl]
+   candidates += [(p, r, q) for (p, r) in usage if r in raws for q in raws[:3] if q != r]
+   rng.shuffle(candidates)
+   sub_usage = {}
+   for (p, r, q) in candidates[:n_subs]:
+       sub_usage[(p, r, q)] = max(1, round(usage[(p, r)] * rng.uniform(.7, 1.5)))
+
+
+   demand, baseprice = {}, {}
+   for p in products:
+       for c in CUSTOMER:
+           if rng.random() < .6:
+               if c == 'DogShow':  # one show day, can't ship late
+                   dem = [0] * n_periods
+                   dem[rng.randrange(n_periods)] = rng.randint(2, 10)
+               else:
+                   dem = [rng.randint(0, 6) for _ in TIME]
+               demand[(p, c)] = dem
+               baseprice[(p, c)] = round(unit_cost[p] * rng.uniform(1.3, 2.5), 2)
+
+
+   return {'MATERIAL': set(raws) | {m for lvl in levels[1:] for m in lvl},
+           'CAPACITY': {'DougTime', 'JaneyTime'},
+           'CUSTOMER': set(CUSTOMER),
+           'NO_LATE': {'DogShow'} & set(CUSTOMER),
+           'TIME': TIME,
+           'usage': usage, 'sub_usage': sub_usage,
+           'ord_cost': ord_cost, 'ord_qty': ord_qty,
+           'demand': demand, 'baseprice': baseprice, 'supply': supply,
+           'init_funds': 2000 + 200 * n_products,
+           'min_buy': {'JaneyTime': 4, raws[0]: 2},
+           'max_buy': {'JaneyTime': [0] + [8] * (n_periods - 1), 'DougTime': [10] * n_periods},
+           'friday': TIME[min(2, n_periods - 1)],
+           'p_disc': .02}
+
+
+def run_case(name, data, backend='auto', solver_opts=None, solve=True, trace_memory=True,
+            **model_opts):
+   """
+       Builds (and solves) one instance and measures it. Run it in a fresh
+       process (see run_suite) so max_rss belongs to this case only.
+       :param trace_memory: track peak Python memory with tracemalloc, this
+           slows down the Python-side phases, so compare like with like
+       :return: result dict with sizes, per-phase timings (s), peak traced
+           Python memory and max RSS (MB), status and objective
+       """
+   if trace_memory:
+       tracemalloc.start()
+   model = model_from_data(data, backend=backend, solver_opts=solver_opts, **model_opts)
+   build_peak = tracemalloc.get_traced_memory()[1]
+   if solve:
+       model.solve()
+   peak = tracemalloc.get_traced_memory()[1]
+   tracemalloc.stop()
+
+
+   row = {'name': name,
+          'n_periods': len(model.TIME),
+          'n_ops': len(model.OPERATIONS),
+          'n_resources': len(model.RESOURCE),
+          'n_vars': model.solver.NumVariables(),
+          'n_cons': model.solver.NumConstraints(),
+          'backend': model.backend,
+          'timings': {p: model.timings[p] for p in PHASES if p in model.timings},
+          'build_time': sum(v for p, v in model.timings.items() if p not in SOLVE_PHASES),
+          'build_peak_mb': build_peak / 2 ** 20,
+          'peak_mb': peak / 2 ** 20,
+          # ru_maxrss is in KB on linux
+          'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10,
+          'trace_memory': trace_memory,
+          'status': model.status}
+   if solve:
+       row.update({k: v for k, v in model.solve_stats().items() if k not in row})
+   row['profile'] = model.profile.to_dict()
+   return row
+
+
+def run_suite(sizes=None, seed=0, backend='auto', solver_opts=None, solve=True,
+             trace_memory=True, include_orig=True, out=None, label=None, **model_opts):
+   """
+       Runs every size one after the other, each in its own process.
+       :param sizes: names from SIZES or {name: synthetic_data kwargs}, None = all
+       :param include_orig: also run hw10_data_orig as case 'orig'
+       :param out: path to write the JSON report to
+       :param label: free text stored with the run (e.g. a commit id)
+       :return: report dict {'meta': ..., 'results': [...]}
+       """
+   if sizes is None:
+       sizes = SIZES
+   elif not isinstance(sizes, dict):
+       sizes = {s: SIZES[s] for s in sizes}
+   cases = [('orig', load_data(hw10_data_orig))] if include_orig else []
+   cases += [(name, synthetic_data(seed=seed, **kw)) for name, kw in sizes.items()]
+
+
+   results = []
+   # one process per case, tasks run sequentially so timings don't compete
+   with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as pool:
+       for name, data in cases:
+           results.append(pool.submit(run_case, name, data, backend, solver_opts, solve,
+                                      trace_memory, **model_opts).result())
+
+
+   report = {'meta': {'label': label,
+                      'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                      'python': platform.python_version(),
+                      'ortools': ortools.__version__,
+                      'machine': platform.machine(),
+                      'seed': seed,
+                      'solver_opts': solver_opts,
+                      'model_opts': model_opts,
+                      'sizes': sizes},
+             'results': results}
+   if out:
+       with open(out, 'w') as f:
+           json.dump(report, f, indent=1, default=str)
+   return report
+
+
+def compare(baseline, current, tolerance=.25, min_time=.05):
+   """
+       Flags regressions of a run against a baseline run (reports or JSON paths).
+       A phase regresses when it is more than tolerance slower and takes at
+       least min_time seconds, peak memory when it grows by more than tolerance.
+       :return: list of {'name', 'metric', 'baseline', 'current', 'ratio'}
+       """
+   def load(report):
+       if isinstance(report, str):
+           with open(report) as f:
+               report = json.load(f)
+       return {r['name']: r for r in report['results']}
+
+
+   base, cur = load(baseline), load(current)
+   regressions = []
+   for name, row in cur.items():
+       if name not in base:
+           continue
+       old = base[name]
+       metrics = [(f'timings.{p}', old['timings'].get(p), v, min_time)
+                  for p, v in row['timings'].items()]
+       metrics.append(('build_time', old['build_time'], row['build_time'], min_time))
+       if old.get('trace_memory', True) and row.get('trace_memory', True):
+           metrics.append(('peak_mb', old['peak_mb'], row['peak_mb'], 1.0))
+       for metric, b, c, floor in metrics:
+           if b is None or c < floor:
+               continue
+           ratio = c / b if b > 0 else float('inf')
+           if ratio > 1 + tolerance:
+               regressions.append({'name': name, 'metric': metric, 'baseline': b,
+                                   'current': c, 'ratio': ratio})
+   return regressions
+
+
+def print_regressions(regressions):
+   """One line per regression, :return: exit code, 1 if there are any."""
+   for r in regressions:
+       print(f"REGRESSION {r['name']} {r['metric']}: {r['baseline']:.3f} -> "
+             f"{r['current']:.3f} ({r['ratio']:.2f}x)")
+   return 1 if regressions else 0
+
+
+def print_report(report):
+   """One line per case: size, per-phase times and memory."""
+   cols = [p for p in PHASES if any(p in r['timings'] for r in report['results'])]
+   print(f"{'case':>6} {'vars':>8} {'cons':>8} " + ' '.join(f'{p[:11]:>11}' for p in cols)
+         + f" {'peak MB':>8} {'rss MB':>8}")
+   for r in report['results']:
+       print(f"{r['name']:>6} {r['n_vars']:>8} {r['n_cons']:>8} "
+             + ' '.join(f"{r['timings'].get(p, 0):>11.3f}" for p in cols)
+             + f" {r['peak_mb']:>8.1f} {r['max_rss_mb']:>8.1f}")
+
+
+if __name__ == '__main__':
+   parser = argparse.ArgumentParser(description='Benchmark model build and solve.')
+   parser.add_argument('--sizes', nargs='+', choices=list(SIZES), help='default: all')
+   parser.add_argument('--seed', type=int, default=0)
+   parser.add_argument('--backend', default='auto')
+   parser.add_argument('--time-limit', type=float, default=30, help='seconds per solve')
+   parser.add_argument('--no-solve', action='store_true', help='build only')
+   parser.add_argument('--assembly', default='scalar', choices=['scalar', 'sparse'])
+   parser.add_argument('--presolve', action='store_true')
+   parser.add_argument('--no-trace', action='store_true', help='skip tracemalloc (faster)')
+   parser.add_argument('--out', help='write the JSON report here')
+   parser.add_argument('--baseline', help='JSON report to check for regressions')
+   parser.add_argument('--tolerance', type=float, default=.25)
+   parser.add_argument('--label')
+   args = parser.parse_args()
+
+
+   report = run_suite(args.sizes, seed=args.seed, backend=args.backend,
+                      solver_opts={'time_limit': args.time_limit}, solve=not args.no_solve,
+                      trace_memory=not args.no_trace, out=args.out, label=args.label,
+                      assembly=args.assembly, presolve=args.presolve)
+   print_report(report)
+   if args.baseline:
+       sys.exit(print_regressions(compare(args.baseline, report, tolerance=args.tolerance)))
@@ -0,0 +1,225 @@
+# bound propagation for tighter Big-Ms
+
+
+import math
+from collections import defaultdict
+
+
+# binary ops whose output is a pure "permission" capacity, sized with a Big-M
+GATE_OPS = ('Op_Make_PickupTime', 'Op_Make_DeliverTime', 'Op_Trip_')
+
+
+def propagate_bounds(TIME, MATERIAL, OPERATIONS, BOR, BOP, usage_param, produce_param,
+                    offset_param, supply, op_ub=None, skip=(), RESOURCE=None):
+   """
+       Upper bound on every operation in every period, from what could possibly
+       have flowed into its inputs by then: supply (incl. demand as supply and
+       init funds), bounded buys (max_buy, money) and the outputs of upstream
+       ops, with their offsets. MATERIAL inflows accumulate over time (stock),
+       CAPACITY ones only count in their own period.
+       Every op variable is integer, so bounds are rounded down.
+       :param supply: {(r, t): qty}
+       :param op_ub: explicit bounds {(t, op): ub}, e.g. max_buy or binaries
+       :param skip: inputs to ignore (the gate resources being sized)
+       :param RESOURCE: resources with a balance row, an input outside it
+           (e.g. a typo in the BOM) doesn't limit anything in the model
+       :return: {(t, op): ub}, ub can be inf
+       """
+   inf = float('inf')
+   op_ub = op_ub or {}
+
+
+   inputs = defaultdict(list)  # op -> [(r, usage)]
+   for (op, r) in BOR:
+       u = usage_param.get((op, r), 0)
+       if op in OPERATIONS and r not in skip and u > 0 and (RESOURCE is None or r in RESOURCE):
+           inputs[op].append((r, u))
+   outputs = defaultdict(list)  # op -> [(r, produce, offset)]
+   for (op, r) in BOP:
+       p = produce_param.get((op, r), 0)
+       if op in OPERATIONS and p > 0:
+           outputs[op].append((r, p, offset_param.get((op, r), 0)))
+
+
+   # same-period (offset 0) producers have to be bounded before their consumers
+   consumers = defaultdict(set)
+   for op, ins in inputs.items():
+       for (r, u) in ins:
+           consumers[r].add(op)
+   indeg = defaultdict(int)
+   succ = defaultdict(set)
+   for op, outs in outputs.items():
+       for (r, p, off) in outs:
+           if off == 0:
+               for c in consumers[r]:
+                   if c != op and c not in succ[op]:
+                       succ[op].add(c)
+                       indeg[c] += 1
+   order = []
+   ready = sorted(op for op in OPERATIONS if indeg[op] == 0)
+   while ready:
+       op = ready.pop()
+       order.append(op)
+       for c in succ[op]:
+           indeg[c] -= 1
+           if indeg[c] == 0:
+               ready.append(c)
+   # ops on a same-period cycle can't be bounded from their inputs, they go
+   # first with only their explicit bound
+   cyclic = [op for op in OPERATIONS if indeg[op] > 0]
+
+
+   supply_by_t = defaultdict(list)
+   for (r, t), q in supply.items():
+       supply_by_t[t].append((r, q))
+
+
+   ub = {}
+   cum = defaultdict(float)  # r -> inflow up to and including the previous period
+   pending = defaultdict(lambda: defaultdict(float))  # i -> r -> arrivals from ops with an offset
+   for i, t in enumerate(TIME):
+       inflow = defaultdict(float)
+       for (r, q) in supply_by_t[t]:
+           inflow[r] += q
+       for r, q in pending.pop(i, {}).items():
+           inflow[r] += q
+
+
+       for op in cyclic + order:
+           b = op_ub.get((t, op), inf)
+           if op not in cyclic:
+               for (r, u) in inputs[op]:
+                   avail = inflow[r] + (cum[r] if r in MATERIAL else 0)
+                   b = min(b, avail / u)
+           if b < inf:
+               # short supply (negative, e.g. money owed) means it can't run
+               b = max(0, math.floor(b + 1e-9))
+           ub[t, op] = b
+           for (r, p, off) in outputs[op]:
+               if off == 0:
+                   inflow[r] += p * b
+               elif i + off < len(TIME):
+                   pending[i + off][r] += p * b
+
+
+       for r, q in inflow.items():
+           cum[r] += q
+   return ub
+
+
+def useful_bounds(OPERATIONS, BOR, BOP, usage_param, produce_param, total_ub, skip=()):
+   """
+       Demand-driven (backward) bound on the total run of every op over the
+       horizon: an op is only worth running as far as some output is needed
+       downstream, need(r) = sum of usage * useful(consumer). Money is always
+       useful, round trips (a consumer that gives back the op's input, e.g.
+       Move G2S then S2G) are not counted, other cycles are left unbounded.
+       A heuristic, not a valid bound: doing more than needed is not always
+       dominated (goods on an overnight round trip skip stoc_pen, a min lot
+       can be worth more than the need), so it can cut off the optimum. Only
+       used with ProductionModel(tighten_bigm='demand').
+       :param total_ub: forward bound on the total run of each op over the
+           horizon, e.g. ship ops can't exceed their demand
+       :param skip: resources that don't make an op useful (the gates)
+       :return: {op: bound}, bound can be inf
+       """
+   inf = float('inf')
+   inputs = defaultdict(set)
+   consumers = defaultdict(list)  # r -> [(op, usage)]
+   for (op, r) in BOR:
+       u = usage_param.get((op, r), 0)
+       if op in OPERATIONS and u > 0:
+           inputs[op].add(r)
+           consumers[r].append((op, u))
+   outputs = defaultdict(list)  # op -> [(r, produce)]
+   for (op, r) in BOP:
+       p = produce_param.get((op, r), 0)
+       if op in OPERATIONS and p > 0 and r not in skip:
+           outputs[op].append((r, p))
+
+
+   useful = {}
+   on_stack = set()
+
+
+   def need(r, via):
+       if r == 'Money':
+           return inf
+       total = 0.0
+       for (c, u) in consumers[r]:
+           if any(out in inputs[via] and out != 'Money' for (out, p) in outputs[c]):
+               continue  # round trip back into via's inputs
+           total += u * op_useful(c)
+           if total == inf:
+               break
+       return total
+
+
+   def op_useful(op):
+       if op in useful:
+           return useful[op]
+       if op in on_stack:
+           return inf  # cycle
+       on_stack.add(op)
+       b = 0.0 if outputs[op] else inf
+       for (r, p) in outputs[op]:
+           n = need(r, op)
+           b = max(b, math.ceil(n / p - 1e-9) if n < inf else inf)
+           if b == inf:
+               break
+       on_stack.discard(op)
+       useful[op] = min(b, total_ub.get(op, inf))
+       return useful[op]
+
+
+   for op in OPERATIONS:
+       op_useful(op)
+   return useful
+
+
+def horizon_totals(MATERIAL, OPERATIONS, BOR, BOP, usage_param, supply, op_ub):
+   """
+       Forward bound on the total run of each op over the whole horizon: the
+       per-period bounds summed, and for MATERIAL inputs that no op produces
+       the total supply (e.g. a D_ resource only ever gets its demand).
+       :param op_ub: per-period bounds from propagate_bounds
+       :return: {op: bound}
+       """
+   inf = float('inf')
+   totals = defaultdict(float)
+   for (t, op), b in op_ub.items():
+       totals[op] += b
+   produced = {r for (op, r) in BOP if op in OPERATIONS}
+   inflow = defaultdict(float)
+   for (r, t), q in supply.items():
+       inflow[r] += q
+   for (op, r) in BOR:
+       u = usage_param.get((op, r), 0)
+       if op in OPERATIONS and u > 0 and r in MATERIAL and r not in produced:
+           totals[op] = min(totals[op], math.floor(inflow[r] / u + 1e-9))
+   return {op: totals.get(op, inf) for op in OPERATIONS}
+
+
+def gate_capacities(TIME, OPERATIONS, BOR, BOP, usage_param, produce_param, op_ub):
+   """
+       Smallest valid output per period for the gate ops (PickupTime/DeliverTime
+       makers, courier trips): what all consumers of the gate resource could use
+       at their bounds, capped at the current produce_param.
+       :param op_ub: bounds from propagate_bounds (run with the gates skipped)
+       :return: {(t, op, r): produce}
+       """
+   gates = {(op, r) for (op, r) in BOP if op in OPERATIONS and op.startswith(GATE_OPS)}
+   gate_res = {r for (op, r) in gates}
+   need = defaultdict(float)  # (t, r) -> max usage of r
+   for (op, r) in BOR:
+       if op in OPERATIONS and r in gate_res:
+           for t in TIME:
+               need[t, r] += usage_param.get((op, r), 0) * op_ub.get((t, op), float('inf'))
+
+
+   caps = {}
+   for (op, r) in gates:
+       for t in TIME:
+           cap = min(produce_param.get((op, r), 0), need[t, r])
+           caps[t, op, r] = max(cap, 0.0)
+   return caps
@@ -1,33 +1,193 @@
-from collections import defaultdict
+import hashlib
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+import numpy as np
+
+
+# resources that aren't physical goods, they never sit at a location
+NON_PHYSICAL = {'Money', 'JaneyTime', 'DougTime', 'PickupTime', 'DeliverTime'}
+
+
+# the two-site network of the original data: Doug's garage (home) and Janey's
+# studio, $30 same-day courier one way and $50 overnight back
+DEFAULT_LOCATIONS = ['Garage', 'Studio']
+DEFAULT_LANES = {('Garage', 'Studio'): {'cost': 30.0, 'offset': 0, 'transport': 'Transport_G2S'},
+                ('Studio', 'Garage'): {'cost': 50.0, 'offset': 1, 'transport': 'Transport_S2G'}}
+DEFAULT_WORKERS = {'JaneyTime': 'Studio'}  # labor -> where that person works
+BUNDLE_SITE = 'Studio'  # where FabricBundle gets delivered
+
+
+# optional data keys describing the network (see build_network)
+NETWORK_KEYS = ['LOCATIONS', 'LANES', 'STOCKED', 'WORKERS']
+
+
+@dataclass
+class Network:
+   """
+       Locations and the transfer lanes between them. Physical resources are
+       keyed (item, location): at the home location (locations[0]) a resource
+       keeps the plain item name, elsewhere it's <item>_<location>.
+       res_key and res_name go from one to the other.
+       """
+   locations: list
+   lanes: dict    # (src, dst) -> {'cost', 'offset', 'transport', 'capacity'}
+   stocked: dict  # location -> sorted items that can be kept there
+   workers: dict  # labor resource -> location
+   res_key: dict = field(default_factory=dict, repr=False)
+   res_name: dict = field(default_factory=dict, repr=False)
+
+
+   @property
+   def home(self):
+       return self.locations[0]
+
+
+   def name(self, item, loc):
+       return item if loc == self.home else f"{item}_{loc}"
+
+
+   def location(self, r):
+       """Location of a resource name, home for anything not in the table."""
+       return self.res_key.get(r, (r, self.home))[1]
+
+
+   @staticmethod
+   def trip_op(src, dst):
+       return f"Op_Trip_{src}_to_{dst}"
+
+
+   @staticmethod
+   def move_op(item, src, dst):
+       return f"Move_{item}_{src}_to_{dst}"
+
+
+def build_network(MATERIAL, LOCATIONS=None, LANES=None, STOCKED=None, WORKERS=None):
+   """
+       Location table of a data set, defaults are the Garage/Studio pair.
+       :param MATERIAL: base materials of the data (before data_to_op)
+       :param LOCATIONS: location names, the first one is home
+       :param LANES: {(src, dst): {'cost': fixed cost per trip, 'offset': lead
+           time in periods, 'transport': capacity resource name (default
+           Transport_<src>_to_<dst>), 'capacity': units per trip (default the
+           total supply)}}, lanes to unknown locations are left out
+       :param STOCKED: {location: items kept there}, default every material
+           everywhere (the home location always has them all)
+       :param WORKERS: {labor resource: location}, substitutions with that
+           labor use the materials at its location
+       :return: Network
+       """
+   locations = list(LOCATIONS or DEFAULT_LOCATIONS)
+   items = sorted(set(MATERIAL) - NON_PHYSICAL)
+   stocked = {loc: items if loc == locations[0] or STOCKED is None or loc not in STOCKED
+              else sorted(set(STOCKED[loc]) - NON_PHYSICAL)
+              for loc in locations}
+   lanes = {}
+   for (src, dst), lane in (DEFAULT_LANES if LANES is None else LANES).items():
+       if src in stocked and dst in stocked and src != dst:
+           lanes[src, dst] = {'cost': float(lane.get('cost', 0.0)),
+                              'offset': int(lane.get('offset', 0)),
+                              'transport': lane.get('transport', f"Transport_{src}_to_{dst}"),
+                              'capacity': lane.get('capacity')}
+   workers = {w: loc for w, loc in (DEFAULT_WORKERS if WORKERS is None else WORKERS).items()
+              if loc in stocked}
+
+
+   net = Network(locations, lanes, stocked, workers)
+   for loc, loc_items in stocked.items():
+       for item in loc_items:
+           net.res_key[net.name(item, loc)] = (item, loc)
+   for w, loc in workers.items():
+       net.res_key[w] = (w, loc)
+   for (src, dst), lane in lanes.items():
+       net.res_key[lane['transport']] = (lane['transport'], src)  # used where the trip leaves
+   net.res_name = {key: r for r, key in net.res_key.items()}
+   return net
+
+
+def network_of(MATERIAL, **network):
+   """
+       Network of a data_to_op output, for models built without one: the
+       location copies already in MATERIAL tell what each location keeps.
+       :param network: NETWORK_KEYS tables the ops were built with
+       """
+   locs = list(network.get('LOCATIONS') or DEFAULT_LOCATIONS)
+   copies = {f"{r}_{loc}" for loc in locs[1:] for r in MATERIAL} & set(MATERIAL)
+   base = set(MATERIAL) - copies
+   stocked = {loc: [r for r in base if f"{r}_{loc}" in copies] for loc in locs[1:]}
+   return build_network(base, locs, network.get('LANES'), stocked, network.get('WORKERS'))
+
+
+def demand_entries(demand, TIME):
+   """
+       Demand as a sparse {(item, cust, t): qty} dict of its nonzero entries,
+       from any of the accepted shapes:
+           {(item, cust): [qty per period]}  dense rows (the data file format)
+           {(item, cust, t): qty}            sparse, t a TIME label
+           iterable of order records         (item, cust, t, qty) tuples or
+                                             dicts with those keys
+       Records for the same (item, cust, t) add up. Dense rows need one qty
+       per period.
+       :return: new dict, the input is left untouched
+       """
+   t_set = set(TIME)
+   if isinstance(demand, dict):
+       if not demand:
+           return {}
+       if len(next(iter(demand))) == 2:
+           for (item, cust), row in demand.items():
+               if len(row) != len(TIME):
+                   raise ValueError(f"demand for {(item, cust)} needs {len(TIME)} periods, got {len(row)}")
+           return {(item, cust, t): q for (item, cust), row in demand.items()
+                   for t, q in zip(TIME, row) if q}
+       records = ((item, cust, t, q) for (item, cust, t), q in demand.items())
+   else:
+       records = ((rec['item'], rec['cust'], rec['t'], rec['qty']) if isinstance(rec, dict)
+                  else rec for rec in demand)
+
+
+   entries = defaultdict(float)
+   for item, cust, t, q in records:
+       if t not in t_set:
+           raise ValueError(f"demand for {(item, cust)} in period {t!r}, which isn't in TIME")
+       if q:
+           entries[item, cust, t] += q
+   return {key: q for key, q in entries.items() if q}
 
 
+def data_to_op(MATERIAL, CAPACITY, CUSTOMER, NO_LATE, TIME,
+              usage, sub_usage, ord_cost, ord_qty, demand, baseprice, supply,
+              LOCATIONS=None, LANES=None, STOCKED=None, WORKERS=None):
 
 
-def data_to_op(MATERIAL, CAPACITY, CUSTOMER, NO_LATE, TIME,
-              usage, sub_usage, ord_cost, ord_qty, demand, baseprice, supply):
+   network = build_network(MATERIAL, LOCATIONS, LANES, STOCKED, WORKERS)
 
 
-   # modified so that MATERIAL isn't mutated (for solve time)
-   base_mats = list(MATERIAL)
-   for MAT in base_mats:
-       if MAT in {'Money', 'JaneyTime', 'DougTime', 'PickupTime', 'DeliverTime'}:
-           continue
-       studio_mat = f"{MAT}_Studio"
-       MATERIAL.add(studio_mat)
+   # work on copies so the caller's sets aren't mutated (a second call on the
+   # same sets used to make _Studio_Studio resources)
+   MATERIAL, CAPACITY = set(MATERIAL), set(CAPACITY)
+   # a copy of every material kept at each other location
+   for loc in network.locations[1:]:
+       MATERIAL.update(network.name(item, loc) for item in network.stocked[loc])
 
 
    MATERIAL.add('Money')
 
 
-   CAPACITY |= {'PickupTime', 'DeliverTime', 'Transport_G2S', 'Transport_S2G'}
+   CAPACITY |= {'PickupTime', 'DeliverTime'}
+   CAPACITY.update(lane['transport'] for lane in network.lanes.values())
 
 
-   # We must pre-calculate HAS_DEMAND here
-   HAS_DEMAND = set()
-   for c in CUSTOMER:
-       for r in MATERIAL:
-           if any(demand.get((r, c), [0] * len(TIME))[i] > 0 for i in range(len(TIME))):
-               HAS_DEMAND.add((c, r))
+   # We must pre-calculate HAS_DEMAND here, straight from the nonzero
+   # entries (demand can come in any shape demand_entries takes)
+   demand = demand_entries(demand, TIME)
+   HAS_DEMAND = {(c, r) for (r, c, t), q in demand.items()
+                 if q > 0 and c in CUSTOMER and r in MATERIAL}
 
 
    for (c, r) in HAS_DEMAND:
@@ -47,9 +207,7 @@ def data_to_op(MATERIAL, CAPACITY, CUSTOMER, NO_LATE, TIME,
 
 
    # Big-M for PickupTime and DeliverTime: one trip can handle all demand
-   total_demand = 0
-   for (item, cust), dem_list in demand.items():
-       total_demand += sum(dem_list)
+   total_demand = sum(demand.values())
    BIGM_TRIP = max(1, total_demand)
 
 
@@ -93,27 +251,31 @@ def data_to_op(MATERIAL, CAPACITY, CUSTOMER, NO_LATE, TIME,
    #  SUBSTITUTION
    for (p, r, q_sub) in sub_usage.keys():
        k_sub = f"Make_{p}_with_{q_sub}"
-       OPERATIONS.add(k_sub)
-
-
        base_inputs = by_item.get(p, [])
 
 
-       # Is this a Janey-time (studio) operation?
-       is_janey_op = (q_sub == 'JaneyTime')
-
-
+       # Where does the substitute labor work? (Janey at the studio) The
+       # inputs are taken from that location's copies
+       sub_loc = network.workers.get(q_sub, network.home)
+       inputs = []
        for (res, q) in base_inputs:
-           if res == r:
+           if res == r or q <= 0:
                continue
-           if q > 0:
-               eff_res = res
-               # If Janey is doing this at the studio, use studio copies
-               if is_janey_op and res not in {'DougTime', 'JaneyTime', 'Money',
-                                              'PickupTime', 'DeliverTime'}:
-             eff_res = f"{res}_Studio"
-               BOR.add((k_sub, eff_res))
-               usage_param[(k_sub, eff_res)] = q
+           if (res, network.home) not in network.res_name:
+               inputs.append((res, q))  # labor/capacity, not kept at a location
+           elif (res, sub_loc) in network.res_name:
+               inputs.append((network.res_name[res, sub_loc], q))
+           else:
+               inputs = None  # an input isn't stocked there, no such recipe
+               break
+       if inputs is None:
+           continue
+
+
+       OPERATIONS.add(k_sub)
+       for eff_res, q in inputs:
+           BOR.add((k_sub, eff_res))
+           usage_param[(k_sub, eff_res)] = q
 
 
        # JaneyTime or DougTime capacity
@@ -147,17 +309,12 @@ def data_to_op(MATERIAL, CAPACITY, CUSTOMER, NO_LATE, TIME,
            usage_param[(k, "Money")] += float(cost)  # 200 from data_orig
 
 
-           # explode bundle into studio fabrics
-           BOP.add((k, 'Fleece_Studio'))
-           produce_param[(k, 'Fleece_Studio')] += 30*36
-
-
-           BOP.add((k, 'Mesh_Studio'))
-           produce_param[(k, 'Mesh_Studio')] += 30 * 36
-
-
-           BOP.add((k, 'Casing_Studio'))
-           produce_param[(k, 'Casing_Studio')] += 200 * 36
+           # explode bundle into studio fabrics (garage ones if there's no
+           # studio or it doesn't keep that fabric)
+           for fabric, qty in (('Fleece', 30 * 36), ('Mesh', 30 * 36), ('Casing', 200 * 36)):
+               fab = network.res_name.get((fabric, BUNDLE_SITE), fabric)
+               BOP.add((k, fab))
+               produce_param[(k, fab)] += qty
 
 
            # no PickupTime cost, no offset: arrives same period at studio
@@ -251,103 +408,51 @@ def data_to_op(MATERIAL, CAPACITY, CUSTOMER, NO_LATE, TIME,
        offset_param[(k, "Money")] = 1
 
 
-   # MOVE ops for Garage to/from Studio
-   # We approximate the fixed-trip costs $30 (Doug2Janey) and $50 (Janey2Doug)
+   # MOVE ops along the transfer lanes (Garage to/from Studio by default)
+   # We approximate the fixed-trip costs with one courier trip op per lane
+   # ($30 Doug2Janey and $50 Janey2Doug in the original data)
 
 
-   # Create "Courier Trip" Operations (The Fixed Cost)
-   # Trip G->S ($30 fixed cost, creates infinite capacity)
-  
    # we set a large enough capacity so that the courier is never full,
    # this results in large qty of scap for unused capacity, but it works :)
    BigM_Move = sum(supply.values())
-  
-   op_trip_d2j = "Op_Trip_Garage_to_Studio"
-   OPERATIONS.add(op_trip_d2j)
-   BOR.add((op_trip_d2j, 'Money'))
-   usage_param[(op_trip_d2j, 'Money')] = 30.0
-   BOP.add((op_trip_d2j, 'Transport_G2S'))
-   produce_param[(op_trip_d2j, 'Transport_G2S')] = BigM_Move 
-
-
-   # Trip S->G ($50 fixed cost, creates infinite capacity)
-   op_trip_j2d = "Op_Trip_Studio_to_Garage"
-   OPERATIONS.add(op_trip_j2d)
-   BOR.add((op_trip_j2d, 'Money'))
-   usage_param[(op_trip_j2d, 'Money')] = 50.0
-   BOP.add((op_trip_j2d, 'Transport_S2G'))
-   produce_param[(op_trip_j2d, 'Transport_S2G')] = BigM_Move
-
-
-   # Doug (garage) to Janey (studio)
-   for r in list(MATERIAL):
-       # Skip special / non-physical resources
-       if r in {'Money', 'JaneyTime', 'DougTime', 'PickupTime', 'DeliverTime'}:
-           continue
-       if r.startswith('D_'):
-           continue       # never move demand resources
-       if r.endswith('_Studio'):
-           continue       # base resources only
-
-
-       r_studio = f"{r}_Studio"
-       if r_studio not in MATERIAL:
-           continue
-
-
-       op_move = f"Move_{r}_Garage_to_Studio"
-       OPERATIONS.add(op_move)
-
-
-       BOR.add((op_move, r))
-       usage_param[(op_move, r)] += 1.0
-
-
-       BOR.add((op_move, "Transport_G2S"))
-       usage_param[(op_move, "Transport_G2S")] += 1.0
-
-
-       BOP.add((op_move, r_studio))
-       produce_param[(op_move, r_studio)] += 1.0
-
-
-       # Doug2Janey is "same day" so offset 0
-       offset_param[(op_move, r_studio)] = 0
 
 
-   # Janey (studio) to Doug (garage)
-   for r in list(MATERIAL):
-       if not r.endswith('_Studio'):
-           continue
-       base_r = r[:-7]  # strip "_Studio"
-
-
-       # Again skip weird/special ones
-       if base_r in {'Money', 'JaneyTime', 'DougTime',
-                     'PickupTime', 'DeliverTime'}:
-           continue
-       if base_r.startswith('D_'):
-           continue
-
-
-       op_move_back = f"Move_{base_r}_Studio_to_Garage"
-       OPERATIONS.add(op_move_back)
-       
-       
-       BOR.add((op_move_back, r))
-       usage_param[(op_move_back, r)] += 1.0
+   for (src, dst), lane in network.lanes.items():
+       # Create "Courier Trip" Operation (The Fixed Cost), it makes the
+       # lane's transport capacity
+       op_trip = network.trip_op(src, dst)
+       transport = lane['transport']
+       OPERATIONS.add(op_trip)
+       BOR.add((op_trip, 'Money'))
+       usage_param[(op_trip, 'Money')] = lane['cost']
+       BOP.add((op_trip, transport))
+       produce_param[(op_trip, transport)] = (BigM_Move if lane['capacity'] is None
+                                              else float(lane['capacity']))
+
+
+       # a move per item kept at both ends, arriving after the lane's lead
+       # time (Doug2Janey is same day, Janey2Doug overnight)
+       dst_items = set(network.stocked[dst])
+       for item in network.stocked[src]:
+           if item not in dst_items:
+               continue
+           r_src, r_dst = network.res_name[item, src], network.res_name[item, dst]
+           op_move = network.move_op(item, src, dst)
+           OPERATIONS.add(op_move)
 
 
-       BOR.add((op_move_back, "Transport_S2G"))
-       usage_param[(op_move_back, "Transport_S2G")] += 1.0
+           BOR.add((op_move, r_src))
+           usage_param[(op_move, r_src)] += 1.0
 
 
-       BOP.add((op_move_back, base_r))
-       produce_param[(op_move_back, base_r)] += 1.0
+           BOR.add((op_move, transport))
+           usage_param[(op_move, transport)] += 1.0
 
 
-       # Janey2Doug is overnight so arrives next period
-       offset_param[(op_move_back, base_r)] = 1
+           BOP.add((op_move, r_dst))
+           produce_param[(op_move, r_dst)] += 1.0
+           offset_param[(op_move, r_dst)] = lane['offset']
 
 
    # NEW: Seamstress Operations
@@ -381,3 +486,239 @@ def data_to_op(MATERIAL, CAPACITY, CUSTOMER, NO_LATE, TIME,
 
    return OPERATIONS, BOP, BOR, usage_param, produce_param, offset_param, MATERIAL, CAPACITY
 
+
+
+# Memoized data_to_op: the output is keyed on a hash of the inputs' content,
+# bump OP_CACHE_VERSION whenever data_to_op changes what it builds
+OP_CACHE_VERSION = 3
+OP_CACHE_SIZE = 16  # entries kept in memory
+op_cache_stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'last': None}
+_op_cache = OrderedDict()  # hash -> pickled output
+_op_cache_lock = threading.Lock()
+
+
+def _canonical(obj):
+   # order-independent text of sets/dicts so equal data gives equal hashes
+   # (set order changes between runs with string hash randomization)
+   if isinstance(obj, dict):
+       return '{' + ','.join(sorted(f'{_canonical(k)}:{_canonical(v)}'
+                                    for k, v in obj.items())) + '}'
+   if isinstance(obj, (set, frozenset)):
+       return '{' + ','.join(sorted(map(_canonical, obj))) + '}'
+   if isinstance(obj, (list, tuple)):
+       return '[' + ','.join(map(_canonical, obj)) + ']'
+   if isinstance(obj, np.ndarray):
+       return _canonical(obj.tolist())
+   return repr(obj)
+
+
+def content_hash(*args):
+   """sha256 hex digest of the content of args (sets and dicts in any order)."""
+   return hashlib.sha256(_canonical(args).encode()).hexdigest()
+
+
+def cached_data_to_op(MATERIAL, CAPACITY, CUSTOMER, NO_LATE, TIME,
+                     usage, sub_usage, ord_cost, ord_qty, demand, baseprice, supply,
+                     cache_dir=None, **network):
+   """
+       data_to_op memoized on a content hash of its inputs. Every call returns
+       new objects, so callers can change them freely.
+       :param cache_dir: directory for an on-disk pickle cache shared between
+           runs (created if missing), None to only cache in memory
+       :param network: NETWORK_KEYS tables passed on to data_to_op
+       :return: same as data_to_op
+       """
+   # same demand in another shape (or a one-shot record stream) gives the same key
+   demand = demand_entries(demand, TIME)
+   args = (MATERIAL, CAPACITY, CUSTOMER, NO_LATE, TIME,
+           usage, sub_usage, ord_cost, ord_qty, demand, baseprice, supply)
+   network = {k: network.get(k) for k in NETWORK_KEYS}
+   key = content_hash(OP_CACHE_VERSION, *args, network)
+   path = os.path.join(cache_dir, f'ops_{key}.pkl') if cache_dir else None
+
+
+   with _op_cache_lock:
+       blob = _op_cache.get(key)
+       if blob is not None:
+           _op_cache.move_to_end(key)
+           op_cache_stats['hits'] += 1
+           op_cache_stats['last'] = 'memory'
+   if blob is None and path and os.path.exists(path):
+       try:
+           with open(path, 'rb') as f:
+               blob = f.read()
+           pickle.loads(blob)  # check it isn't a partial/corrupt file
+           op_cache_stats['disk_hits'] += 1
+           op_cache_stats['last'] = 'disk'
+       except (OSError, pickle.UnpicklingError, EOFError):
+           blob = None
+   if blob is None:
+       blob = pickle.dumps(data_to_op(*args, **network), protocol=pickle.HIGHEST_PROTOCOL)
+       op_cache_stats['misses'] += 1
+       op_cache_stats['last'] = 'miss'
+       if path:
+           os.makedirs(cache_dir, exist_ok=True)
+           tmp = f'{path}.{os.getpid()}.tmp'
+           with open(tmp, 'wb') as f:
+               f.write(blob)
+           os.replace(tmp, path)  # atomic, so parallel runs never read half a file
+
+
+   with _op_cache_lock:
+       _op_cache[key] = blob
+       _op_cache.move_to_end(key)
+       while len(_op_cache) > OP_CACHE_SIZE:
+           _op_cache.popitem(last=False)
+   return pickle.loads(blob)
+
+
+def clear_op_cache(cache_dir=None):
+   """Empties the in-memory cache (and the pickles in cache_dir if given)."""
+   with _op_cache_lock:
+       _op_cache.clear()
+   if cache_dir and os.path.isdir(cache_dir):
+       for name in os.listdir(cache_dir):
+           if name.startswith('ops_') and name.endswith('.pkl'):
+               os.remove(os.path.join(cache_dir, name))
+
+
+# Integer-indexed form of the data_to_op output
+class OpKind(IntEnum):
+   MAKE = 0        # Make_<item>, Make_<item>_with_<sub>
+   BUY = 1         # Buy_<res>, Buy_<box>
+   SHIP = 2        # Ship_<cust>_<item>
+   MOVE = 3        # Move_<res>_<src>_to_<dst>, one per lane and item
+   TRIP = 4        # Op_Trip_* courier trips (binary)
+   SEAMSTRESS = 5  # Buy_Seamstress_<size>
+   SCHEDULE = 6    # Op_Make_PickupTime / Op_Make_DeliverTime (binary)
+
+
+def op_kind(op):
+   if op.startswith('Op_Trip_'):
+       return OpKind.TRIP
+   if op.startswith('Op_Make_'):
+       return OpKind.SCHEDULE
+   if op.startswith('Buy_Seamstress_'):
+       return OpKind.SEAMSTRESS
+   if op.startswith('Buy_'):
+       return OpKind.BUY
+   if op.startswith('Ship_'):
+       return OpKind.SHIP
+   if op.startswith('Move_'):
+       return OpKind.MOVE
+   return OpKind.MAKE
+
+
+@dataclass
+class OpTable:
+   """
+       Ops and resources as ids, with CSR arrays per op:
+       use_res[use_ptr[i]:use_ptr[i + 1]] are the resources op i consumes
+       (use_qty per unit), prod_* the same for what it produces (prod_off =
+       offset in periods). Names are only kept for the edges (ops, resources,
+       op_id, res_id).
+       """
+   ops: list
+   resources: list
+   customers: list
+   kind: np.ndarray         # OpKind per op (int8)
+   is_material: np.ndarray  # per resource, MATERIAL (stock carries over) or CAPACITY
+   use_ptr: np.ndarray
+   use_res: np.ndarray
+   use_qty: np.ndarray
+   prod_ptr: np.ndarray
+   prod_res: np.ndarray
+   prod_qty: np.ndarray
+   prod_off: np.ndarray
+   ship_cust: np.ndarray    # customer id of ship ops, -1 otherwise
+   ship_item: np.ndarray    # resource id of the shipped item, -1 otherwise
+   op_id: dict = field(repr=False)
+   res_id: dict = field(repr=False)
+
+
+   @property
+   def is_binary(self):
+       return (self.kind == OpKind.TRIP) | (self.kind == OpKind.SCHEDULE)
+
+
+   def by_resource(self, which='use'):
+       """
+           Transposed (resource-major) CSR of the use or prod arrays:
+           (ptr, op, qty, offset), rows of resource r are ptr[r]:ptr[r + 1].
+           Entries stay in op order within a resource.
+           """
+       ptr, res, qty = ((self.use_ptr, self.use_res, self.use_qty) if which == 'use'
+                        else (self.prod_ptr, self.prod_res, self.prod_qty))
+       off = self.prod_off if which == 'prod' else np.zeros(len(res), dtype=np.int32)
+       op = np.repeat(np.arange(len(self.ops), dtype=np.int32), np.diff(ptr))
+       order = np.argsort(res, kind='stable')
+       r_ptr = np.zeros(len(self.resources) + 1, dtype=np.int64)
+       np.cumsum(np.bincount(res, minlength=len(self.resources)), out=r_ptr[1:])
+       return r_ptr, op[order], qty[order], off[order]
+
+
+   def cost(self, res='Money'):
+       """Per-op usage of one resource (e.g. the money spent per unit)."""
+       out = np.zeros(len(self.ops))
+       r = self.res_id.get(res)
+       if r is not None:
+           hit = self.use_res == r
+           op = np.repeat(np.arange(len(self.ops)), np.diff(self.use_ptr))
+           out[op[hit]] = self.use_qty[hit]
+       return out
+
+
+def compile_op_table(OPERATIONS, MATERIAL, CAPACITY, BOR, BOP, usage_param, produce_param,
+                    offset_param, CUSTOMER=(), RESOURCE=None):
+   """
+       Compiles the data_to_op output into an OpTable. Ids follow the
+       iteration order of OPERATIONS and RESOURCE (default MATERIAL | CAPACITY),
+       so a loop over the ids visits them like a loop over those sets. BOR/BOP
+       entries of unknown ops or resources are left out, like the model does.
+       """
+   ops = [sys.intern(op) for op in OPERATIONS]
+   resources = [sys.intern(r) for r in (MATERIAL | CAPACITY if RESOURCE is None else RESOURCE)]
+   mat = set(MATERIAL)
+   op_id = {op: i for i, op in enumerate(ops)}
+   res_id = {r: i for i, r in enumerate(resources)}
+   customers = sorted(CUSTOMER)
+   cust_id = {c: i for i, c in enumerate(customers)}
+
+
+   def csr(pairs, param, offsets=None):
+       rows = defaultdict(list)
+       for (op, r) in pairs:
+           if op in op_id and r in res_id:
+               rows[op_id[op]].append(r)
+       ptr = np.zeros(len(ops) + 1, dtype=np.int64)
+       res, qty, off = [], [], []
+       for i, op in enumerate(ops):
+           for r in sorted(rows[i], key=res_id.get):
+               res.append(res_id[r])
+               qty.append(param.get((op, r), 0))
+               if offsets is not None:
+                   off.append(offsets.get((op, r), 0))
+           ptr[i + 1] = len(res)
+       return (ptr, np.array(res, dtype=np.int32), np.array(qty, dtype=float),
+               np.array(off, dtype=np.int32))
+
+
+   use_ptr, use_res, use_qty, _ = csr(BOR, usage_param)
+   prod_ptr, prod_res, prod_qty, prod_off = csr(BOP, produce_param, offset_param)
+
+
+   kind = np.array([op_kind(op) for op in ops], dtype=np.int8)
+   ship_cust = np.full(len(ops), -1, dtype=np.int32)
+   ship_item = np.full(len(ops), -1, dtype=np.int32)
+   for i in np.flatnonzero(kind == OpKind.SHIP):
+       # op = "Ship_<Cust>_<Item-with-underscores>"
+       _, cust, item = ops[i].split("_", 2)
+       ship_cust[i] = cust_id.get(cust, -1)
+       ship_item[i] = res_id.get(item, -1)
+
+
+   return OpTable(ops=ops, resources=resources, customers=customers, kind=kind,
+                  is_material=np.array([r in mat for r in resources], dtype=bool),
+                  use_ptr=use_ptr, use_res=use_res, use_qty=use_qty,
+                  prod_ptr=prod_ptr, prod_res=prod_res, prod_qty=prod_qty, prod_off=prod_off,
+                  ship_cust=ship_cust, ship_item=ship_item, op_id=op_id, res_id=res_id)
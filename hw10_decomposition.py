@@ -0,0 +1,291 @@
+# Lagrangian decomposition of the model by site (location, Garage / Studio by default)
+
+
+import time
+
+import numpy as np
+from ortools.linear_solver import linear_solver_pb2, pywraplp
+
+from hw10_data_conversion import OpKind
+from hw10_solver import create_solver
+
+
+def op_site(table, network, i):
+   """
+       Site of op i of an OpTable: where the resources it uses sit (Money is
+       shared and doesn't count), else where its output goes, else home. A
+       site away from home wins over home, so Move_*_Garage_to_Studio is a
+       garage op and Buy_JaneyTime a studio one.
+       """
+   for ptr, res in ((table.use_ptr, table.use_res), (table.prod_ptr, table.prod_res)):
+       sites = {network.location(table.resources[r]) for r in res[ptr[i]:ptr[i + 1]]
+                if table.resources[r] != 'Money'}
+       away = sorted(sites - {network.home})
+       if sites:
+           return away[0] if away else network.home
+   return network.home
+
+
+def split_model(model):
+   """
+       Assigns every variable of a built model to a site and sorts the rows
+       into the ones inside a site and the coupling rows between sites.
+       :return: (proto, {site: var indices}, {site: row indices}, coupling row indices)
+       """
+   proto = linear_solver_pb2.MPModelProto()
+   model.solver.ExportModelToProto(proto)
+   table = model.optable
+   network = model.network
+   site_of_op = {op: op_site(table, network, i) for i, op in enumerate(table.ops)}
+   var_site = np.empty(len(proto.variable), dtype=object)
+   for family in ('z', 'BinOp'):
+       for (t, op), var in getattr(model, family).items():
+           var_site[var.index()] = site_of_op[op]
+   for family in ('Stock', 'Scrap'):
+       for (t, r), var in getattr(model, family).items():
+           var_site[var.index()] = network.location(r)
+
+
+   sites = sorted(set(var_site))
+   block_vars = {s: np.flatnonzero(var_site == s) for s in sites}
+   block_rows = {s: [] for s in sites}
+   coupling = []
+   for i, ct in enumerate(proto.constraint):
+       row_sites = {var_site[j] for j, a in zip(ct.var_index, ct.coefficient) if a != 0}
+       if len(row_sites) == 1:
+           block_rows[row_sites.pop()].append(i)
+       elif row_sites:
+           coupling.append(i)
+   return proto, block_vars, block_rows, coupling
+
+
+def implied_upper_bounds(proto, passes=20):
+   """
+       Upper bounds of the variables implied by the rows (activity-based bound
+       propagation, e.g. Stock[t] <= supply + Stock[t-1] + what can be produced).
+       A site on its own misses the coupling rows that bound some of its
+       variables, these keep it bounded once the rows are priced instead.
+       """
+   inf = float('inf')
+   lb = np.array([v.lower_bound for v in proto.variable])
+   ub = np.array([v.upper_bound for v in proto.variable])
+   rows = [(np.array(ct.var_index, dtype=np.int64), np.array(ct.coefficient),
+            ct.lower_bound, ct.upper_bound) for ct in proto.constraint]
+   # np.where works out both branches, so inf - inf shows up where the
+   # infinite entries are masked off anyway
+   with np.errstate(invalid='ignore'):
+       for _ in range(passes):
+           changed = False
+           for idx, a, row_lb, row_ub in rows:
+               if len(idx) < 2:
+                   continue
+               lo = np.where(a > 0, a * lb[idx], a * ub[idx])  # smallest contribution
+               hi = np.where(a > 0, a * ub[idx], a * lb[idx])  # largest contribution
+               n_lo_inf, n_hi_inf = np.isinf(lo).sum(), np.isinf(hi).sum()
+               lo_sum, hi_sum = lo[~np.isinf(lo)].sum(), hi[~np.isinf(hi)].sum()
+               new = np.full(len(idx), inf)
+               if row_ub < inf:
+                   # a_j x_j <= row_ub - (min activity of the others), for a_j > 0
+                   others = np.where(np.isinf(lo), np.where(n_lo_inf == 1, lo_sum, -inf),
+                                     np.where(n_lo_inf == 0, lo_sum - lo, -inf))
+                   new = np.where((a > 0) & np.isfinite(others), (row_ub - others) / np.where(a > 0, a, 1), new)
+               if row_lb > -inf:
+                   # a_j x_j >= row_lb - (max activity of the others), for a_j < 0
+                   others = np.where(np.isinf(hi), np.where(n_hi_inf == 1, hi_sum, inf),
+                                     np.where(n_hi_inf == 0, hi_sum - hi, inf))
+                   new = np.minimum(new, np.where((a < 0) & np.isfinite(others),
+                                                  (row_lb - others) / np.where(a < 0, a, -1), inf))
+               tighter = np.isfinite(new) & (new < ub[idx] - 1e-9 * np.maximum(1, np.abs(new)))
+               if tighter.any():
+                   ub[idx[tighter]] = new[tighter]
+                   changed = True
+           if not changed:
+               break
+   return ub
+
+
+def _sub_proto(proto, var_idx, row_idx, ub=None):
+   # the part of proto with only these variables and rows
+   local = {j: k for k, j in enumerate(var_idx)}
+   sub = linear_solver_pb2.MPModelProto()
+   sub.maximize = proto.maximize
+   for j in var_idx:
+       v = sub.variable.add()
+       v.CopyFrom(proto.variable[j])
+       if ub is not None:
+           v.upper_bound = min(v.upper_bound, ub[j])
+   for i in row_idx:
+       ct = proto.constraint[i]
+       c = sub.constraint.add()
+       c.name, c.lower_bound, c.upper_bound = ct.name, ct.lower_bound, ct.upper_bound
+       for j, a in zip(ct.var_index, ct.coefficient):
+           c.var_index.append(local[j])
+           c.coefficient.append(a)
+   return sub
+
+
+def _lp_duals(proto, rows):
+   # LP relaxation value and the duals of some rows (starting multipliers)
+   lp = linear_solver_pb2.MPModelProto()
+   lp.CopyFrom(proto)
+   for v in lp.variable:
+       v.is_integer = False
+   solver = pywraplp.Solver.CreateSolver('GLOP')
+   solver.LoadModelFromProto(lp)
+   if solver.Solve() != pywraplp.Solver.OPTIMAL:
+       return None, np.zeros(len(rows))
+   cons = solver.constraints()
+   return solver.Objective().Value(), np.array([cons[i].dual_value() for i in rows])
+
+
+def lagrangian(model, iterations=20, sub_time=5, heuristic_time=20, monolithic_time=None,
+              backend=None, solver_opts=None, callback=None, step=0.01):
+   """
+       Lagrangian decomposition over the sites: the coupling rows (Money, what
+       the moves and studio makes bring to the garage, ...) are priced with
+       multipliers, each site is solved as its own MIP, and the multipliers
+       follow a subgradient method started from the LP duals. Gives an upper
+       bound (maximizing) that is at least as good as the LP one as long as the
+       site MIPs are solved to optimality, the site best bounds are used so it
+       stays valid under the time limits. A feasible plan comes from fixing
+       the courier trips (Op_Trip_*) of the best multipliers and solving the
+       rest of the model. The model itself is not changed, except when
+       monolithic_time is given (then it is solved for comparison).
+       :param model: built ProductionModel
+       :param iterations: subgradient steps
+       :param sub_time: time limit per site MIP (s)
+       :param heuristic_time: time limit of the trip-fixed solve for the lower bound (s)
+       :param monolithic_time: also solve the monolithic model this long and report it
+       :param backend: solver of the sites, default the model's
+       :param callback: called as callback(entry) after every step
+       :param step: starting Polyak step factor, halved after 3 steps without progress
+       :return: dict with upper_bound, lower_bound, gap, lp_bound, blocks,
+           coupling_rows, history, warm_start and monolithic (if asked)
+       """
+   start = time.perf_counter()
+   backend = backend or model.backend
+   proto, block_vars, block_rows, coupling = split_model(model)
+   inf = float('inf')
+   c = np.array([v.objective_coefficient for v in proto.variable])
+   lb = np.array([proto.constraint[i].lower_bound for i in coupling])
+   ub = np.array([proto.constraint[i].upper_bound for i in coupling])
+   # coupling rows as a sparse list of (row, var, coef)
+   A_row, A_col, A_val = [], [], []
+   for k, i in enumerate(coupling):
+       ct = proto.constraint[i]
+       A_row += [k] * len(ct.var_index)
+       A_col += list(ct.var_index)
+       A_val += list(ct.coefficient)
+   A_row, A_col, A_val = np.array(A_row, dtype=np.int64), np.array(A_col, dtype=np.int64), np.array(A_val)
+
+
+   def rhs(lam):
+       # <= rows price with lam >= 0 against ub, >= rows with lam <= 0 against lb
+       return np.where(lam > 0, ub, np.where(lam < 0, lb, np.where(np.isfinite(ub), ub, lb)))
+
+
+   def project(lam):
+       lam = np.where(np.isinf(ub), np.minimum(lam, 0), lam)  # only a lower side
+       return np.where(np.isinf(lb), np.maximum(lam, 0), lam)  # only an upper side
+
+
+   lp_bound, lam = _lp_duals(proto, coupling)
+   lam = project(lam)
+
+
+   # one solver per site, only the objective changes between steps
+   var_ub = implied_upper_bounds(proto)
+   subs = {}
+   for site, var_idx in block_vars.items():
+       solver, params, _ = create_solver(backend, solver_opts)
+       solver.LoadModelFromProto(_sub_proto(proto, var_idx, block_rows[site], var_ub))
+       solver.set_time_limit(int(sub_time * 1000))
+       subs[site] = (solver, params, var_idx, solver.variables())
+
+
+   history = []
+   best_ub, best_lam, best_x = inf, lam, None
+   theta, stall = step, 0
+   target = model.solution.objective if model.solution is not None else None
+   for it in range(iterations):
+       price = c - np.bincount(A_col, weights=A_val * lam[A_row], minlength=len(c))
+       x = np.zeros(len(c))
+       bound = float(lam @ rhs(lam))
+       for site, (solver, params, var_idx, variables) in subs.items():
+           objective = solver.Objective()
+           for var, coef in zip(variables, price[var_idx]):
+               objective.SetCoefficient(var, float(coef))
+           objective.SetMaximization()
+           status = solver.Solve(params)
+           if status not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+               raise RuntimeError(f"{site} subproblem has no solution in {sub_time}s (status {status})")
+           response = linear_solver_pb2.MPSolutionResponse()
+           solver.FillSolutionResponseProto(response)
+           x[var_idx] = response.variable_value
+           bound += objective.BestBound()
+
+
+       # subgradient of L at lam, a step against it lowers the bound
+       g = rhs(lam) - np.bincount(A_row, weights=A_val * x[A_col], minlength=len(coupling))
+       if bound < best_ub - 1e-6:
+           best_ub, best_lam, best_x, stall = bound, lam, x, 0
+       else:
+           stall += 1
+           if stall >= 3:
+               theta, stall = theta / 2, 0
+       goal = target if target is not None else best_ub - 0.05 * abs(best_ub)
+       norm = float(g @ g)
+       entry = {'iteration': it, 'bound': bound, 'best_bound': best_ub, 'theta': theta,
+                'violation': float(np.sqrt(norm)), 'elapsed': time.perf_counter() - start}
+       history.append(entry)
+       if callback:
+           callback(entry)
+       if norm < 1e-12:
+           break  # the site solutions agree on every coupling row
+       lam = project(lam - theta * max(bound - goal, 1e-6) / norm * g)
+
+
+   result = {'upper_bound': best_ub, 'lp_bound': lp_bound,
+             'blocks': {s: (len(v), len(block_rows[s])) for s, v in block_vars.items()},
+             'coupling_rows': len(coupling), 'history': history}
+   result.update(_trip_heuristic(model, proto, best_x, heuristic_time, backend, solver_opts))
+   if result.get('lower_bound') is not None:
+       lo = result['lower_bound']
+       result['gap'] = abs(best_ub - lo) / max(abs(lo), 1e-9)
+   if monolithic_time is not None:
+       model.solver.set_time_limit(int(monolithic_time * 1000))
+       model.solve()
+       if model.time_limit is not None:
+           model.solver.set_time_limit(int(model.time_limit * 1000))
+       result['monolithic'] = {k: model.solve_stats().get(k)
+                               for k in ('status', 'objective', 'best_bound', 'gap', 'wall_time_ms')}
+   result['elapsed'] = time.perf_counter() - start
+   return result
+
+
+def _trip_heuristic(model, proto, x, time_limit, backend, solver_opts):
+   # lower bound: the courier trips of the site solutions fixed, the rest
+   # solved as one MIP with the site solutions as hint
+   if x is None:
+       return {'lower_bound': None}
+   fixed = linear_solver_pb2.MPModelProto()
+   fixed.CopyFrom(proto)
+   trips = model.optable.kind == OpKind.TRIP
+   trip_ops = {op for op, is_trip in zip(model.optable.ops, trips) if is_trip}
+   for (t, op), var in model.z.items():
+       if op in trip_ops:
+           v = fixed.variable[var.index()]
+           v.lower_bound = v.upper_bound = round(x[var.index()])
+   solver, params, _ = create_solver(backend, solver_opts)
+   solver.LoadModelFromProto(fixed)
+   solver.set_time_limit(int(time_limit * 1000))
+   solver.SetHint(solver.variables(), [float(v) for v in x])
+   status = solver.Solve(params)
+   if status not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+       return {'lower_bound': None}
+   response = linear_solver_pb2.MPSolutionResponse()
+   solver.FillSolutionResponseProto(response)
+   values = np.array(response.variable_value)
+   warm_start = {family: {key: float(values[var.index()]) for key, var in getattr(model, family).items()}
+                 for family in ('z', 'BinOp', 'Stock', 'Scrap')}
+   return {'lower_bound': solver.Objective().Value(), 'warm_start': warm_start}
@@ -0,0 +1,303 @@
+# write a built model to MPS/LP with compact names, and solve saved files
+
+
+import argparse
+import json
+import os
+
+from ortools.linear_solver import linear_solver_pb2, pywraplp
+from ortools.linear_solver.python import model_builder_helper as mbh
+
+from hw10_solver import create_solver
+
+
+# constraint families and how their keys look, see ProductionModel._add_constraints
+ROW_KEYS = {'R_Balance': ('t', 'res'), 'ForceBinOp': ('t', 'op'), 'ForceMinOp': ('t', 'op'),
+           'Doug_EitherOr': ('t',), 'LimitScrap': ('res',)}
+VAR_KEYS = {'z': 'op', 'BinOp': 'op', 'Stock': 'res', 'Scrap': 'res'}
+
+
+def compact_names(model):
+   """
+       Short names that are valid in MPS/LP and stable between builds of the
+       same data: family_<period index>_<index in the sorted op/resource names>,
+       e.g. z_3_17 or R_Balance_3_5.
+       :return: (var names, row names, key map), the names are lists by solver
+           index, key map is {name: [family, key...]} to go back
+       """
+   t_pos = {t: i for i, t in enumerate(model.TIME)}
+   pos = {'op': {op: j for j, op in enumerate(sorted(model.OPERATIONS))},
+          'res': {r: j for j, r in enumerate(sorted(model.RESOURCE))},
+          't': t_pos}
+   var_names = [None] * model.solver.NumVariables()
+   row_names = [None] * model.solver.NumConstraints()
+   keys = {}
+
+
+   for family, kind in VAR_KEYS.items():
+       for (t, k), var in getattr(model, family).items():
+           name = f'{family}_{t_pos[t]}_{pos[kind][k]}'
+           var_names[var.index()] = name
+           keys[name] = [family, t, k]
+   for family, rows in model.constraints.items():
+       kinds = ROW_KEYS[family]
+       for key, ct in rows.items():
+           key = key if isinstance(key, tuple) else (key,)
+           name = '_'.join([family] + [str(pos[kind][k]) for kind, k in zip(kinds, key)])
+           row_names[ct.index()] = name
+           keys[name] = [family, *key]
+   return var_names, row_names, keys
+
+
+def _num(v):
+   # shortest text that reads back as the same float (the OR-Tools writers
+   # round to 6 digits, which changes the discounted prices)
+   return repr(float(v))
+
+
+def _bounds(lb, ub, is_int):
+   # MPS BOUNDS lines of a column ([0, inf] continuous needs none, integers
+   # always get an upper bound: some readers default them to [0, 1])
+   inf = float('inf')
+   if lb == ub:
+       return [('FX', lb)]
+   if lb == -inf and ub == inf:
+       return [('FR', None)]
+   out = []
+   if lb == -inf:
+       out.append(('MI', None))
+   elif lb != 0 or ub < 0:
+       out.append(('LO', lb))
+   if ub < inf:
+       out.append(('UP', ub))
+   elif is_int:
+       out.append(('PL', None))
+   return out
+
+
+def write_mps(proto, name='hw10'):
+   """Free-format MPS text of an MPModelProto, numbers at full precision."""
+   inf = float('inf')
+   lines = [f'NAME {name}']
+   if proto.maximize:
+       lines += ['OBJSENSE', '    MAX']
+   lines += ['ROWS', ' N  obj']
+   ranges, rhs = [], []
+   for ct in proto.constraint:
+       lb, ub = ct.lower_bound, ct.upper_bound
+       if lb == ub:
+           kind, b = 'E', lb
+       elif lb == -inf:
+           kind, b = 'L', ub
+       else:
+           kind, b = 'G', lb
+           if ub < inf:
+               ranges.append((ct.name, ub - lb))  # G row with range: [lb, lb + R]
+       if b != 0 and abs(b) < inf:
+           rhs.append((ct.name, b))
+       lines.append(f' {kind}  {ct.name}')
+
+
+   columns = [[] for _ in proto.variable]
+   for ct in proto.constraint:
+       for j, a in zip(ct.var_index, ct.coefficient):
+           if a != 0:
+               columns[j].append((ct.name, a))
+   lines.append('COLUMNS')
+   in_int = False
+   for var, col in zip(proto.variable, columns):
+       if var.is_integer != in_int:
+           lines.append(f"    MARKER  'MARKER'  '{'INTORG' if var.is_integer else 'INTEND'}'")
+           in_int = var.is_integer
+       if var.objective_coefficient != 0:
+           col = [('obj', var.objective_coefficient)] + col
+       if not col:
+           col = [('obj', 0.0)]  # keep the column even if it's in no row
+       for row, a in col:
+           lines.append(f'    {var.name}  {row}  {_num(a)}')
+   if in_int:
+       lines.append("    MARKER  'MARKER'  'INTEND'")
+
+
+   lines.append('RHS')
+   if proto.objective_offset:
+       lines.append(f'    RHS  obj  {_num(-proto.objective_offset)}')
+   lines += [f'    RHS  {row}  {_num(b)}' for row, b in rhs]
+   if ranges:
+       lines.append('RANGES')
+       lines += [f'    RNG  {row}  {_num(r)}' for row, r in ranges]
+   lines.append('BOUNDS')
+   for var in proto.variable:
+       for kind, b in _bounds(var.lower_bound, var.upper_bound, var.is_integer):
+           lines.append(f' {kind} BND  {var.name}' + ('' if b is None else f'  {_num(b)}'))
+   lines.append('ENDATA')
+   return '\n'.join(lines) + '\n'
+
+
+def write_lp(proto, terms_per_line=8):
+   """CPLEX LP text of an MPModelProto (ranged rows split in _lhs/_rhs)."""
+   inf = float('inf')
+   names = [var.name for var in proto.variable]
+
+
+   def expr(pairs):
+       terms = [f"{'+' if a >= 0 else '-'} {_num(abs(a))} {names[j]}" for j, a in pairs if a != 0]
+       chunks = [' '.join(terms[i:i + terms_per_line])
+                 for i in range(0, len(terms), terms_per_line)] or ['0 ' + names[0]]
+       return '\n   '.join(chunks)
+
+
+   obj = [(j, var.objective_coefficient) for j, var in enumerate(proto.variable)]
+   lines = ['\\ written by hw10_export', 'Maximize' if proto.maximize else 'Minimize',
+            f' obj: {expr(obj)}' + (f' + {_num(proto.objective_offset)}'
+                                     if proto.objective_offset else ''),
+            'Subject To']
+   for ct in proto.constraint:
+       body = expr(zip(ct.var_index, ct.coefficient))
+       lb, ub = ct.lower_bound, ct.upper_bound
+       if lb == ub:
+           lines.append(f' {ct.name}: {body} = {_num(lb)}')
+           continue
+       if lb > -inf:
+           suffix = '_lhs' if ub < inf else ''
+           lines.append(f' {ct.name}{suffix}: {body} >= {_num(lb)}')
+       if ub < inf:
+           suffix = '_rhs' if lb > -inf else ''
+           lines.append(f' {ct.name}{suffix}: {body} <= {_num(ub)}')
+
+
+   lines.append('Bounds')
+   for var in proto.variable:
+       lb, ub = var.lower_bound, var.upper_bound
+       if lb == ub:
+           lines.append(f' {var.name} = {_num(lb)}')
+       elif lb == -inf and ub == inf:
+           lines.append(f' {var.name} free')
+       else:
+           lo = '-inf' if lb == -inf else _num(lb)
+           hi = '+inf' if ub == inf else _num(ub)
+           lines.append(f' {lo} <= {var.name} <= {hi}')
+   ints = [var.name for var in proto.variable if var.is_integer]
+   if ints:
+       lines.append('Generals')
+       lines += [' ' + ' '.join(ints[i:i + 10]) for i in range(0, len(ints), 10)]
+   lines.append('End')
+   return '\n'.join(lines) + '\n'
+
+
+def export_model(model, path, names_path=None):
+   """
+       Writes the model as it is now (after any in-place edits) to an MPS or
+       LP file, picked by the extension (.mps/.lp). A JSON file next to it
+       maps the compact names back to the model keys. Only MPS can be read
+       back by solve_file, LP (CPLEX format) is for other solvers' tools.
+       :param model: ProductionModel
+       :param path: output file, .mps or .lp
+       :param names_path: where the name map goes, default path + '.names.json'
+       :return: path of the name map
+       """
+   var_names, row_names, keys = compact_names(model)
+   proto = linear_solver_pb2.MPModelProto()
+   model.solver.ExportModelToProto(proto)
+   for var, name in zip(proto.variable, var_names):
+       var.name = name
+   for ct, name in zip(proto.constraint, row_names):
+       ct.name = name
+
+
+   if path.endswith('.mps'):
+       text = write_mps(proto)
+   elif path.endswith('.lp'):
+       text = write_lp(proto)
+   else:
+       raise ValueError(f"can't tell the format of {path}, use .mps or .lp")
+   with open(path, 'w') as f:
+       f.write(text)
+
+
+   names_path = names_path or path + '.names.json'
+   with open(names_path, 'w') as f:
+       json.dump({'TIME': list(model.TIME), 'keys': keys}, f)
+   return names_path
+
+
+def load_file(path):
+   """Reads an MPS file into an MPModelProto."""
+   if not path.endswith('.mps'):
+       # the OR-Tools LP reader only takes lp_solve syntax, not the CPLEX LP
+       # the writer puts out, so .lp files are for other engines (gurobi_cl,
+       # cplex, highs) and MPS is the one we read back
+       raise ValueError(f"only .mps files can be loaded here, got {path}")
+   helper = mbh.ModelBuilderHelper()
+   ok = helper.import_from_mps_file(path)
+   if not ok:
+       raise ValueError(f"could not read {path}")
+   return mbh.to_mpmodel_proto(helper)
+
+
+def solve_file(path, backend='auto', solver_opts=None, names_path=None):
+   """
+       Solves a saved model without building it in Python.
+       :param path: .mps file written by export_model (or any other)
+       :param backend: see hw10_solver.create_solver
+       :param solver_opts: see hw10_solver.solver_settings
+       :param names_path: name map, default path + '.names.json' if it exists
+       :return: dict with status, backend, objective, best_bound, wall_time_ms,
+           values {name: value} and, with a name map, warm_start keyed like the
+           model variables (for ProductionModel.set_hint)
+       """
+   proto = load_file(path)
+   solver, params, name = create_solver(backend, solver_opts)
+   solver.LoadModelFromProtoKeepNames(proto)
+   status = solver.Solve(params)
+   result = {'status': status, 'backend': name, 'wall_time_ms': solver.wall_time()}
+   if status not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+       return result
+
+
+   response = linear_solver_pb2.MPSolutionResponse()
+   solver.FillSolutionResponseProto(response)
+   values = dict(zip((v.name for v in proto.variable), response.variable_value))
+   result.update({'objective': solver.Objective().Value(),
+                  'best_bound': solver.Objective().BestBound(),
+                  'values': values})
+
+
+   names_path = names_path or path + '.names.json'
+   if os.path.exists(names_path):
+       with open(names_path) as f:
+           keys = json.load(f)['keys']
+       warm_start = {family: {} for family in VAR_KEYS}
+       for var, val in values.items():
+           if var in keys:
+               family, t, k = keys[var]
+               warm_start[family][t, k] = val
+       result['warm_start'] = warm_start
+   return result
+
+
+def main(argv=None):
+   parser = argparse.ArgumentParser(description='Solve an MPS model saved with export_model.')
+   parser.add_argument('path', help='.mps file')
+   parser.add_argument('--backend', default='auto')
+   parser.add_argument('--time-limit', type=float, help='seconds')
+   parser.add_argument('--gap', type=float)
+   parser.add_argument('--threads', type=int)
+   parser.add_argument('--out', help='write the result as JSON here')
+   args = parser.parse_args(argv)
+
+
+   opts = {k: v for k, v in (('time_limit', args.time_limit), ('gap', args.gap),
+                             ('threads', args.threads)) if v is not None}
+   result = solve_file(args.path, args.backend, opts)
+   print(f"status {result['status']}  backend {result['backend']}  "
+         f"objective {result.get('objective')}  bound {result.get('best_bound')}  "
+         f"{result['wall_time_ms']} ms")
+   if args.out:
+       result.pop('warm_start', None)  # tuple keys, the values cover it
+       with open(args.out, 'w') as f:
+           json.dump(result, f, indent=1)
+
+
+if __name__ == '__main__':
+   main()
@@ -0,0 +1,285 @@
+# fast approximate plans: LP relaxation, then a rounding heuristic that
+# knows the model structure, then (optionally) a short MIP from that plan
+
+
+import time
+
+import numpy as np
+from ortools.linear_solver import linear_solver_pb2, pywraplp
+
+from hw10_data_conversion import OpKind
+from hw10_solution import Solution
+from hw10_solver import create_solver
+
+
+# rounding order: what gets decided first, and the roundings tried (in order)
+# on a period's variables until the LP stays feasible. Buys go up (the LP
+# likes to split lots), makes before moves (moving made goods needs the makes
+# settled), ships down first and up only if the money for fixed buys runs out
+STAGES = [((OpKind.BUY, OpKind.SEAMSTRESS), (np.ceil, np.round, np.floor)),
+         ((OpKind.MAKE,), (np.round, np.floor)),
+         ((OpKind.MOVE,), (np.ceil, np.floor)),
+         ((OpKind.SHIP,), (np.floor, np.ceil))]
+
+
+EPS = 1e-6
+
+
+def _relaxed(proto):
+   # GLOP solver on proto with every integer relaxed. Without its presolve a
+   # bound change re-solves from the last basis (a few ms instead of a cold
+   # solve every time). None if the proto doesn't load (bad bounds), GLOP
+   # would happily solve the empty model instead
+   lp = linear_solver_pb2.MPModelProto()
+   lp.CopyFrom(proto)
+   for v in lp.variable:
+       v.is_integer = False
+   solver = pywraplp.Solver.CreateSolver('GLOP')
+   if solver.LoadModelFromProto(lp):
+       return None
+   solver.SetSolverSpecificParametersAsString('use_preprocessing: false')
+   return solver
+
+
+def _values(solver):
+   response = linear_solver_pb2.MPSolutionResponse()
+   solver.FillSolutionResponseProto(response)
+   return np.array(response.variable_value)
+
+
+def _round(mode, x):
+   # a hair towards the LP value, so 2.0000001 doesn't ceil to 3
+   return float(mode(x - EPS if mode is np.ceil else x + EPS))
+
+
+def fix_binaries(model, x, min_share=0.5):
+   """
+       0/1 values for the yes/no variables from an LP solution: a courier trip
+       or schedule op runs if the LP uses any of it (at most one of PickupTime/
+       DeliverTime on the Doug_EitherOr days, the bigger one), a min-lot buy
+       runs if the LP buys at least min_share of the lot and the lot fits its
+       bound.
+       :param x: LP values by solver index
+       :return: {solver index: 0. or 1.}
+       """
+   fix = {}
+   for t in model.TIME:
+       pickup = model.z.get((t, 'Op_Make_PickupTime'))
+       deliver = model.z.get((t, 'Op_Make_DeliverTime'))
+       vp = x[pickup.index()] if pickup else 0
+       vd = x[deliver.index()] if deliver else 0
+       if t in model.constraints['Doug_EitherOr'] and vp > EPS and vd > EPS:
+           vp, vd = (vp, 0) if vp >= vd else (0, vd)
+       if pickup:
+           fix[pickup.index()] = float(vp > EPS)
+       if deliver:
+           fix[deliver.index()] = float(vd > EPS)
+
+
+   table = model.optable
+   for (t, op), var in model.z.items():
+       if table.kind[table.op_id[op]] == OpKind.TRIP:
+           fix[var.index()] = float(x[var.index()] > EPS)
+   for (t, op), b in model.BinOp.items():
+       z = model.z[t, op]
+       lot = model.min_buy_ops[op]
+       fix[b.index()] = float(x[z.index()] >= min_share * lot and z.ub() >= lot)
+   return fix
+
+
+def round_plan(model, proto, fix):
+   """
+       Integer values for the general integer ops, with the binaries fixed.
+       Stage by stage (see STAGES) and period by period, the period's ops are
+       rounded together and the LP re-solved; if that is infeasible, they are
+       rounded one at a time and the ones that still don't fit stay free.
+       Re-solves only change bounds, so GLOP starts from the last basis.
+       :param fix: {solver index: value} from fix_binaries
+       :return: (values by solver index, LP objective, free integers left,
+           LPs solved), values None if the fixed LP is infeasible
+       """
+   solver = _relaxed(proto)
+   if solver is None:
+       return None, None, [], 0
+   variables = solver.variables()
+   for j, val in fix.items():
+       variables[j].SetBounds(val, val)
+   n_lp = 1
+   if solver.Solve() != pywraplp.Solver.OPTIMAL:
+       return None, None, [], n_lp
+
+
+   def resolve():
+       # pywraplp drops the values once a bound changes, so keep a copy
+       nonlocal n_lp, x, obj
+       n_lp += 1
+       if solver.Solve() != pywraplp.Solver.OPTIMAL:
+           return False
+       x, obj = _values(solver), solver.Objective().Value()
+       return True
+
+
+   def unfix(js):
+       for j in js:
+           variables[j].SetBounds(proto.variable[j].lower_bound, proto.variable[j].upper_bound)
+
+
+   x, obj = _values(solver), solver.Objective().Value()
+   table = model.optable
+   left = []
+   for kinds, modes in STAGES:
+       # by op name, so the plan doesn't depend on the set order of the build
+       by_period = [[] for _ in model.TIME]
+       for (t, op) in sorted(model.z):
+           j = model.z[t, op].index()
+           if table.kind[table.op_id[op]] in kinds and j not in fix:
+               by_period[model.t_pos[t]].append(j)
+       for js in by_period:
+           if not js:
+               continue
+           if np.all(np.abs(x[js] - np.round(x[js])) <= EPS):
+               for j in js:
+                   variables[j].SetBounds(round(x[j]), round(x[j]))
+               continue
+           lp_x = x[js]
+           for mode in modes:
+               for j, xj in zip(js, lp_x):
+                   val = _round(mode, xj)
+                   variables[j].SetBounds(val, val)
+               if resolve():
+                   break
+           else:
+               # one at a time, from a solution with the period free again
+               unfix(js)
+               resolve()
+               for j in js:
+                   xj = x[j]
+                   for mode in modes:
+                       val = _round(mode, xj)
+                       variables[j].SetBounds(val, val)
+                       if resolve():
+                           break
+                   else:
+                       unfix([j])
+                       resolve()
+                       left.append(j)
+   return x, obj, left, n_lp
+
+
+def _solve_fixed(model, proto, fixed, time_limit, hint=None):
+   # the model with some integers fixed, on a solver of its own (SCIP makes
+   # the ones fixed at 0/1 binaries and won't take the old bounds back),
+   # with the model's solver options, only the time limit is its own
+   sub = linear_solver_pb2.MPModelProto()
+   sub.CopyFrom(proto)
+   for j, val in fixed.items():
+       sub.variable[j].lower_bound = sub.variable[j].upper_bound = val
+   solver, params, backend = create_solver(model.backend, model.solver_opts)
+   if solver.LoadModelFromProto(sub):
+       return None
+   solver.set_time_limit(max(1, int(time_limit * 1000)))
+   if hint is not None:
+       solver.SetHint(solver.variables(), [float(v) for v in hint])
+   status = solver.Solve(params)
+   if status not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+       return None
+   obj, bound = solver.Objective().Value(), solver.Objective().BestBound()
+   stats = {'backend': backend, 'status': status, 'nodes': solver.nodes(),
+            'iterations': solver.iterations(), 'wall_time_ms': solver.wall_time(),
+            'objective': obj, 'best_bound': bound, 'gap': abs(bound - obj) / max(abs(obj), 1e-9)}
+   return Solution(model, _values(solver), stats)
+
+
+def solve_fast(model, resolve_time=0.0, min_share=0.5, fix_time=1.0):
+   """
+       Approximate plan in about a second: solves the LP relaxation (the
+       bound), fixes the binaries (fix_binaries), rounds the integer ops
+       (round_plan) and solves the model with all rounded integers fixed, so
+       the rest (stock, scrap, anything left fractional) is optimal for that
+       plan. With resolve_time, the full model then gets that many seconds
+       with the plan as MIP start and keeps whatever is better.
+       model.solution is the plan afterwards, so report/kpis work as usual.
+       :param resolve_time: seconds of fix-and-resolve, 0 to skip
+       :param min_share: share of a min lot the LP has to buy to buy the lot
+       :param fix_time: seconds for the MIP with the rounded integers fixed
+           (all tries together), it only has leftovers to settle
+       :return: {'status', 'objective', 'lp_bound', 'gap', 'rounded' (LP
+           value of the rounded plan), 'left' (integers left to the MIP),
+           'lps', 'timings'}
+       """
+   start = time.perf_counter()
+   timings = {}
+   with model.profile.phase('fast') as ph:
+       proto = linear_solver_pb2.MPModelProto()
+       model.solver.ExportModelToProto(proto)
+       lp = _relaxed(proto)
+       status = lp.Solve() if lp is not None else pywraplp.Solver.MODEL_INVALID
+       if status != pywraplp.Solver.OPTIMAL:
+           model.status, model.solution = status, None
+           return {'status': model.status, 'objective': None, 'lp_bound': None, 'gap': None}
+       bound = lp.Objective().Value()
+       x = _values(lp)
+       timings['lp'] = time.perf_counter() - start
+
+
+       # falls back to buying only full lots the LP already buys
+       for share in (min_share, 1.0):
+           fix = fix_binaries(model, x, share)
+           values, rounded, left, n_lp = round_plan(model, proto, fix)
+           if values is not None:
+               break
+       timings['round'] = time.perf_counter() - start - timings['lp']
+       ph.update({'lps': n_lp + 1, 'left': len(left)})
+   result = {'lp_bound': bound, 'rounded': rounded, 'left': len(left), 'lps': n_lp + 1}
+   if values is None:
+       model.status = pywraplp.Solver.NOT_SOLVED
+       model.solution = None
+       result.update(status=model.status, objective=None, gap=None, timings=timings)
+       return result
+
+
+   # the model with the rounded integers fixed and the periods of any
+   # leftovers free (a small MIP), or else everything from the first of them on
+   period = {var.index(): model.t_pos[t] for name in ('z', 'BinOp')
+             for (t, _), var in getattr(model, name).items()}
+   ints = [j for j, v in enumerate(proto.variable) if v.is_integer]
+   open_periods = {period[j] for j in left}
+   tries = [open_periods]
+   if open_periods:
+       tries.append(set(range(min(open_periods), len(model.TIME))))
+   deadline = time.perf_counter() + fix_time
+   best = None
+   for free in tries:
+       budget = deadline - time.perf_counter()
+       if budget <= 0:
+           break
+       fixed = {j: round(values[j]) for j in ints if period.get(j) not in free}
+       best = _solve_fixed(model, proto, fixed, budget, None if left else values)
+       if best is not None:
+           break
+   model.solution = best
+   model.status = best.stats['status'] if best is not None else pywraplp.Solver.NOT_SOLVED
+   timings['fix'] = time.perf_counter() - start - timings['lp'] - timings['round']
+
+
+   if resolve_time and best is not None:
+       model.set_hint(best.warm_start)
+       model.solver.set_time_limit(int(resolve_time * 1000))
+       try:
+           model.solve()
+       finally:
+           if model.time_limit is not None:
+               model.solver.set_time_limit(int(model.time_limit * 1000))
+       if model.solution is None or model.solution.objective < best.objective:
+           model.solution = best
+       bound = min(bound, model.solver.Objective().BestBound()) if model.has_solution() else bound
+       timings['resolve'] = time.perf_counter() - start - sum(timings.values())
+
+
+   timings['total'] = time.perf_counter() - start
+   if best is not None and model.solution is best:
+       model.status = best.stats['status']
+   objective = model.solution.objective if model.solution is not None else None
+   result.update(status=model.status, objective=objective, lp_bound=bound, timings=timings,
+                 gap=None if objective is None else abs(bound - objective) / max(abs(objective), 1e-9))
+   return result
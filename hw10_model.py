@@ -3,429 +3,979 @@
 
 from ortools.linear_solver import pywraplp
 from collections import defaultdict
+import time
+import numpy as np
+from hw10_solver import create_solver, solver_settings
+from hw10_profile import Profile
+from hw10_solution import Solution, print_report
+from hw10_data_conversion import (NETWORK_KEYS, build_network, cached_data_to_op, compile_op_table,
+                                  demand_entries, network_of, op_cache_stats)
+from hw10_bounds import (GATE_OPS, propagate_bounds, horizon_totals, useful_bounds,
+                        gate_capacities)
+from hw10_presolve import dominated_recipes, presolve as presolve_ops
 
 
-# helper method
-def prev(TIME, t, n=1):
-   """
-       Helper method to select an element from an ordered set.
-       :param TIME: Ordered set
-       :param t: index of current element
-       :param n: shift steps
-       :return: element at requested position
-       """
-   if TIME.index(t) - n < 0:
-       return None  # Return None if index is out of bounds
-   return TIME[TIME.index(t) - n]
-
-
-def Hw9_model(MATERIAL, CAPACITY, CUSTOMER, TIME,
-             usage, sub_usage, demand, supply,
-             init_funds, min_buy, max_buy, friday,
-             # NEW HW8 PARAMETERS
-             OPERATIONS,
-             BOR, BOP, usage_param, produce_param, offset_param,
-             baseprice, p_disc, mult={},
-
-
-             scrap_pen={}, stoc_pen={}, make_pen={}):
-   """Multiple Level Multiple Product Resource Allocation Model with substitution,Procurement
-    and multiple demands (store, online), and different source of labor modeled as Operations"""
-
-
-   # Solver
-   # Create the mip solver with the SCIP backend.
-   solver = pywraplp.Solver.CreateSolver('gurobi')
-   infinity = solver.infinity()
-
-
-   # Set
-   # MATERIAL now includes 'Money' from the data file
-   RESOURCE = MATERIAL.union(CAPACITY)
-
-
-   # These are only used for the make_pen objective
-   BOM = set(usage.keys())
-   PROD = {p for (p, r) in BOM}
-   SUB_TRIPLES = set(sub_usage.keys())
-
-
-   # BigM is only needed for min_buy
-   BigM = 1e9
-   alpha = .5
-
-
-   # Param Default values
-   min_buy = defaultdict(lambda: 1, min_buy)
-   supply = defaultdict(lambda: 0, supply)
-   supply[('Money', TIME[0])] = init_funds
-   demand = defaultdict(lambda: [0] * len(TIME), demand)
-   mult = defaultdict(lambda: 1, mult)
-   sub_pen = defaultdict(lambda: 2 * alpha)
-   scrap_pen = defaultdict(lambda: alpha, scrap_pen)
-   stoc_pen = defaultdict(lambda: .5 * alpha, stoc_pen)
-   make_pen = defaultdict(lambda: alpha, make_pen)
+# names a data set (in the shape of hw10_data_orig.py) has to provide,
+# mult, the penalties and the location/lane tables are optional
+DATA_KEYS = ['MATERIAL', 'CAPACITY', 'CUSTOMER', 'NO_LATE', 'TIME',
+            'usage', 'sub_usage', 'ord_cost', 'ord_qty', 'demand', 'baseprice', 'supply',
+            'init_funds', 'min_buy', 'max_buy', 'friday', 'p_disc']
+OPTIONAL_KEYS = ['mult', 'scrap_pen', 'stoc_pen', 'make_pen'] + NETWORK_KEYS
 
 
+# variable dicts that make up a warm start, keyed (t, op) or (t, r)
+WARM_START_VARS = ['z', 'BinOp', 'Stock', 'Scrap']
 
 
-   # adding demand as supply
-   for c in CUSTOMER:
-       for r in MATERIAL:
-           if any(demand.get((r, c), [0] * len(TIME))[i] > 0 for i in range(len(TIME))):
-               demand_res = f"D_{c}_{r}"
-               for t in TIME:
-                   t_index = TIME.index(t)
-                   period_demand = demand.get((r, c), [0] * len(TIME))[t_index]
-                   if period_demand > 0:
-                       supply[(demand_res, t)] = period_demand
-
-
-   # Mapping resource-level min buys to operation-level min buys
-   min_buy_ops = {f"Buy_{r}": v for r, v in min_buy.items()}
-   HAS_MIN_OPS = {op for op in OPERATIONS if min_buy_ops.get(op, 1) > 1}
+def is_binary_op(op):
+   """Schedule and courier trip ops are yes/no decisions."""
+   return (op == 'Op_Make_PickupTime' or op == 'Op_Make_DeliverTime' or
+           op.startswith('Op_Trip_'))
 
 
-   # for r in RESOURCE:
-   #     if r.startswith('D_'):
-   #         scrap_pen[r] =BigM
+class ProductionModel:
+   """Multiple Level Multiple Product Resource Allocation Model with substitution,Procurement
+    and multiple demands (store, online), and different source of labor modeled as Operations.
+
+    The model is built once; supply, demand, prices, objective coefficients and
+    max_buy bounds can be changed in place and solve()/replan() called again
+    without rebuilding.
+    With presolve=True the ops/resources that can never matter are left out
+    (see hw10_presolve), edits that would bring them back need a rebuild."""
+
+
+   def __init__(self, MATERIAL, CAPACITY, CUSTOMER, TIME,
+                usage, sub_usage, demand, supply,
+                init_funds, min_buy, max_buy, friday,
+                # NEW HW8 PARAMETERS
+                OPERATIONS,
+                BOR, BOP, usage_param, produce_param, offset_param,
+                baseprice, p_disc, mult={},
+
+
+                scrap_pen={}, stoc_pen={}, make_pen={},
+                # solver backend ('auto' picks the first available one)
+                backend='auto', solver_opts=None,
+                # derive Big-Ms from the data instead of the fixed values (forward
+                # bounds, always valid), 'demand' also caps ops by downstream
+                # demand, smaller but may cut off the optimum (see useful_bounds)
+                tighten_bigm=True,
+                # drop dead ops/resources before creating variables
+                presolve=False,
+                # 'scalar' (solver.Add row by row) or 'sparse' (hw10_assembly)
+                assembly='scalar',
+                # phase timings/counts go here (see hw10_profile.Profile)
+                profile=None,
+                # locations/lanes the ops were built with (hw10_data_conversion.Network),
+                # default read off the location copies in MATERIAL
+                network=None,
+                # a window of a longer horizon (hw10_rolling): friday may fall
+                # outside TIME, then every day in TIME is either/or
+                window=False):
+
+
+       # Solver
+       # Create the mip solver, falls back to whatever backend is installed
+       # (threads/time limit/gap/presolve come from hw10_solver.SOLVER_DEFAULTS)
+       self.solver, self.params, self.backend = create_solver(backend, solver_opts)
+       self.solver_opts = solver_opts  # for the solvers hw10_fast makes of its own
+       self.time_limit = solver_settings(self.backend, solver_opts).get('time_limit')  # s
+       self.status = None
+       self.solution = None  # Solution of the last successful solve
+       self.var_layout = None  # where the variables sit, see hw10_solution
+
+
+       self.MATERIAL, self.CAPACITY, self.CUSTOMER, self.TIME = MATERIAL, CAPACITY, CUSTOMER, TIME
+       self.usage, self.sub_usage = usage, sub_usage
+       self.init_funds, self.max_buy, self.friday = init_funds, max_buy, friday
+       self.max_buy_override = {}  # (r, t) -> ub, from set_max_buy
+       self.OPERATIONS, self.BOR, self.BOP = OPERATIONS, BOR, BOP
+       self.usage_param, self.produce_param, self.offset_param = usage_param, produce_param, offset_param
+       self.baseprice, self.p_disc = dict(baseprice), p_disc  # copy, set_prices changes it
+       self.network = network if network is not None else network_of(MATERIAL)
+       self.window = window
+
+
+       # Variables
+       self.Scrap = {}
+       self.Stock = {}
+       self.z = {}
+       self.BinOp = {}
+
+
+       # Constraint handles: family -> key -> constraint
+       self.constraints = defaultdict(dict)
+
+
+       self.presolve = presolve
+       self.dead = set()  # (t, op) fixed to 0 by presolve, no z for those
+       self.unreduced = None  # sets before presolve
+       self.replaced = {}  # make recipes dropped by presolve -> the one kept instead
+       self.presolve_stats = {}
+       self.profile = profile if profile is not None else Profile()
+       prof = self.profile
+
+
+       with prof.phase('params'):
+           supply, demand = self._set_params(supply, demand, min_buy, mult,
+                                             scrap_pen, stoc_pen, make_pen)
+       with prof.phase('demand_to_supply') as ph:
+           self._add_demand_supply(supply, demand)
+           ph['demand_res'] = len({r for (r, t) in self.supply if r.startswith('D_')})
+       if presolve:
+           with prof.phase('presolve') as ph:
+               self._presolve()
+               ph.update(self.presolve_stats)
+       with prof.phase('index'):
+           self._index_ops()
+       if tighten_bigm not in (True, False, 'demand'):
+           raise ValueError(f"unknown tighten_bigm {tighten_bigm!r}, use True, False or 'demand'")
+       self.tighten_bigm = tighten_bigm
+       self.op_ub, self.gate_cap = {}, {}
+       if tighten_bigm:
+           with prof.phase('bounds'):
+               self._tighten_big_m()
+       if assembly == 'sparse':
+           # same model built from sparse arrays, for large instances (needs scipy)
+           from hw10_assembly import assemble
+           with prof.phase('assemble') as ph:
+               assemble(self)
+               ph.update(self._var_counts())
+               ph.update({f'rows.{k}': len(v) for k, v in self.constraints.items()})
+       elif assembly == 'scalar':
+           with prof.phase('variables') as ph:
+               self._add_variables()
+               ph.update(self._var_counts())
+           self._add_constraints()
+           with prof.phase('objective'):
+               self._set_objective()
+       else:
+           raise ValueError(f"unknown assembly {assembly!r}, use 'scalar' or 'sparse'")
+
+
+   @property
+   def timings(self):
+       """{phase: seconds} of the build phases and solves so far."""
+       return self.profile.timings()
+
+
+   def _set_params(self, supply, demand, min_buy, mult, scrap_pen, stoc_pen, make_pen):
+       TIME = self.TIME
+
+
+       # These are only used for the make_pen objective
+       BOM = set(self.usage.keys())
+       self.PROD = {p for (p, r) in BOM}
+       self.SUB_TRIPLES = set(self.sub_usage.keys())
+
+
+       # BigM is only needed for min_buy (upper limit, see _tighten_big_m)
+       self.BigM = 1e9
+       alpha = .5
+
+
+       # Param Default values
+       self.min_buy = defaultdict(lambda: 1, min_buy)
+       supply = defaultdict(lambda: 0, supply)
+       supply[('Money', TIME[0])] = self.init_funds
+       demand = demand_entries(demand, TIME)  # {(item, cust, t): qty}, nonzero only
+       self.mult = defaultdict(lambda: 1, mult)
+       self.sub_pen = defaultdict(lambda: 2 * alpha)
+       self.scrap_pen = defaultdict(lambda: alpha, scrap_pen)
+       self.stoc_pen = defaultdict(lambda: .5 * alpha, stoc_pen)
+       self.make_pen = defaultdict(lambda: alpha, make_pen)
+
+
+       # penalty per unit of each make op, substitutions indexed once here
+       # instead of scanning SUB_TRIPLES for every product and period
+       self.make_pen_ops = {f"Make_{p}": self.make_pen[p] for p in self.PROD}
+       for (p, r_sub, q_sub) in self.SUB_TRIPLES:
+           op = f"Make_{p}_with_{q_sub}"
+           self.make_pen_ops[op] = self.make_pen_ops.get(op, 0) + self.sub_pen[r_sub]
+       return supply, demand
+
+
+   def _add_demand_supply(self, supply, demand):
+       TIME, MATERIAL, CUSTOMER = self.TIME, self.MATERIAL, self.CUSTOMER
+
+
+       # adding demand as supply, one pass over the nonzero entries
+       for (r, c, t), period_demand in demand.items():
+           if period_demand > 0 and c in CUSTOMER and r in MATERIAL:
+               supply[(f"D_{c}_{r}", t)] = period_demand
+       self.supply, self.demand = supply, demand
+       self.t_pos = {t: i for i, t in enumerate(TIME)}
+
+
+   def _index_ops(self):
+       # Set
+       # MATERIAL now includes 'Money' from the data file
+       self.RESOURCE = self.MATERIAL.union(self.CAPACITY)
+
+
+       # Mapping resource-level min buys to operation-level min buys
+       self.min_buy_ops = {f"Buy_{r}": v for r, v in self.min_buy.items()}
+       self.HAS_MIN_OPS = {op for op in self.OPERATIONS if self.min_buy_ops.get(op, 1) > 1}
+
+
+       # Integer-indexed BOR/BOP (ids in the order of the sets above), used by
+       # the sparse assembly and the Solution arrays
+       self.optable = compile_op_table(self.OPERATIONS, self.MATERIAL, self.CAPACITY,
+                                       self.BOR, self.BOP, self.usage_param,
+                                       self.produce_param, self.offset_param,
+                                       self.CUSTOMER, RESOURCE=self.RESOURCE)
+
+
+       # Index BOR/BOP by resource once so the balance rows only touch the ops
+       # that actually use/produce r (instead of scanning OPERATIONS per (t, r))
+       self.consumers = defaultdict(list)  # r -> [(op, usage)]
+       for (op, r) in self.BOR:
+           if op in self.OPERATIONS:
+               self.consumers[r].append((op, self.usage_param.get((op, r), 0)))
+       self.producers = defaultdict(list)  # r -> [(op, produce, offset)]
+       for (op, r) in self.BOP:
+           if op in self.OPERATIONS:
+               self.producers[r].append((op, self.produce_param.get((op, r), 0),
+                                         self.offset_param.get((op, r), 0)))
+
+
+   def _max_buy_ub(self, r, t):
+       # max_buy can be given per period as a dict or as a list over TIME
+       if (r, t) in self.max_buy_override:
+           return self.max_buy_override[r, t]
+       ub = self.solver.infinity()
+       if r in self.max_buy:
+           mb = self.max_buy[r]
+           if isinstance(mb, dict):
+               if t in mb:
+                   ub = mb[t]
+           else:  # in case data given as list instead
+               ub = mb[self.t_pos[t]]
+       return ub
+
+
+   def _z_ub(self, t, op):
+       # upper bound of z[t, op] given by the data
+       if is_binary_op(op):
+           return 1
+       elif op.startswith('Buy_JaneyTime'):
+           return self._max_buy_ub('JaneyTime', t)
+       elif op.startswith('Buy_DougTime'):
+           return self._max_buy_ub('DougTime', t)
+       return self.solver.infinity()
+
+
+   def _explicit_bounds(self, ops=None):
+       # z bounds given by the data (binaries, max_buy), {(t, op): ub}
+       explicit = {}
+       for t in self.TIME:
+           for op in self.OPERATIONS if ops is None else ops:
+               ub = self._z_ub(t, op)
+               if ub < self.solver.infinity():
+                   explicit[t, op] = ub
+       return explicit
+
+
+   def _presolve(self):
+       # dominated/equivalent make recipes first, then reachability over
+       # BOR/BOP (see hw10_presolve), replaces the op and resource sets with
+       # the reduced ones
+       self.replaced = dominated_recipes(self.OPERATIONS, self.MATERIAL, self.BOR, self.BOP,
+                                         self.usage_param, self.produce_param,
+                                         self.offset_param, self.make_pen_ops)
+       ops = self.OPERATIONS.difference(self.replaced)
+       self.unreduced = (self.MATERIAL, self.CAPACITY, ops, self.BOR, self.BOP)  # for _check_revive
+       res = presolve_ops(self.TIME, self.MATERIAL, self.CAPACITY, ops,
+                          self.BOR, self.BOP, self.usage_param, self.produce_param,
+                          self.offset_param, self.supply, op_ub=self._explicit_bounds(ops))
+       self.OPERATIONS, self.BOR, self.BOP = res['OPERATIONS'], res['BOR'], res['BOP']
+       self.MATERIAL, self.CAPACITY = res['MATERIAL'], res['CAPACITY']
+       self.dead = res['dead']
+       self.presolve_stats = dict(res['stats'], recipes_removed=len(self.replaced))
+       self.presolve_stats['ops_removed'] += len(self.replaced)
+
+
+   def _tighten_big_m(self):
+       # Bound propagation over BOR/BOP (see hw10_bounds): forward from supply,
+       # funds and max_buy, which no feasible plan can exceed, so taking the
+       # min with the data_to_op values only tightens the LP relaxation.
+       # tighten_bigm='demand' also caps ops by what demand can use downstream
+       # (useful_bounds), a heuristic: it can cut off the optimum
+       TIME, OPERATIONS = self.TIME, self.OPERATIONS
+       explicit = self._explicit_bounds()
+       gate_res = {r for (op, r) in self.BOP if op in OPERATIONS and op.startswith(GATE_OPS)}
+       fwd = propagate_bounds(TIME, self.MATERIAL, OPERATIONS, self.BOR, self.BOP,
+                              self.usage_param, self.produce_param, self.offset_param,
+                              self.supply, op_ub=explicit, skip=gate_res, RESOURCE=self.RESOURCE)
+       self.op_ub = dict(fwd)
+       if self.tighten_bigm == 'demand':
+           totals = horizon_totals(self.MATERIAL, OPERATIONS, self.BOR, self.BOP,
+                                   self.usage_param, self.supply, fwd)
+           useful = useful_bounds(OPERATIONS, self.BOR, self.BOP, self.usage_param,
+                                  self.produce_param, totals, skip=gate_res)
+           # never below a min lot, that would force BinOp to 0
+           self.op_ub = {(t, op): min(b, max(useful[op], self.min_buy_ops.get(op, 0)))
+                         for (t, op), b in fwd.items()}
+       self.gate_cap = gate_capacities(TIME, OPERATIONS, self.BOR, self.BOP,
+                                       self.usage_param, self.produce_param, self.op_ub)
+
+
+   def _add_variables(self):
+       solver, TIME = self.solver, self.TIME
+       Scrap, Stock, z, BinOp = self.Scrap, self.Stock, self.z, self.BinOp
+       infinity = solver.infinity()
+
+
+       # keeping scrap and stock as variables since hw assignment only
+       # requires Make, Buy, Ship, and it's easier to keep as is
+       for t in TIME:
+           for r in self.RESOURCE:
+               Scrap[t, r] = solver.NumVar(0.0, infinity, f'Scrap[{t, r}]')
+       for t in TIME:
+           for r in self.MATERIAL:
+               Stock[t, r] = solver.NumVar(0.0, infinity, f'Stock[{t, r}]')
 
 
+       # Operation Variable
+       for t in TIME:
+           for op in self.OPERATIONS:
+               if (t, op) in self.dead:
+                   continue
+               if is_binary_op(op):
+                   z[t, op] = solver.BoolVar(f'z[{t, op}]')
+               else:
+                   ub = min(self._z_ub(t, op), self.op_ub.get((t, op), infinity))
+                   z[t, op] = solver.IntVar(0, ub, f'z[{t, op}]')
 
 
-   # Variables
-   Scrap = {}
-   Stock = {}
-   # Ship and Shortfall removed; no longer needed
-   z = {}
+               if op in self.HAS_MIN_OPS:
+                   BinOp[t, op] = solver.BoolVar(f'BinOp[{t, op}]')
 
 
-  # keeping scrap and stock as variables since hw assignment only
-   # requires Make, Buy, Ship, and it's easier to keep as is
-   for t in TIME:
-       for r in RESOURCE:
-           Scrap[t, r] = solver.NumVar(0.0, infinity, f'Scrap[{t, r}]')
-   for t in TIME:
-       for r in MATERIAL:
-           Stock[t, r] = solver.NumVar(0.0, infinity, f'Stock[{t, r}]')
-
-
-   # Operation Variable
-   BinOp = {}
-   for t in TIME:
-       for op in OPERATIONS:
-           if (op == 'Op_Make_PickupTime' or op == 'Op_Make_DeliverTime'or
-                   op.startswith('Op_Trip_')):
-               z[t, op] = solver.BoolVar(f'z[{t, op}]')
-           elif op.startswith('Buy_JaneyTime'):
-               ub = infinity
-               if 'JaneyTime' in max_buy:
-                   mb = max_buy['JaneyTime']
-                   if isinstance(mb, dict):
-                       if t in mb:
-                           ub = mb[t]
-                   else:  # in case data given as list instead
-                       ub = mb[TIME.index(t)]
-               z[t, op] = solver.IntVar(0, ub, f'z[{t, op}]')
-
-
-           elif op.startswith('Buy_DougTime'):
-               ub = infinity
-               if 'DougTime' in max_buy:
-                   mb = max_buy['DougTime']
-                   if isinstance(mb, dict):
-                       if t in mb:
-                           ub = mb[t]
-                   else:
-                       ub = mb[TIME.index(t)]
-               z[t, op] = solver.IntVar(0, ub, f'z[{t, op}]')
-           else:
-               z[t, op] = solver.IntVar(0, infinity, f'z[{t, op}]')
+   def _var_counts(self):
+       # variables by type, for the profile
+       n_bool = sum(1 for (t, op) in self.z if is_binary_op(op))
+       return {'Scrap': len(self.Scrap), 'Stock': len(self.Stock),
+               'z_int': len(self.z) - n_bool, 'z_bool': n_bool, 'BinOp': len(self.BinOp)}
 
 
-           if op in HAS_MIN_OPS:
-               BinOp[t, op] = solver.BoolVar(f'BinOp[{t, op}]')
+   def _add_constraints(self):
+       # one profile phase per constraint family
+       cons = self.constraints
+       for families, add in ((['R_Balance'], self._add_balance),
+                             (['ForceBinOp', 'ForceMinOp'], self._add_min_ops),
+                             (['Doug_EitherOr'], self._add_either_or),
+                             (['LimitScrap'], self._add_limit_scrap)):
+           with self.profile.phase(families[0]) as ph:
+               add()
+               ph['rows'] = sum(len(cons[f]) for f in families)
 
 
-   # Objective
-   objective_terms = []
+   def _add_balance(self):
+       solver, TIME, MATERIAL = self.solver, self.TIME, self.MATERIAL
+       Scrap, Stock, z = self.Scrap, self.Stock, self.z
+       supply, cons = self.supply, self.constraints
+       SCRAP_RES = self.RESOURCE.difference(self.PROD)
 
 
-   for r in MATERIAL.difference(PROD):
-       if r == 'Money':
-           continue
+       # Main model constraint: Resource balance for time periods
        for t in TIME:
-           objective_terms.append(-1 * scrap_pen[r] * Scrap[t, r])
-   for r in MATERIAL:
-       if r == 'Money':
-           continue
+           t_idx = self.t_pos[t]
+           for r in self.RESOURCE:
+               sources_from_ops = []
+               for (op, qty, offset) in self.producers.get(r, ()):
+                   prev_idx = t_idx - offset
+                   if 0 <= prev_idx < len(TIME) and (TIME[prev_idx], op) in z:
+                       qty_t = self.gate_cap.get((TIME[prev_idx], op, r), qty)
+                       sources_from_ops.append(z[TIME[prev_idx], op] * qty_t)
+               cons['R_Balance'][t, r] = solver.Add(
+                   (Stock[t, r] if r in MATERIAL else 0) +
+                   (Scrap[t, r] if r in SCRAP_RES else 0) +
+                   solver.Sum(z[t, op] * qty
+                              for (op, qty) in self.consumers.get(r, ()) if (t, op) in z)
+                   == supply.get((r, t), 0) + (Stock[TIME[t_idx - 1], r] if
+                                               (r in MATERIAL and t_idx > 0) else 0) +
+                   solver.Sum(sources_from_ops),
+                   name=f'R_Balance[{t, r}]')
+
+
+   def _add_min_ops(self):
+       solver, TIME, z, BinOp, cons = self.solver, self.TIME, self.z, self.BinOp, self.constraints
+
+
+       # to force min nonzero operation quantities
        for t in TIME:
-           objective_terms.append(-1 * stoc_pen[r] * Stock[t, r])
-
+           for op in self.HAS_MIN_OPS:
+               if (t, op) in z and (t, op) in BinOp:
+                   big_m = min(self.BigM, self.op_ub.get((t, op), self.BigM))
+                   cons['ForceBinOp'][t, op] = solver.Add(
+                       big_m * BinOp[t, op] >= z[t, op], name=f'ForceBinOp[{t, op}]')
+                   cons['ForceMinOp'][t, op] = solver.Add(
+                       z[t, op] >= BinOp[t, op] * self.min_buy_ops[op], name=f'ForceMinOp[{t, op}]')
 
-   # Objective terms for Make Operations
-   for t in TIME:
-       for p in PROD:
-           op_name = f"Make_{p}"
-           if op_name in OPERATIONS and (t, op_name) in z:
-               objective_terms.append(-1 * make_pen[p] * z[t, op_name])
 
+   def _add_either_or(self):
+       solver, TIME, z, cons = self.solver, self.TIME, self.z, self.constraints
 
-           for (p_sub, r_sub, q_sub) in SUB_TRIPLES:
-               if p_sub == p:
-                 op_sub_name = f"Make_{p}_with_{q_sub}"
-                   if op_sub_name in OPERATIONS and (t, op_sub_name) in z:
-                       objective_terms.append(-1 * sub_pen[r_sub] * z[t, op_sub_name])
 
-
-   # Constraints
-   # Main model constraint: Resource balance for time periods
-   for t in TIME:
-       for r in RESOURCE:
-           sources_from_ops = []
-           for op in OPERATIONS:
-               op_produces_r = (op, r) in BOP
-               if op_produces_r:
-                   prev_t = prev(TIME, t, offset_param.get((op, r), 0))
-                   if prev_t is not None and (prev_t, op) in z:
-                       sources_from_ops.append(
-                           z[prev_t, op] * produce_param.get((op, r), 0))
-           solver.Add((Stock[t, r] if r in MATERIAL else 0) +
-                      (Scrap[t, r] if r in RESOURCE.difference(PROD) else 0) +
-                      solver.Sum(z[t, op] * usage_param.get((op, r), 0)
-                                 for op in OPERATIONS if (t, op) in z and (op, r) in BOR)
-                      == supply.get((r, t), 0) + (Stock[prev(TIME, t, 1), r] if
-                                                  (r in MATERIAL and TIME.index(t) > 0) else 0) +
-                      solver.Sum(sources_from_ops),
-                      name=f'R_Balance[{t, r}]')
-
-
-   # to force min nonzero operation quantities
-   for t in TIME:
-       for op in HAS_MIN_OPS:
-           if (t, op) in z and (t, op) in BinOp:
-               solver.Add(BigM * BinOp[t, op] >= z[t, op], name=f'ForceBinOp[{t, op}]')
-               solver.Add(z[t, op] >= BinOp[t, op] * min_buy_ops[op], name=f'ForceMinOp[{t, op}]')
-
-
-   # "Either/Or" Schedule Constraint
-   op_pickup = 'Op_Make_PickupTime'
-   op_deliver = 'Op_Make_DeliverTime'
-   if friday in TIME and op_pickup in OPERATIONS and op_deliver in OPERATIONS:
-       for t in TIME:
-           if t != friday:
-               if (t, op_pickup) in z and (t, op_deliver) in z:
-                   solver.Add(z[t, op_pickup] + z[t, op_deliver] <= 1,
-                              name=f'Doug_EitherOr[{t}]')
+       # "Either/Or" Schedule Constraint
+       op_pickup = 'Op_Make_PickupTime'
+       op_deliver = 'Op_Make_DeliverTime'
+       # a rolling-horizon window can miss friday, then every day in it is
+       # either/or; a model of its own without friday has no such rows
+       if ((self.friday in TIME or self.window)
+               and op_pickup in self.OPERATIONS and op_deliver in self.OPERATIONS):
+           for t in TIME:
+               if t != self.friday:
+                   if (t, op_pickup) in z and (t, op_deliver) in z:
+                       cons['Doug_EitherOr'][t] = solver.Add(
+                           z[t, op_pickup] + z[t, op_deliver] <= 1, name=f'Doug_EitherOr[{t}]')
 
 
-   # Limit Scrap
-   for r in MATERIAL.difference(PROD):
-       if r == 'Money' or r.startswith('D_'):
-           continue
-       # This constraint is likely OK, but may be redundant with scrap penalties.
-       solver.Add(solver.Sum([Scrap[t, r] for t in TIME]) <= supply.get((r, TIME[0]), 0),
-                  name=f'LimitScrap[{r}')
+   def _add_limit_scrap(self):
+       solver, TIME, Scrap = self.solver, self.TIME, self.Scrap
+       supply, cons = self.supply, self.constraints
 
 
-   # terminal Money from revenue that arrives after the time horizon
-   terminal_money_terms = []
-   last_idx = len(TIME) - 1
-
-
-   for t in TIME:
-       t_idx = TIME.index(t)
-       for op in OPERATIONS:
-           if (op, 'Money') in BOP:
-               arrive_idx = t_idx + offset_param.get((op, 'Money'), 0)
-               # If Money would appear after the last modeled period,
-               # we can't spend it, but we still want it in the objective.
-               if arrive_idx > last_idx:
-                   terminal_money_terms.append(
-                       produce_param[(op, 'Money')] * z[t, op])
-
-
-   # this part implements price discounting
- discount_terms = []
-   for t in TIME:
-       t_idx = TIME.index(t)
-       disc_factor = (1.0 - p_disc) ** t_idx
-       for op in OPERATIONS:
-           if not op.startswith("Ship_"):
-               continue
-           if (t, op) not in z:
+       # Limit Scrap
+       for r in self.MATERIAL.difference(self.PROD):
+           if r == 'Money' or r.startswith('D_'):
                continue
-           _, cust, item = op.split("_", 2)
-           base_nominal = baseprice[(item, cust)]
-           base_discounted = mult[cust] * base_nominal * disc_factor
-           diff = base_discounted - base_nominal
-           discount_terms.append(diff * z[t, op])
-
-
-   # setting the obj
-   final_profit = Stock[TIME[-1], 'Money'] + solver.Sum(terminal_money_terms)
-
-
-   solver.Maximize(final_profit +
-                   solver.Sum(objective_terms)+
-                   solver.Sum(discount_terms))
+           # This constraint is likely OK, but may be redundant with scrap penalties.
+           cons['LimitScrap'][r] = solver.Add(
+               solver.Sum([Scrap[t, r] for t in TIME]) <= supply.get((r, TIME[0]), 0),
+               name=f'LimitScrap[{r}')
 
 
-   # Solve
-   solver.set_time_limit(150000)  # 150 seconds
-   gap = 0.01
-   solverParams = pywraplp.MPSolverParameters()
-   solverParams.SetDoubleParam(solverParams.RELATIVE_MIP_GAP, gap)
-   status = solver.Solve(solverParams)
-  
-  
+   def _set_objective(self):
+       solver, TIME, MATERIAL, OPERATIONS = self.solver, self.TIME, self.MATERIAL, self.OPERATIONS
+       Scrap, Stock, z = self.Scrap, self.Stock, self.z
 
 
-   # Print solution.
-   if status == pywraplp.Solver.OPTIMAL or status == pywraplp.Solver.FEASIBLE:
-       print('Objective = {:.2f}\n'.format(solver.Objective().Value()))
+       # Objective
+       objective_terms = []
 
 
-       # Total Revenue (discounted)
-       total_revenue = 0.0
-       for (t, op), var in z.items():
-           if not op.startswith("Ship_"):
+       for r in MATERIAL.difference(self.PROD):
+           if r == 'Money':
                continue
-
-
-           qty = var.solution_value()
-           if qty <= 1e-6:
+           for t in TIME:
+               objective_terms.append(-1 * self.scrap_pen[r] * Scrap[t, r])
+       for r in MATERIAL:
+           if r == 'Money':
                continue
+           for t in TIME:
+               objective_terms.append(-1 * self.stoc_pen[r] * Stock[t, r])
 
 
-           # op = "Ship_<Cust>_<Item-with-underscores>"
-           _, cust, item = op.split("_", 2)
-
-
-           base_price = baseprice.get((item, cust), 0.0)
-           t_idx = TIME.index(t)
-           disc_factor = (1.0 - p_disc) ** t_idx
-
-
-           total_revenue += qty * mult[cust] * base_price * disc_factor
-
-
+       # Objective terms for Make Operations (base and substitution recipes)
+       for t in TIME:
+           for op, pen in self.make_pen_ops.items():
+               if (t, op) in z:
+                   objective_terms.append(-1 * pen * z[t, op])
 
 
-       # Total Spending (Money going out)
-       total_spend = 0.0
-       for (t, op), var in z.items():
-           qty = var.solution_value()
-           if qty <= 1e-6:
-               continue
+       # terminal Money from revenue that arrives after the time horizon
+       terminal_money_terms = []
+       last_idx = len(TIME) - 1
 
 
-           if (op, 'Money') in BOR:
-               cost_per_unit = usage_param[(op, 'Money')]
-               total_spend += qty * cost_per_unit
+       for t in TIME:
+           t_idx = self.t_pos[t]
+           for (op, qty, offset) in self.producers.get('Money', ()):
+               arrive_idx = t_idx + offset
+               # If Money would appear after the last modeled period,
+               # we can't spend it, but we still want it in the objective.
+               if arrive_idx > last_idx and (t, op) in z:
+                   terminal_money_terms.append(qty * z[t, op])
 
 
- accounting_profit = total_revenue - total_spend
+       # this part implements price discounting
+       discount_terms = []
+       for t in TIME:
+           t_idx = self.t_pos[t]
+           disc_factor = (1.0 - self.p_disc) ** t_idx
+           for op in OPERATIONS:
+               if not op.startswith("Ship_"):
+                   continue
+               if (t, op) not in z:
+                   continue
+               _, cust, item = op.split("_", 2)
+               base_nominal = self.baseprice[(item, cust)]
+               base_discounted = self.mult[cust] * base_nominal * disc_factor
+               diff = base_discounted - base_nominal
+               discount_terms.append(diff * z[t, op])
 
 
-       final_money = Stock[TIME[-1], 'Money'].solution_value()
-       print(f"Final Money         = {final_money:.2f}")
-       print(f"Total Revenue       = {total_revenue:.2f}")
-       print(f"Total Spending      = {total_spend:.2f}")
-       print(f"Actual Profit       = {accounting_profit:.2f}\n")
+       # setting the obj
+       final_profit = Stock[TIME[-1], 'Money'] + solver.Sum(terminal_money_terms)
 
 
-       # pretty print (more readable/presentable)
-       print('\n*** Operation Variables (z) ***')
+       solver.Maximize(final_profit +
+                       solver.Sum(objective_terms)+
+                       solver.Sum(discount_terms))
 
 
-       # Helper to classify operation type for nicer grouping
-       def classify_op(op_name: str) -> str:
-           if op_name.startswith('Op_'):
-               return 'Binary / Schedule Ops'
-           elif op_name.startswith('Make_'):
-               return 'Make Operations'
-           elif op_name.startswith('Move_'):
-               return 'Move Operations'
-           elif op_name.startswith('Buy_'):
-               return 'Buy Operations'
-           elif op_name.startswith('Ship_'):
-               return 'Ship Operations'
+   # In-place parameter changes (no rebuild)
+   def set_supply(self, r, t, qty):
+       """
+           Changes the supply of r in period t (the R_Balance right-hand side).
+           :param r: resource, use 'Money' at TIME[0] for init_funds
+           :param t: period
+           :param qty: new supply
+           """
+       if self.presolve and qty > self.supply.get((r, t), 0):
+           self._check_revive({**self.supply, (r, t): qty}, f"supply of {r} in {t}")
+       self.supply[(r, t)] = qty
+       self.constraints['R_Balance'][t, r].SetBounds(qty, qty)
+       if t == self.TIME[0] and r in self.constraints['LimitScrap']:
+           self.constraints['LimitScrap'][r].SetUb(qty)
+       self._refresh_bounds()
+
+
+   def _check_revive(self, supply, what):
+       # presolve again with the new supply, anything it would keep now that
+       # the model doesn't have (op, resource or period of an op) needs a rebuild
+       MATERIAL, CAPACITY, ops, BOR, BOP = self.unreduced
+       res = presolve_ops(self.TIME, MATERIAL, CAPACITY, ops, BOR, BOP, self.usage_param,
+                          self.produce_param, self.offset_param, supply,
+                          op_ub=self._explicit_bounds(ops))
+       revived = sorted(res['OPERATIONS'] - self.OPERATIONS)
+       revived += sorted((res['MATERIAL'] | res['CAPACITY']) - self.RESOURCE)
+       revived += sorted(f"{op} in {t}" for (t, op) in self.dead - res['dead'])
+       if revived:
+           raise ValueError(f"the {what} brings back what presolve removed "
+                            f"({', '.join(revived[:5])}{', ...' if len(revived) > 5 else ''}), "
+                            f"rebuild the model")
+
+
+   def set_objective_coef(self, var, coef):
+       """Overwrites the total objective coefficient of a variable."""
+       self.solver.Objective().SetCoefficient(var, coef)
+
+
+   def set_max_buy(self, r, t, ub):
+       """Changes the max_buy bound of Buy_{r} in period t."""
+       if (t, f"Buy_{r}") not in self.z:
+           raise KeyError(f"Buy_{r} has no variable in period {t}"
+                          + (" (removed by presolve, rebuild the model)" if self.presolve else ""))
+       self.max_buy_override[r, t] = ub
+       self.z[t, f"Buy_{r}"].SetUb(ub)
+       self._refresh_bounds()
+
+
+   def set_demand(self, changes, refresh=True):
+       """
+           Changes demand in place. Demand only shows up as the supply of the
+           D_<cust>_<item> resources (R_Balance right-hand side) and in the
+           PickupTime/DeliverTime trip size, so only those are touched.
+           New (item, cust) pairs need a rebuild (no ship op / D_ resource).
+           :param changes: {(item, cust): [qty per period] or {t: qty}}, or
+               sparse {(item, cust, t): qty}
+           :param refresh: redo the propagated bounds (replan does it once at the end)
+           """
+       if changes and len(next(iter(changes))) == 3:
+           by_pair = defaultdict(dict)
+           for (item, cust, t), q in changes.items():
+               by_pair[item, cust][t] = q
+           changes = by_pair
+       balance = self.constraints['R_Balance']
+       for (item, cust), qty in changes.items():
+           demand_res, ship = f"D_{cust}_{item}", f"Ship_{cust}_{item}"
+           if (self.TIME[0], demand_res) not in balance:
+               raise KeyError(f"no demand for {item} from {cust} in this model, rebuild it to add one")
+           row = [self.demand.get((item, cust, t), 0) for t in self.TIME]
+           if isinstance(qty, dict):
+               for t, q in qty.items():
+                   row[self.t_pos[t]] = q
+           elif len(qty) == len(self.TIME):
+               row = list(qty)
            else:
-               return 'Other Operations'
-       category_order = [
-           'Binary / Schedule Ops',
-           'Buy Operations',
-           'Move Operations',
-           'Make Operations',
-           'Ship Operations',
-           'Other Operations',
-       ]
+               raise ValueError(f"demand for {(item, cust)} needs {len(self.TIME)} periods, got {len(qty)}")
+           for t, q in zip(self.TIME, row):
+               if q > 0 and (t, ship) in self.dead:
+                   raise KeyError(f"{ship} was removed by presolve in period {t}, rebuild the model")
+           for t, q in zip(self.TIME, row):
+               if q:
+                   self.demand[item, cust, t] = q
+               else:
+                   self.demand.pop((item, cust, t), None)
+               if q > 0:
+                   self.supply[(demand_res, t)] = q
+               else:
+                   self.supply.pop((demand_res, t), None)
+               balance[t, demand_res].SetBounds(q, q)
 
 
-       # Desired print order of categories
+       # data_to_op sizes one pickup/deliver trip to the total demand
+       trip_m = max(1, sum(self.demand.values()))
+       for op, r in (('Op_Make_PickupTime', 'PickupTime'), ('Op_Make_DeliverTime', 'DeliverTime')):
+           if (op, r) in self.produce_param:
+               self._set_produce(op, r, trip_m)
+       if refresh:
+           self._refresh_bounds()
 
 
-       # Build a nested dict: day -> category -> list of (op, value)
-       ops_by_day = {t: {cat: [] for cat in category_order} for t in TIME}
+   def set_prices(self, changes, refresh=True):
+       """
+           Changes base prices in place: the Money a ship op brings in (R_Balance
+           coefficient, or the terminal-money term after the horizon) and its
+           discount term in the objective.
+           :param changes: {(item, cust): base price}
+           :param refresh: redo the propagated bounds (replan does it once at the end)
+           """
+       TIME, z, obj = self.TIME, self.z, self.solver.Objective()
+       last_idx = len(TIME) - 1
+       for (item, cust), price in changes.items():
+           ship = f"Ship_{cust}_{item}"
+           if ship not in self.OPERATIONS:
+               raise KeyError(f"{ship} is not in this model, rebuild it to add the price")
+           self.baseprice[(item, cust)] = price
+           self._set_produce(ship, 'Money', price)
+           for t_idx, t in enumerate(TIME):
+               if (t, ship) not in z:
+                   continue
+               # same coefficient _set_objective ends up with for a ship op
+               coef = self.mult[cust] * price * (1.0 - self.p_disc) ** t_idx - price
+               if t_idx + self.offset_param.get((ship, 'Money'), 0) > last_idx:
+                   coef += price
+               obj.SetCoefficient(z[t, ship], coef)
+       if refresh:
+           self._refresh_bounds()
+
+
+   def _set_produce(self, op, r, qty):
+       # new produce amount of op -> r, in the params, the op table and on the
+       # balance rows (the gates get their tightened capacity in _refresh_bounds)
+       self.produce_param[op, r] = qty
+       table = self.optable
+       i, j = table.op_id[op], table.res_id.get(r)
+       k = table.prod_ptr[i] + np.flatnonzero(table.prod_res[table.prod_ptr[i]:table.prod_ptr[i + 1]] == j)
+       table.prod_qty[k] = qty
+       off = self.offset_param.get((op, r), 0)
+       for t_idx, t in enumerate(self.TIME[:len(self.TIME) - off]):
+           if (t, op) in self.z and (t, op, r) not in self.gate_cap:
+               self.constraints['R_Balance'][self.TIME[t_idx + off], r].SetCoefficient(
+                   self.z[t, op], -qty)
+
+
+   def replan(self, demand=None, prices=None, warm_start=True):
+       """
+           Applies demand and/or price changes to the live model (see set_demand,
+           set_prices) and re-solves, hinting the last solution by default.
+           :return: pywraplp status
+           """
+       with self.profile.phase('update') as ph:
+           if demand:
+               self.set_demand(demand, refresh=False)
+           if prices:
+               self.set_prices(prices, refresh=False)
+           self._refresh_bounds()
+           ph.update({'demand': len(demand or ()), 'prices': len(prices or ())})
+       if warm_start and self.last_solution:
+           # only hint the decisions: the old Stock/Scrap break the new demand
+           # rows and the whole hint gets rejected, a partial one is completed
+           # by the solver (SCIP completesol, Gurobi partial MIP start)
+           prior = self.last_solution
+           self.set_hint({name: prior[name] for name in ('z', 'BinOp')})
+       return self.solve()
+
+
+   def _refresh_bounds(self):
+       # the propagated bounds depend on supply and max_buy, so redo them and
+       # update z bounds, ForceBinOp Ms and gate outputs on the live model
+       if not self.tighten_bigm:
+           return
+       self._tighten_big_m()
+       infinity = self.solver.infinity()
+       for (t, op), var in self.z.items():
+           if not is_binary_op(op):
+               var.SetUb(min(self._z_ub(t, op), self.op_ub.get((t, op), infinity)))
+       for (t, op), ct in self.constraints['ForceBinOp'].items():
+           ct.SetCoefficient(self.BinOp[t, op], min(self.BigM, self.op_ub.get((t, op), self.BigM)))
+       for (t, op, r), cap in self.gate_cap.items():
+           if (t, op) not in self.z:
+               continue
+           # produced amounts sit on the right-hand side of the balance
+           self.constraints['R_Balance'][t, r].SetCoefficient(self.z[t, op], -cap)
 
 
-       for (t, op), var in z.items():
-           val = var.solution_value()
-           if val <= 0.1:
-               continue  # skip essentially-zero ops
-           cat = classify_op(op)
-           if cat not in ops_by_day[t]:
-               ops_by_day[t][cat] = []
-           ops_by_day[t][cat].append((op, val))
+   def incumbent(self):
+       """Values of the current solution keyed like the variables (see WARM_START_VARS)."""
+       return Solution.from_model(self).warm_start
 
 
-       # Custom sort key for Move ops: G2S first, then S2G, then others
-       def move_sort_key(op_val):
-           op, _ = op_val
-           if '_Garage_to_Studio' in op:
-               dir_rank = 0
-           elif '_Studio_to_Garage' in op:
-               dir_rank = 1
-           else:
-               dir_rank = 2
-           return (dir_rank, op)
+   @property
+   def last_solution(self):
+       """Warm start of the last successful solve (None before one)."""
+       return self.solution.warm_start if self.solution else None
 
 
-       # Pretty print grouped operations
-       for t in TIME:
-           day_has_ops = any(ops_by_day[t][cat] for cat in category_order)
-           if not day_has_ops:
-               continue
+   def set_hint(self, prior):
+       """
+           Passes a prior solution to the backend as a MIP start (pywraplp SetHint,
+           used by gurobi, scip and cp_sat, ignored by the others). Keys that are
+           not in this model are skipped, so a partial prior is fine.
+           :param prior: {'z': {(t, op): val}, 'BinOp': ..., 'Stock': {(t, r): val}, 'Scrap': ...}
+           :return: number of hinted variables
+           """
+       hint_vars, hint_vals = [], []
+       for name in WARM_START_VARS:
+           var_dict = getattr(self, name)
+           for key, val in prior.get(name, {}).items():
+               if key in var_dict:
+                   hint_vars.append(var_dict[key])
+                   hint_vals.append(val)
+
+
+       # SCIP keeps its presolved problem after a solve and then rejects the
+       # hint ("multiple aggregated variable"), toggling a bound makes
+       # pywraplp hand it a fresh copy
+       if self.status is not None:
+           v = self.Stock[self.TIME[-1], 'Money']
+           ub = v.ub()
+           v.SetUb(0)
+           v.SetUb(ub)
+       self.solver.SetHint(hint_vars, hint_vals)
+       return len(hint_vars)
+
+
+   def solve(self, warm_start=False):
+       """
+           Solves (or re-solves) the current model.
+           :param warm_start: hint the previous incumbent before solving again
+           :return: pywraplp status
+           """
+       if warm_start and self.last_solution:
+           self.set_hint(self.last_solution)
+       with self.profile.phase('solve') as ph:
+           self.status = self.solver.Solve(self.params)
+           ph.update(self.solve_stats())
+       # pywraplp stops returning values once the model is modified, so read
+       # them all now (the warm start and KPIs come from this copy)
+       if self.has_solution():
+           with self.profile.phase('extract') as ph:
+               self.solution = Solution.from_model(self)
+               ph['values'] = self.solver.NumVariables()
+       return self.status
+
+
+   def solve_fast(self, resolve_time=0.0, **kw):
+       """
+           Approximate plan from the LP relaxation and a rounding heuristic,
+           in about a second, with the LP bound for the gap (see
+           hw10_fast.solve_fast). self.solution is the plan afterwards.
+           :param resolve_time: seconds of MIP from the rounded plan, 0 to skip
+           :return: dict with status, objective, lp_bound, gap and timings
+           """
+       from hw10_fast import solve_fast
+       return solve_fast(self, resolve_time, **kw)
 
 
-           print(f'\n--- {t} ---')
-           for cat in category_order:
-               ops_list = ops_by_day[t][cat]
-               if not ops_list:
+   def iter_solve(self, time_budget=None, gap=None, first_slice=2.0, growth=2.0, stop=None):
+       """
+           Anytime solve, yields every improved incumbent while the budget lasts.
+           pywraplp has no incumbent callback in Python, so this solves in time
+           slices (first_slice s, then growing by growth) and hints the best
+           incumbent (or the last solution, to start with) into the next slice;
+           the best bound is the tightest one seen over the slices. Stops at
+           the budget, at gap, when a slice ends optimal (within the solver
+           gap) or when the caller stops iterating. self.solution is the best
+           incumbent afterwards, self.status the status of the slice that
+           found it.
+           :param time_budget: total seconds, default the solver time limit
+           :param gap: stop once the relative gap is at most this
+           :param stop: called before and after every slice, True ends the
+               solve (e.g. a cancel event's is_set)
+           :return: generator of {'stage', 'elapsed', 'objective', 'best_bound',
+               'gap', 'solution'} dicts
+           """
+       budget = self.time_limit if time_budget is None else time_budget
+       start = time.perf_counter()
+       best, bound, slice_s, stage = None, float('inf'), first_slice, 0
+       prior = self.last_solution
+       try:
+           while True:
+               left = budget - (time.perf_counter() - start)
+               if left <= 0.05 or (stop is not None and stop()):
+                   break
+               self.solver.set_time_limit(int(min(slice_s, left) * 1000))
+               if best is not None or prior:
+                   self.set_hint(best.warm_start if best is not None else prior)
+               status = self.solve()
+               stage += 1
+               slice_s *= growth
+               stopped = stop is not None and stop()
+               if not self.has_solution():
+                   if stopped or status in (pywraplp.Solver.INFEASIBLE, pywraplp.Solver.UNBOUNDED,
+                                            pywraplp.Solver.ABNORMAL, pywraplp.Solver.MODEL_INVALID):
+                       break
                    continue
 
 
-               print(f'  {cat}:')
-
-
-               if cat == 'Move Operations':
-                   sorted_ops = sorted(ops_list, key=move_sort_key)
-               else:
-                   sorted_ops = sorted(ops_list, key=lambda x: x[0])
-
-
-               for op, val in sorted_ops:
-                   print(f'    {op}: {val:.2f}')
+               # maximizing, so the bound is an upper bound
+               bound = min(bound, self.solution.stats['best_bound'])
+               improved = best is None or self.solution.objective > best.objective + 1e-9
+               if improved or (status == pywraplp.Solver.OPTIMAL
+                               and self.solution.objective >= best.objective - 1e-9):
+                   best = self.solution  # or the same value, proven this time
+               rel_gap = abs(bound - best.objective) / max(abs(best.objective), 1e-9)
+               if improved:
+                   yield {'stage': stage, 'elapsed': time.perf_counter() - start,
+                          'objective': best.objective, 'best_bound': bound,
+                          'gap': rel_gap, 'solution': best}
+               if stopped or status == pywraplp.Solver.OPTIMAL or (gap is not None and rel_gap <= gap):
+                   break
+       finally:
+           if self.time_limit is not None:
+               self.solver.set_time_limit(int(self.time_limit * 1000))
+           if best is not None:
+               # status/stats of the slice that found it, not of the last one
+               self.solution, self.status = best, best.stats['status']
+
+
+   def solve_anytime(self, callback=None, time_budget=None, gap=None, **slices):
+       """
+           Runs iter_solve and hands each improved incumbent to callback(event),
+           a callback returning True stops the solve early. slices go to
+           iter_solve (first_slice, growth, stop).
+           :return: Solution of the best incumbent (None if none was found)
+           """
+       for event in self.iter_solve(time_budget, gap, **slices):
+           if callback is not None and callback(event):
+               break
+       return self.solution
+
+
+   def solve_stats(self):
+       """Status, objective, best bound, relative gap, B&B nodes, simplex
+       iterations and solver wall time (ms) of the last solve."""
+       solver = self.solver
+       stats = {'backend': self.backend, 'status': self.status,
+                'nodes': solver.nodes(), 'iterations': solver.iterations(),
+                'wall_time_ms': solver.wall_time()}
+       if self.has_solution():
+           obj, bound = solver.Objective().Value(), solver.Objective().BestBound()
+           stats.update({'objective': obj, 'best_bound': bound,
+                         'gap': abs(bound - obj) / max(abs(obj), 1e-9)})
+       return stats
+
+
+   def has_solution(self):
+       return self.status in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE)
+
+
+   def kpis(self):
+       """Objective, final money, revenue (discounted), spending and profit
+       of the last solution, as a dict."""
+       return dict(self.solution.kpis)
+
+
+   def export(self, path):
+       """Writes the model to an .mps or .lp file with compact names (plus a
+       name map, see hw10_export), hw10_export.solve_file solves the .mps again."""
+       from hw10_export import export_model
+       with self.profile.phase('export'):
+           return export_model(self, path)
+
+
+   def report(self, file=None):
+       """Prints KPIs and the operations grouped by day and category
+       (see hw10_solution.print_report)."""
+       if self.has_solution():
+           print_report(self.solution, file)
+       else:
+           print('No solution found.', file=file)
 
 
+def Hw9_model(MATERIAL, CAPACITY, CUSTOMER, TIME,
+             usage, sub_usage, demand, supply,
+             init_funds, min_buy, max_buy, friday,
+             # NEW HW8 PARAMETERS
+             OPERATIONS,
+             BOR, BOP, usage_param, produce_param, offset_param,
+             baseprice, p_disc, mult={},
 
 
-       print('\nAdvanced usage:')
-       print('Problem solved in ', solver.wall_time(), ' milliseconds')
-       print('Problem solved in ', solver.iterations(), ' iterations')
+             scrap_pen={}, stoc_pen={}, make_pen={},
+             # solver backend ('auto' picks the first available one)
+             backend='auto', solver_opts=None,
+             # prior solution to hint, see ProductionModel.set_hint
+             warm_start=None,
+             tighten_bigm=True, presolve=False, assembly='scalar', profile=None,
+             # write the built model to this .mps/.lp file before solving
+             export=None,
+             # LP relaxation + rounding instead of the MIP (see solve_fast),
+             # True or the seconds of fix-and-resolve
+             fast=False):
+   """Builds, solves and prints the model in one call (see ProductionModel
+    to re-solve without rebuilding). Returns the pywraplp solver."""
+   model = ProductionModel(MATERIAL, CAPACITY, CUSTOMER, TIME,
+                           usage, sub_usage, demand, supply,
+                           init_funds, min_buy, max_buy, friday,
+                           OPERATIONS,
+                           BOR, BOP, usage_param, produce_param, offset_param,
+                           baseprice, p_disc, mult,
+                           scrap_pen, stoc_pen, make_pen,
+                           backend=backend, solver_opts=solver_opts,
+                           tighten_bigm=tighten_bigm, presolve=presolve,
+                           assembly=assembly, profile=profile)
+   if export:
+       model.export(export)
+   if warm_start:
+       model.set_hint(warm_start)
+   if fast:
+       fast = model.solve_fast(0.0 if fast is True else fast)
+       if fast['lp_bound'] is not None:
+           print(f"LP bound {fast['lp_bound']:.2f}, gap {fast['gap'] or 0:.2%}")
    else:
-       print('No solution found.')
-   return solver
+       model.solve()
+   model.report()
+   return model.solver
 
 
+def load_data(source):
+   """
+       Collects a data set into a plain dict (picklable, safe to copy).
+       :param source: a data module like hw10_data_orig, or a dict
+       :return: dict with DATA_KEYS and whichever OPTIONAL_KEYS are given,
+           demand as sparse {(item, cust, t): qty} (see demand_entries)
+       """
+   get = source.get if isinstance(source, dict) else (lambda k: getattr(source, k, None))
+   data = {k: get(k) for k in DATA_KEYS + OPTIONAL_KEYS}
+   missing = [k for k in DATA_KEYS if data[k] is None]
+   if missing:
+       raise ValueError(f"data set is missing {missing}")
+   data['demand'] = demand_entries(data['demand'], data['TIME'])
+   return {k: v for k, v in data.items() if v is not None}
+
+
+def model_from_data(data, backend='auto', solver_opts=None, op_cache_dir=None, **model_opts):
+   """Runs data_to_op on a data dict (see load_data) and builds a ProductionModel,
+    model_opts go to ProductionModel (e.g. tighten_bigm, presolve, assembly, profile).
+    data_to_op is memoized on the data content, op_cache_dir also keeps it on disk."""
+   profile = model_opts.pop('profile', None)
+   if profile is None:
+       profile = Profile()
+   network = {k: data[k] for k in NETWORK_KEYS if k in data}
+   demand = demand_entries(data['demand'], data['TIME'])  # once, it may be a record stream
+   with profile.phase('data_to_op') as ph:
+       (OPERATIONS, BOP, BOR, usage_param, produce_param, offset_param,
+        MATERIAL, CAPACITY) = cached_data_to_op(data['MATERIAL'], data['CAPACITY'],
+                                                data['CUSTOMER'], data['NO_LATE'],
+                                                data['TIME'], data['usage'], data['sub_usage'],
+                                                data['ord_cost'], data['ord_qty'], demand,
+                                                data['baseprice'], data['supply'],
+                                                cache_dir=op_cache_dir, **network)
+       ph.update({'ops': len(OPERATIONS), 'resources': len(MATERIAL | CAPACITY),
+                  'op_cache': op_cache_stats['last']})
+   return ProductionModel(MATERIAL, CAPACITY, data['CUSTOMER'], data['TIME'],
+                           data['usage'], data['sub_usage'], demand, data['supply'],
+                           data['init_funds'], data['min_buy'], data['max_buy'], data['friday'],
+                           OPERATIONS,
+                           BOR, BOP, usage_param, produce_param, offset_param,
+                           data['baseprice'], data['p_disc'], data.get('mult', {}),
+                           data.get('scrap_pen', {}), data.get('stoc_pen', {}),
+                           data.get('make_pen', {}),
+                           backend=backend, solver_opts=solver_opts, profile=profile,
+                           network=build_network(data['MATERIAL'], **network), **model_opts)
@@ -0,0 +1,190 @@
+# on-disk cache of solved plans (SQLite) in front of data_to_op + the model,
+# keyed on a fingerprint of everything that goes into the solve
+
+
+import pickle
+import sqlite3
+import threading
+import time
+
+from ortools.linear_solver import pywraplp
+
+from hw10_data_conversion import NETWORK_KEYS, content_hash
+from hw10_model import load_data, model_from_data
+
+
+# bump whenever the model changes what a data set solves to
+PLAN_CACHE_VERSION = 1
+
+
+# what fixes the variables of a model: entries with the same structure but
+# other demand/prices/supply/funds/penalties can hint each other
+STRUCTURE_KEYS = ['MATERIAL', 'CAPACITY', 'CUSTOMER', 'NO_LATE', 'TIME', 'usage', 'sub_usage',
+                 'ord_cost', 'ord_qty'] + NETWORK_KEYS
+
+
+# model_from_data options that don't change the result
+IGNORED_OPTS = {'profile', 'op_cache_dir'}
+
+
+def fingerprint(data, backend='auto', solver_opts=None, model_opts=None):
+   """
+       Content hashes of a solve request (sets and dicts in any order).
+       :param data: data dict from load_data (demand already sparse)
+       :return: (key of the whole request, structure key for near matches)
+       """
+   # the backend as asked for and the raw overrides, the defaults are
+   # constants of hw10_solver
+   backend = backend if isinstance(backend, str) else list(backend)
+   opts = {k: v for k, v in (model_opts or {}).items() if k not in IGNORED_OPTS}
+   key = content_hash(PLAN_CACHE_VERSION, data, backend, solver_opts or {}, opts)
+   pairs = {(item, cust) for (item, cust, t) in data['demand']}
+   structure = content_hash(PLAN_CACHE_VERSION, {k: data.get(k) for k in STRUCTURE_KEYS}, pairs)
+   return key, structure
+
+
+class PlanCache:
+   """
+       SQLite store of plan results (the shape of PlanningService.plan:
+       status, timings, kpis, stats, plan, warm_start). Least recently used
+       entries are dropped past max_entries or max_bytes. Only proven plans
+       are stored, a time-limited incumbent would come back as an exact hit.
+       Safe to share between threads, and between processes through the
+       database file.
+       :param path: database file (':memory:' for a throwaway cache)
+       :param max_entries: entries kept
+       :param max_bytes: total pickled size kept, None for no limit
+       :param max_gap: also store FEASIBLE results with at most this gap,
+           None for OPTIMAL only
+       """
+
+
+   def __init__(self, path='hw10_plans.sqlite', max_entries=256, max_bytes=256 * 2 ** 20,
+                max_gap=None):
+       self.path, self.max_entries, self.max_bytes = path, max_entries, max_bytes
+       self.max_gap = max_gap
+       self.stats = {'hits': 0, 'warm': 0, 'misses': 0, 'evicted': 0, 'not_stored': 0}
+       self._lock = threading.Lock()
+       self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+       with self._db:
+           self._db.execute('PRAGMA journal_mode=WAL')
+           self._db.execute('CREATE TABLE IF NOT EXISTS plans (key TEXT PRIMARY KEY, '
+                            'structure TEXT, created REAL, last_used REAL, hits INTEGER, '
+                            'size INTEGER, result BLOB)')
+           self._db.execute('CREATE INDEX IF NOT EXISTS plans_structure ON plans (structure, last_used)')
+           self._db.execute('CREATE INDEX IF NOT EXISTS plans_lru ON plans (last_used)')
+
+
+   def __len__(self):
+       with self._lock:
+           return self._db.execute('SELECT COUNT(*) FROM plans').fetchone()[0]
+
+
+   def get(self, key):
+       """The cached result of a fingerprint key, or None. Counts as a use."""
+       with self._lock, self._db:
+           row = self._db.execute('SELECT result FROM plans WHERE key = ?', (key,)).fetchone()
+           if row is None:
+               return None
+           self._db.execute('UPDATE plans SET last_used = ?, hits = hits + 1 WHERE key = ?',
+                            (time.time(), key))
+       return pickle.loads(row[0])
+
+
+   def nearest(self, structure, exclude=None):
+       """The most recently used result with the same structure key, or None."""
+       with self._lock:
+           row = self._db.execute('SELECT result FROM plans WHERE structure = ? AND key != ? '
+                                  'ORDER BY last_used DESC LIMIT 1',
+                                  (structure, exclude or '')).fetchone()
+       return None if row is None else pickle.loads(row[0])
+
+
+   def storable(self, result):
+       """Whether a result is good enough to hand out as an exact hit."""
+       if result['status'] == pywraplp.Solver.OPTIMAL:
+           return True
+       gap = result.get('stats', {}).get('gap')
+       return (result['status'] == pywraplp.Solver.FEASIBLE and self.max_gap is not None
+               and gap is not None and gap <= self.max_gap)
+
+
+   def put(self, key, structure, result):
+       blob = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+       now = time.time()
+       with self._lock, self._db:
+           self._db.execute('INSERT OR REPLACE INTO plans VALUES (?, ?, ?, ?, 0, ?, ?)',
+                            (key, structure, now, now, len(blob), blob))
+           self._evict(keep=key)
+
+
+   def _evict(self, keep):
+       # oldest first until both limits hold, never the entry just written
+       db = self._db
+       while True:
+           count, size = db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM plans').fetchone()
+           if count <= self.max_entries and (self.max_bytes is None or size <= self.max_bytes):
+               return
+           row = db.execute('SELECT key FROM plans WHERE key != ? ORDER BY last_used LIMIT 1',
+                            (keep,)).fetchone()
+           if row is None:
+               return
+           db.execute('DELETE FROM plans WHERE key = ?', row)
+           self.stats['evicted'] += 1
+
+
+   def clear(self):
+       with self._lock, self._db:
+           self._db.execute('DELETE FROM plans')
+
+
+   def close(self):
+       self._db.close()
+
+
+   def __enter__(self):
+       return self
+
+
+   def __exit__(self, *exc):
+       self.close()
+
+
+   def plan(self, data, backend='auto', solver_opts=None, **model_opts):
+       """
+           Plan of a data set, solved only if it isn't cached. An identical
+           request returns the stored result right away. Otherwise, the most
+           recent entry with the same structure (same ops, other demand,
+           prices, ...) hints the solve with its z/BinOp values (the old
+           Stock/Scrap don't fit other demand). Results that aren't
+           storable (see max_gap) are returned but not cached.
+           :param data: data set (module like hw10_data_orig or dict)
+           :param model_opts: see model_from_data
+           :return: result dict (see PlanningService.plan) plus cache: 'hit',
+               'warm' (a near match hinted the solve) or 'miss'
+           """
+       data = load_data(data)
+       key, structure = fingerprint(data, backend, solver_opts, model_opts)
+       result = self.get(key)
+       if result is not None:
+           self.stats['hits'] += 1
+           return dict(result, cache='hit')
+
+
+       prior = self.nearest(structure, exclude=key)
+       model = model_from_data(data, backend, solver_opts, **model_opts)
+       hinted = 0
+       if prior is not None and prior.get('warm_start'):
+           hinted = model.set_hint({k: prior['warm_start'].get(k, {}) for k in ('z', 'BinOp')})
+       model.solve()
+       result = {'status': model.status, 'timings': model.timings}
+       if model.solution is not None:
+           result.update(model.solution.to_dict())
+           result['warm_start'] = model.solution.warm_start
+       if model.solution is not None and self.storable(result):
+           self.put(key, structure, result)
+       else:
+           self.stats['not_stored'] += 1
+       how = 'warm' if hinted else 'miss'
+       self.stats['warm' if hinted else 'misses'] += 1
+       return dict(result, cache=how)
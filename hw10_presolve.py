@@ -0,0 +1,124 @@
+# reachability presolve over the BOR/BOP graph
+
+
+from collections import defaultdict
+
+from hw10_bounds import propagate_bounds
+from hw10_data_conversion import OpKind, op_kind
+
+
+def presolve(TIME, MATERIAL, CAPACITY, OPERATIONS, BOR, BOP, usage_param, produce_param,
+            offset_param, supply, op_ub=None):
+   """
+       Drops what can never matter before any variable is created:
+           - ops that can never run (some input can't be supplied in any period),
+           - ops whose outputs can't flow to a Ship (D_ resource) or to Money
+             and that use no material (only Money/capacity), running those
+             only costs money and penalties. An op that uses material is kept
+             even if it leads nowhere: it takes the material out of stock or
+             scrap and can save their penalties (e.g. a round trip move,
+             nothing is stocked while in transit),
+           - resources no remaining op touches and that have no supply,
+       and lists the (t, op) pairs that must be zero (e.g. Buy_JaneyTime when
+       max_buy is 0, or nothing available yet on the first day).
+       :param supply: {(r, t): qty}, with demand already added as D_ supply
+       :param op_ub: explicit bounds {(t, op): ub} (max_buy, binaries)
+       :return: dict with the reduced OPERATIONS, MATERIAL, CAPACITY, BOR, BOP,
+           the set dead of (t, op) fixed to zero, and removed counts in stats
+       """
+   # forward: per-period bounds, 0 means the op can't run in that period
+   fwd = propagate_bounds(TIME, MATERIAL, OPERATIONS, BOR, BOP, usage_param, produce_param,
+                          offset_param, supply, op_ub=op_ub, RESOURCE=MATERIAL | CAPACITY)
+   runnable = {op for op in OPERATIONS if any(fwd[t, op] > 0 for t in TIME)}
+
+
+   # backward: from the Money producers (ships) and the ops that use up
+   # stock to everything that feeds them
+   producers = defaultdict(set)
+   for (op, r) in BOP:
+       if op in runnable and produce_param.get((op, r), 0) > 0:
+           producers[r].add(op)
+   inputs = defaultdict(set)
+   for (op, r) in BOR:
+       if op in runnable and usage_param.get((op, r), 0) > 0:
+           inputs[op].add(r)
+   useful = set(producers['Money'])
+   useful |= {op for op, rs in inputs.items() if any(r in MATERIAL and r != 'Money' for r in rs)}
+   todo = list(useful)
+   while todo:
+       op = todo.pop()
+       for r in inputs[op]:
+           for p in producers[r]:
+               if p not in useful:
+                   useful.add(p)
+                   todo.append(p)
+
+
+   ops = runnable & useful
+   bor = {(op, r) for (op, r) in BOR if op in ops}
+   bop = {(op, r) for (op, r) in BOP if op in ops}
+   touched = {r for (op, r) in bor | bop}
+   touched |= {r for (r, t), q in supply.items() if q > 0}
+   touched.add('Money')
+   dead = {(t, op) for op in ops for t in TIME if fwd[t, op] <= 0}
+
+
+   return {'OPERATIONS': ops,
+           'MATERIAL': MATERIAL & touched,
+           'CAPACITY': CAPACITY & touched,
+           'BOR': bor,
+           'BOP': bop,
+           'dead': dead,
+           'stats': {'ops_removed': len(OPERATIONS) - len(ops),
+                     'resources_removed': len(MATERIAL | CAPACITY) - len((MATERIAL | CAPACITY) & touched),
+                     'vars_fixed': len(dead)}}
+
+
+def dominated_recipes(OPERATIONS, MATERIAL, BOR, BOP, usage_param, produce_param, offset_param,
+                     op_pen):
+   """
+       Make recipes (base and substitution) that another recipe does at least
+       as well: same outputs and offsets, same material inputs, no more of any
+       capacity and no higher penalty. Unused capacity is scrapped for free
+       but leftover material is stocked or scrapped at a penalty, so only the
+       capacity side may differ. Equivalent recipes keep one of them (the
+       first by name), which also takes the symmetric columns out of the MIP.
+       :param op_pen: objective penalty per unit of each op, {op: pen}
+       :return: {dropped op: op that replaces it}
+       """
+   recipes = {op for op in OPERATIONS if op_kind(op) == OpKind.MAKE}
+   inputs = defaultdict(dict)
+   for (op, r) in BOR:
+       if op in recipes and usage_param.get((op, r), 0) > 0:
+           inputs[op][r] = usage_param[op, r]
+   outputs = defaultdict(set)
+   for (op, r) in BOP:
+       if op in recipes:
+           outputs[op].add((r, produce_param.get((op, r), 0), offset_param.get((op, r), 0)))
+
+
+   # only recipes with the same outputs and material inputs can replace each other
+   groups = defaultdict(list)
+   for op in recipes:
+       material = frozenset((r, q) for r, q in inputs[op].items() if r in MATERIAL)
+       groups[frozenset(outputs[op]), material].append(op)
+
+
+   def dominates(a, b):
+       return (op_pen.get(a, 0) <= op_pen.get(b, 0) and
+               all(q <= inputs[b].get(r, 0) for r, q in inputs[a].items() if r not in MATERIAL))
+
+
+   dropped = {}
+   for ops in groups.values():
+       if len(ops) < 2:
+           continue
+       ops.sort(key=lambda op: (op_pen.get(op, 0), sum(q for r, q in inputs[op].items()
+                                                       if r not in MATERIAL), op))
+       for i, a in enumerate(ops):
+           if a in dropped:
+               continue
+           for b in ops[i + 1:]:
+               if b not in dropped and dominates(a, b):
+                   dropped[b] = a
+   return dropped
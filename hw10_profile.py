@@ -0,0 +1,62 @@
+# phase timings and counts of a model build/solve
+
+
+import json
+import time
+from contextlib import contextmanager
+
+
+class Profile:
+   """
+       Wall time, call count and whatever counts a phase reports (variables by
+       type, rows per constraint family, solver stats), per phase of a
+       ProductionModel build and solve. Pass one to ProductionModel(profile=...)
+       to collect several models, or give it a callback to stream the phases.
+       :param callback: called as callback(phase, entry) when a phase ends,
+           entry is a copy of {'time': s, 'calls': n, ...counts}
+       """
+
+
+   def __init__(self, callback=None):
+       self.phases = {}  # phase -> {'time': s, 'calls': n, ...counts}
+       self.callback = callback
+
+
+   @contextmanager
+   def phase(self, name):
+       """Times the block, counts put in the yielded dict are stored with it."""
+       counts = {}
+       t0 = time.perf_counter()
+       try:
+           yield counts
+       finally:
+           entry = self.phases.setdefault(name, {'time': 0.0, 'calls': 0})
+           entry['time'] += time.perf_counter() - t0
+           entry['calls'] += 1
+           entry.update(counts)
+           if self.callback:
+               self.callback(name, dict(entry))
+
+
+   def timings(self):
+       """{phase: seconds}"""
+       return {name: entry['time'] for name, entry in self.phases.items()}
+
+
+   def to_dict(self):
+       return {name: dict(entry) for name, entry in self.phases.items()}
+
+
+   def to_json(self, path=None):
+       """Phases as JSON, written to path if given."""
+       text = json.dumps(self.to_dict(), indent=1, default=str)
+       if path:
+           with open(path, 'w') as f:
+               f.write(text)
+       return text
+
+
+   def to_frame(self):
+       """Phases as a pandas DataFrame, one row per phase."""
+       import pandas as pd  # only needed here
+       return pd.DataFrame.from_dict(self.to_dict(), orient='index')
@@ -0,0 +1,195 @@
+# rolling-horizon planner on top of ProductionModel
+
+
+import time
+
+from hw10_data_conversion import demand_entries
+from hw10_model import load_data, model_from_data
+
+
+def window_data(data, start, W, carry_supply, carry_backlog, init_funds):
+   """
+       Cuts the data set down to TIME[start:start + W] and adds what was
+       carried over from the committed periods.
+       :param carry_supply: {(r, t): qty} ending stock and in-flight arrivals
+       :param carry_backlog: {(item, cust): qty} unmet backlog of the D_ resources
+       :param init_funds: money available at the first period of the window
+       :return: data dict for the window
+       """
+   TIME = data['TIME']
+   win = TIME[start:start + W]
+   win_set = set(win)
+
+
+   def cut(values):
+       # per-period params are lists over TIME or dicts keyed by period
+       if isinstance(values, dict):
+           return {t: v for t, v in values.items() if t in win_set}
+       return list(values[start:start + W])
+
+
+   wdata = dict(data)
+   wdata['TIME'] = win
+   wdata['init_funds'] = init_funds
+   wdata['max_buy'] = {r: cut(mb) for r, mb in data['max_buy'].items()}
+
+
+   demand = {key: q for key, q in demand_entries(data['demand'], TIME).items()
+             if key[2] in win_set}
+   for (item, cust), qty in carry_backlog.items():
+       # backlog shows up as extra demand on the first day of the window
+       # (the model sets D_ supply from demand, so it can't go in supply)
+       key = (item, cust, win[0])
+       demand[key] = demand.get(key, 0) + qty
+   wdata['demand'] = demand
+
+
+   supply = {(r, t): q for (r, t), q in data['supply'].items() if t in win_set}
+   for (r, t), q in carry_supply.items():
+       if t in win_set:
+           supply[(r, t)] = supply.get((r, t), 0) + q
+   wdata['supply'] = supply
+   return wdata
+
+
+def carry_over(model, data, start, K):
+   """
+       Reads what the committed periods TIME[start:start + K] of a window hand
+       to the rest of the horizon: ending Stock, D_ backlog, money and the
+       arrivals of ops with an offset (Buy_Seamstress_*, Move_*_Studio_to_Garage,
+       Ship_* revenue) that land after the committed periods.
+       :return: (carry_supply, carry_backlog, money)
+       """
+   TIME = data['TIME']
+   sol = model.last_solution
+   nxt = start + K
+   last_t = TIME[nxt - 1]
+   carry_supply, carry_backlog, money = {}, {}, 0.0
+
+
+   for r in model.MATERIAL:
+       qty = sol['Stock'][last_t, r]
+       if qty <= 1e-6:
+           continue
+       if r == 'Money':
+           money += qty
+       elif r.startswith('D_'):
+           _, cust, item = r.split("_", 2)
+           carry_backlog[(item, cust)] = round(qty)
+       else:
+           carry_supply[(r, TIME[nxt])] = qty
+
+
+   # in-flight arrivals
+   for r, prods in model.producers.items():
+       for (op, qty, offset) in prods:
+           if offset <= 0:
+               continue
+           for t in model.TIME[:K]:
+               g = start + model.t_pos[t] + offset
+               if g < nxt or g >= len(TIME):
+                   continue
+               amount = qty * sol['z'][t, op]
+               if amount <= 1e-6:
+                   continue
+               if r == 'Money' and g == nxt:
+                   money += amount  # becomes init_funds of the next window
+               else:
+                   carry_supply[(r, TIME[g])] = carry_supply.get((r, TIME[g]), 0) + amount
+   return carry_supply, carry_backlog, money
+
+
+def evaluate_plan(model, plan):
+   """
+       Objective of a fixed operation plan inside a (monolithic) model: fixes
+       z to the plan and re-solves for the rest. The model is left fixed.
+       :param plan: {(t, op): qty}, ops missing from the plan are fixed to 0
+       :return: objective, or None if the plan is infeasible there
+       """
+   for key, var in model.z.items():
+       val = round(plan.get(key, 0))
+       var.SetBounds(val, val)
+   model.solve()
+   return model.solver.Objective().Value() if model.has_solution() else None
+
+
+def rolling_horizon(data, W, K, backend='auto', solver_opts=None, monolithic=False,
+                    warm_start=True):
+   """
+       Solves the horizon window by window: solve TIME[start:start + W], commit the
+       first K periods, carry stock/backlog/in-flight arrivals into the next
+       window and move on by K.
+       :param data: data set (module like hw10_data_orig or dict) over the full horizon
+       :param W: window length (periods)
+       :param K: periods committed per window, 1 <= K <= W
+       :param monolithic: also solve the full horizon at once and report the
+           optimality loss of the stitched plan against it
+       :param warm_start: hint each window with the previous window's solution
+       :return: dict with plan {(t, op): qty}, per-window stats, wall_time,
+           final_money, and objective/monolithic/loss
+       """
+   data = load_data(data)
+   TIME = data['TIME']
+   if not 1 <= K <= W:
+       raise ValueError(f"need 1 <= K <= W, got K={K}, W={W}")
+
+
+   t0 = time.perf_counter()
+   plan, windows = {}, []
+   carry_supply, carry_backlog, money = {}, {}, data['init_funds']
+   prior, final_money = None, None
+   start = 0
+   while start < len(TIME):
+       wdata = window_data(data, start, W, carry_supply, carry_backlog, money)
+       model = model_from_data(wdata, backend=backend, solver_opts=solver_opts, window=True)
+       if warm_start and prior:
+           model.set_hint(prior)
+       ts = time.perf_counter()
+       model.solve()
+       stats = {'start': TIME[start], 'status': model.status,
+                'solve_time': time.perf_counter() - ts}
+       windows.append(stats)
+       if not model.has_solution():
+           stats['objective'] = None
+           break
+       stats['objective'] = model.solver.Objective().Value()
+
+
+       # the last window commits everything it has
+       last = start + W >= len(TIME)
+       k = len(wdata['TIME']) if last else K
+       for t in wdata['TIME'][:k]:
+           for op in model.OPERATIONS:
+               val = model.last_solution['z'][t, op]
+               if val > 1e-6:
+                   plan[t, op] = round(val)
+       if last:
+           final_money = model.kpis()['final_money']
+           break
+       carry_supply, carry_backlog, money = carry_over(model, data, start, k)
+       prior = model.last_solution
+       start += k
+
+
+   result = {'plan': plan, 'windows': windows, 'final_money': final_money,
+             'wall_time': time.perf_counter() - t0}
+
+
+   if monolithic:
+       ts = time.perf_counter()
+       mono = model_from_data(data, backend=backend, solver_opts=solver_opts)
+       mono.solve()
+       result['monolithic_time'] = time.perf_counter() - ts
+       result['monolithic'] = mono.solver.Objective().Value() if mono.has_solution() else None
+       # score the stitched plan with the monolithic objective so both are
+       # comparable (the forward bounds hold for any feasible plan, so the
+       # tightened model is fine for that)
+       if final_money is not None:
+           full = model_from_data(data, backend=backend, solver_opts=solver_opts)
+           result['objective'] = evaluate_plan(full, plan)
+       else:
+           result['objective'] = None
+       if result['monolithic'] is not None and result['objective'] is not None:
+           result['loss'] = result['monolithic'] - result['objective']
+           result['rel_loss'] = result['loss'] / max(abs(result['monolithic']), 1e-9)
+   return result
@@ -0,0 +1,106 @@
+# scenario sweeps over demand / price / discount / funds perturbations
+
+
+import copy
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from hw10_data_conversion import demand_entries
+from hw10_model import load_data, model_from_data
+
+
+def scenario_grid(**axes):
+   """
+       Builds every combination of the given perturbation values, e.g.
+       scenario_grid(demand_scale=[.8, 1, 1.2], p_disc=[.01, .02]) gives 6 scenarios.
+       :param axes: scenario key -> list of values (see apply_scenario for the keys)
+       :return: list of scenario dicts
+       """
+   keys = list(axes)
+   return [dict(zip(keys, values)) for values in itertools.product(*(axes[k] for k in keys))]
+
+
+def apply_scenario(base, scenario):
+   """
+       Returns a perturbed copy of a data dict, base is left untouched.
+       Scenario keys:
+           demand_scale, price_scale: multiply every demand / baseprice entry
+           demand, baseprice: {key: value} entries that overwrite the base ones
+               (a demand [qty per period] row replaces the whole (item, cust)
+               row, {(item, cust, t): qty} entries single periods)
+           name: label only
+           anything else (p_disc, init_funds, ...): replaces the data value
+       """
+   data = copy.deepcopy(base)
+   for k, v in scenario.items():
+       if k == 'name':
+           continue
+       elif k == 'demand_scale':
+           data['demand'] = {key: round(q * v) for key, q in
+                             demand_entries(data['demand'], data['TIME']).items()}
+       elif k == 'price_scale':
+           data['baseprice'] = {key: p * v for key, p in data['baseprice'].items()}
+       elif k == 'demand':
+           demand = demand_entries(data['demand'], data['TIME'])
+           for key, q in v.items():
+               if len(key) == 2:
+                   demand = {e: x for e, x in demand.items() if e[:2] != key}
+                   demand.update(demand_entries({key: q}, data['TIME']))
+               else:
+                   demand[key] = q
+           data['demand'] = demand
+       elif k == 'baseprice':
+           data[k].update(v)
+       else:
+           data[k] = v
+   return data
+
+
+def run_scenario(base, scenario, backend='auto', solver_opts=None):
+   """Builds and solves one scenario, returns a result row (dict)."""
+   data = apply_scenario(base, scenario)
+
+
+   t0 = time.perf_counter()
+   model = model_from_data(data, backend=backend, solver_opts=solver_opts)
+   build_time = time.perf_counter() - t0
+   t0 = time.perf_counter()
+   model.solve()
+   solve_time = time.perf_counter() - t0
+
+
+   # keep the scalar scenario settings as columns, dict overrides are too wide
+   row = {k: v for k, v in scenario.items() if not isinstance(v, dict)}
+   row.update({'status': model.status, 'build_time': build_time, 'solve_time': solve_time})
+   if model.has_solution():
+       row.update(model.kpis())
+   return row
+
+
+def run_scenarios(base, scenarios, max_workers=None, backend='auto', solver_opts=None):
+   """
+       Solves every scenario in parallel, each worker process builds its own
+       model (data_to_op + ProductionModel).
+       :param base: base data set, a module like hw10_data_orig or a dict
+       :param scenarios: list of scenario dicts (see scenario_grid / apply_scenario)
+       :param max_workers: number of processes, None = all cores, 1 = run in this process
+       :return: DataFrame with one row per scenario (objective, final_money,
+           revenue, spend, profit, build/solve times)
+       """
+   base = load_data(base)
+   scenarios = [dict(s, name=s.get('name', f's{i}')) for i, s in enumerate(scenarios)]
+
+
+   if max_workers == 1:
+       rows = [run_scenario(base, s, backend, solver_opts) for s in scenarios]
+   else:
+       with ProcessPoolExecutor(max_workers=max_workers) as pool:
+           futures = [pool.submit(run_scenario, base, s, backend, solver_opts)
+                      for s in scenarios]
+           rows = [f.result() for f in futures]
+
+
+   return pd.DataFrame(rows).set_index('name')
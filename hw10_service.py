@@ -0,0 +1,195 @@
+# asyncio front for model builds/solves, run in a process (or thread) pool
+
+
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from hw10_model import model_from_data
+
+
+def _interrupt_on(cancel, model, done):
+   # runs next to the solve, InterruptSolve is the one call that stops a
+   # running pywraplp solve from another thread. Keeps at it until the job
+   # is done, an anytime solve may start another slice after the first one
+   while not done.is_set():
+       if cancel.wait(0.1):
+           model.solver.InterruptSolve()
+           done.wait(0.1)
+
+
+def _plan_job(data, backend, solver_opts, model_opts, anytime, cancel, events):
+   """Worker side: builds and solves one model, returns plain picklable data."""
+   if cancel.is_set():
+       return {'cancelled': True, 'status': None}
+   model = model_from_data(data, backend, solver_opts, **model_opts)
+   done = threading.Event()
+   watcher = threading.Thread(target=_interrupt_on, args=(cancel, model, done), daemon=True)
+   watcher.start()
+   try:
+       if cancel.is_set():
+           return {'cancelled': True, 'status': None}
+       if anytime is None:
+           model.solve()
+       else:
+           def forward(event):
+               if events is not None:
+                   events.put({k: v for k, v in event.items() if k != 'solution'})
+               return cancel.is_set()
+           model.solve_anytime(forward, stop=cancel.is_set, **anytime)
+   finally:
+       done.set()
+       watcher.join()
+
+
+   result = {'cancelled': cancel.is_set(), 'status': model.status,
+             'timings': model.timings}
+   if model.solution is not None:
+       result.update(model.solution.to_dict())
+       result['warm_start'] = model.solution.warm_start
+   return result
+
+
+class PlanningService:
+   """
+       Runs model_from_data + solve for an asyncio service without blocking its
+       event loop. At most max_workers solves run at once (each with
+       cpu_count // max_workers solver threads unless solver_opts say
+       otherwise), up to max_queue more wait for a slot and anything beyond
+       that is refused with asyncio.QueueFull. Cancelling the awaiting task
+       interrupts the solver. Use as `async with PlanningService() as svc:`.
+       :param max_workers: solves running at the same time
+       :param max_queue: requests allowed to wait for a worker
+       :param processes: process pool (Python-heavy builds don't share a GIL)
+           or threads (cheaper to start, fine for small models)
+       :param threads_per_solve: solver threads per solve, default cpu_count // max_workers
+       """
+
+
+   def __init__(self, max_workers=2, max_queue=8, processes=True, threads_per_solve=None):
+       self.max_workers, self.max_queue, self.processes = max_workers, max_queue, processes
+       self.threads_per_solve = threads_per_solve or max(1, (os.cpu_count() or 1) // max_workers)
+       self._slots = asyncio.Semaphore(max_workers)
+       self._pending = 0  # waiting + running
+       if processes:
+           self._executor = ProcessPoolExecutor(max_workers)
+           self._manager = multiprocessing.Manager()  # events/queues shared with the workers
+       else:
+           self._executor = ThreadPoolExecutor(max_workers)
+           self._manager = None
+
+
+   @property
+   def pending(self):
+       """Requests waiting or running."""
+       return self._pending
+
+
+   async def plan(self, data, backend='auto', solver_opts=None, on_incumbent=None,
+                  time_budget=None, gap=None, **model_opts):
+       """
+           Builds and solves the model of a data dict (see hw10_model.load_data).
+           With on_incumbent, time_budget or gap it solves anytime (see
+           ProductionModel.iter_solve) and calls on_incumbent(event) (a function
+           or coroutine function) for each improved incumbent.
+           :return: dict with status, cancelled, timings and, if a solution was
+               found, kpis, stats, plan and warm_start (see Solution.to_dict)
+           """
+       if self._pending >= self.max_workers + self.max_queue:
+           raise asyncio.QueueFull(f"{self._pending} planning requests pending")
+       self._pending += 1
+       try:
+           async with self._slots:
+               return await self._run(data, backend, solver_opts, on_incumbent,
+                                      time_budget, gap, model_opts)
+       finally:
+           self._pending -= 1
+
+
+   async def _run(self, data, backend, solver_opts, on_incumbent, time_budget, gap, model_opts):
+       loop = asyncio.get_running_loop()
+       solver_opts = {'threads': self.threads_per_solve, **(solver_opts or {})}
+       streaming = on_incumbent is not None
+       anytime = None
+       if streaming or time_budget is not None or gap is not None:
+           anytime = {'time_budget': time_budget, 'gap': gap}
+       if self._manager is not None:
+           cancel = self._manager.Event()
+           events = self._manager.Queue() if streaming else None
+       else:
+           cancel = threading.Event()
+           events = queue.Queue() if streaming else None
+
+
+       job = loop.run_in_executor(self._executor, _plan_job, data, backend, solver_opts,
+                                  model_opts, anytime, cancel, events)
+       try:
+           while True:
+               done, _ = await asyncio.wait({job}, timeout=0.2 if streaming else None)
+               if streaming:
+                   await self._drain(events, on_incumbent)
+               if done:
+                   return job.result()
+       except asyncio.CancelledError:
+           # stop the solver and keep the slot until the worker has let go
+           cancel.set()
+           try:
+               await asyncio.shield(job)
+           except Exception:
+               pass
+           raise
+
+
+   @staticmethod
+   async def _drain(events, on_incumbent):
+       while True:
+           try:
+               event = events.get_nowait()
+           except queue.Empty:
+               return
+           res = on_incumbent(event)
+           if asyncio.iscoroutine(res):
+               await res
+
+
+   async def iter_plan(self, data, backend='auto', solver_opts=None, time_budget=None,
+                       gap=None, **model_opts):
+       """
+           Async iterator version of an anytime plan: yields each improved
+           incumbent event, then {'result': <plan result>} last.
+           """
+       events = asyncio.Queue()
+       task = asyncio.ensure_future(self.plan(data, backend, solver_opts, events.put_nowait,
+                                              time_budget, gap, **model_opts))
+       try:
+           while True:
+               getter = asyncio.ensure_future(events.get())
+               done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+               if getter in done:
+                   yield getter.result()
+                   continue
+               getter.cancel()
+               while not events.empty():
+                   yield events.get_nowait()
+               yield {'result': task.result()}
+               return
+       finally:
+           if not task.done():
+               task.cancel()
+
+
+   def close(self):
+       self._executor.shutdown(wait=True, cancel_futures=True)
+       if self._manager is not None:
+           self._manager.shutdown()
+
+
+   async def __aenter__(self):
+       return self
+
+
+   async def __aexit__(self, *exc):
+       await asyncio.get_running_loop().run_in_executor(None, self.close)
@@ -0,0 +1,243 @@
+# solution snapshot of a ProductionModel solve, with lazy KPIs and renderers
+
+
+import sys
+from functools import cached_property
+
+import numpy as np
+from ortools.linear_solver import linear_solver_pb2
+
+from hw10_data_conversion import DEFAULT_LANES, OpKind
+
+
+# report categories, in print order
+CATEGORIES = ['Binary / Schedule Ops', 'Buy Operations', 'Move Operations',
+             'Make Operations', 'Ship Operations', 'Other Operations']
+
+
+def classify_op(op_name):
+   """Operation type for nicer grouping."""
+   if op_name.startswith('Op_'):
+       return 'Binary / Schedule Ops'
+   elif op_name.startswith('Make_'):
+       return 'Make Operations'
+   elif op_name.startswith('Move_'):
+       return 'Move Operations'
+   elif op_name.startswith('Buy_'):
+       return 'Buy Operations'
+   elif op_name.startswith('Ship_'):
+       return 'Ship Operations'
+   else:
+       return 'Other Operations'
+
+
+def move_sort_key(op_val, network=None):
+   """Move ops in the lane order of the network (default Garage to Studio,
+   then Studio to Garage), then others."""
+   op, _ = op_val
+   lanes = list(network.lanes if network is not None else DEFAULT_LANES)
+   for dir_rank, (src, dst) in enumerate(lanes):
+       if op.endswith(f'_{src}_to_{dst}'):
+           return (dir_rank, op)
+   return (len(lanes), op)
+
+
+# variable dicts of a ProductionModel: name -> key list attribute of Solution
+VAR_KEYS = {'z': 'ops', 'Stock': 'materials', 'Scrap': 'resources', 'BinOp': 'ops'}
+
+
+class Solution:
+   """
+       Values of one solve, read from the solver in one call and kept as arrays
+       over (period, op) / (period, resource). Stays valid after the model is
+       changed or solved again. KPIs, the op plan and the per-day breakdown
+       are computed on first access and cached.
+       """
+
+
+   def __init__(self, model, values, stats):
+       self.TIME = list(model.TIME)
+       self.ops = model.optable.ops
+       self.materials = sorted(model.MATERIAL)
+       self.resources = sorted(model.RESOURCE)
+       self.stats = stats
+       self.objective = stats.get('objective')
+       self._model = model
+       self._values = values
+       self._baseprice = dict(model.baseprice)  # the model's prices can change later
+
+
+       # arrays over (period, key), 0 where the model has no variable
+       layout = self._layout(model)
+       arrays = {}
+       for name, attr in VAR_KEYS.items():
+           keys, rows, cols, idx = layout[name]
+           arrays[name] = np.zeros((len(self.TIME), len(getattr(self, attr))))
+           arrays[name][rows, cols] = values[idx]
+       self.z, self.stock, self.scrap, self.binop = (
+           arrays['z'], arrays['Stock'], arrays['Scrap'], arrays['BinOp'])
+
+
+   @classmethod
+   def from_model(cls, model):
+       """Reads the current solution of model.solver (all values in one call)."""
+       response = linear_solver_pb2.MPSolutionResponse()
+       model.solver.FillSolutionResponseProto(response)
+       return cls(model, np.array(response.variable_value), model.solve_stats())
+
+
+   def _layout(self, model):
+       # where each variable sits: name -> (keys, row, col, solver index),
+       # the variables never change once built, so this is kept on the model
+       if model.var_layout is None:
+           t_pos = {t: i for i, t in enumerate(self.TIME)}
+           model.var_layout = {}
+           for name, attr in VAR_KEYS.items():
+               k_pos = {k: j for j, k in enumerate(getattr(self, attr))}
+               keys = list(getattr(model, name))
+               var_dict = getattr(model, name)
+               model.var_layout[name] = (
+                   keys,
+                   np.array([t_pos[t] for (t, k) in keys], dtype=np.int64),
+                   np.array([k_pos[k] for (t, k) in keys], dtype=np.int64),
+                   np.array([var_dict[key].index() for key in keys], dtype=np.int64))
+       return model.var_layout
+
+
+   def value(self, name, t, key):
+       """Value of one variable, name is 'z', 'Stock', 'Scrap' or 'BinOp'."""
+       arr, keys = {'z': (self.z, self.ops), 'Stock': (self.stock, self.materials),
+                    'Scrap': (self.scrap, self.resources), 'BinOp': (self.binop, self.ops)}[name]
+       return arr[self.TIME.index(t), keys.index(key)]
+
+
+   @cached_property
+   def warm_start(self):
+       """Values keyed like the model variables, see ProductionModel.set_hint."""
+       layout = self._layout(self._model)
+       return {name: dict(zip(layout[name][0], self._values[layout[name][3]].tolist()))
+               for name in VAR_KEYS}
+
+
+   @cached_property
+   def final_money(self):
+       return self.stock[-1, self.materials.index('Money')]
+
+
+   @cached_property
+   def _ship(self):
+       # discounted unit revenue of every op per period (0 for non-ship ops)
+       model, table = self._model, self._model.optable
+       disc = (1.0 - model.p_disc) ** np.arange(len(self.TIME))
+       price = np.zeros(len(self.ops))
+       for j in np.flatnonzero(table.kind == OpKind.SHIP):
+           cust = table.customers[table.ship_cust[j]]
+           item = table.resources[table.ship_item[j]]
+           price[j] = model.mult[cust] * self._baseprice.get((item, cust), 0.0)
+       return disc[:, None] * price[None, :]
+
+
+   @cached_property
+   def revenue(self):
+       """Total revenue (discounted)."""
+       z = np.where(self.z > 1e-6, self.z, 0)
+       return float((z * self._ship).sum())
+
+
+   @cached_property
+   def spend(self):
+       """Total spending (Money going out)."""
+       z = np.where(self.z > 1e-6, self.z, 0)
+       return float((z * self._model.optable.cost('Money')).sum())
+
+
+   @cached_property
+   def profit(self):
+       return self.revenue - self.spend
+
+
+   @cached_property
+   def kpis(self):
+       """Objective, final money, revenue, spending and profit."""
+       return {'objective': self.objective,
+               'final_money': float(self.final_money),
+               'revenue': self.revenue,
+               'spend': self.spend,
+               'profit': self.profit}
+
+
+   @cached_property
+   def plan(self):
+       """{(t, op): value} of the ops that run."""
+       ii, jj = np.nonzero(self.z > 1e-6)
+       return {(self.TIME[i], self.ops[j]): float(self.z[i, j]) for i, j in zip(ii, jj)}
+
+
+   @cached_property
+   def ops_by_day(self):
+       """day -> category -> [(op, value)] of the ops above 0.1, in print order."""
+       by_day = {t: {cat: [] for cat in CATEGORIES} for t in self.TIME}
+       ii, jj = np.nonzero(self.z > 0.1)
+       for i, j in zip(ii, jj):
+           op = self.ops[j]
+           by_day[self.TIME[i]][classify_op(op)].append((op, float(self.z[i, j])))
+       network = self._model.network
+       for t in self.TIME:
+           for cat, ops_list in by_day[t].items():
+               ops_list.sort(key=(lambda x: move_sort_key(x, network)) if cat == 'Move Operations'
+                             else (lambda x: x[0]))
+       return by_day
+
+
+   def to_frame(self):
+       """Ops that run as a pandas DataFrame (t, op, category, value)."""
+       import pandas as pd  # only needed here
+       return pd.DataFrame([(t, op, classify_op(op), v) for (t, op), v in self.plan.items()],
+                           columns=['t', 'op', 'category', 'value'])
+
+
+   def to_dict(self):
+       """KPIs, solve stats and the plan as plain JSON-friendly data."""
+       return {'kpis': self.kpis,
+               'stats': self.stats,
+               'plan': [{'t': t, 'op': op, 'value': v} for (t, op), v in self.plan.items()]}
+
+
+def print_report(solution, file=None):
+   """Prints KPIs and the operations grouped by day and category."""
+   file = file or sys.stdout
+   kpi = solution.kpis
+
+
+   def out(*args):
+       print(*args, file=file)
+
+
+   out('Objective = {:.2f}\n'.format(kpi['objective']))
+   out(f"Final Money         = {kpi['final_money']:.2f}")
+   out(f"Total Revenue       = {kpi['revenue']:.2f}")
+   out(f"Total Spending      = {kpi['spend']:.2f}")
+   out(f"Actual Profit       = {kpi['profit']:.2f}\n")
+
+
+   # pretty print (more readable/presentable)
+   out('\n*** Operation Variables (z) ***')
+   for t, by_cat in solution.ops_by_day.items():
+       if not any(by_cat.values()):
+           continue
+       out(f'\n--- {t} ---')
+       for cat in CATEGORIES:
+           if not by_cat[cat]:
+               continue
+           out(f'  {cat}:')
+           for op, val in by_cat[cat]:
+               out(f'    {op}: {val:.2f}')
+
+
+   stats = solution.stats
+   out('\nAdvanced usage:')
+   out('Solver backend ', stats['backend'])
+   out('Problem solved in ', stats['wall_time_ms'], ' milliseconds')
+   out('Problem solved in ', stats['iterations'], ' iterations')
+   out('Branch-and-bound nodes ', stats['nodes'])
+   out('Best bound ', stats.get('best_bound'))
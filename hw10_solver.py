@@ -0,0 +1,105 @@
+# solver backends for Hw9_model
+
+
+from ortools.linear_solver import pywraplp
+
+
+# order tried by backend='auto' (best incumbents first on our instances)
+BACKENDS = ['gurobi', 'scip', 'highs', 'cbc', 'cp_sat']
+
+
+# per-backend tuning, time_limit in seconds, threads None = backend default
+# (CBC through pywraplp does not take a thread count)
+SOLVER_DEFAULTS = {
+   'gurobi': {'threads': None, 'time_limit': 150, 'gap': 0.01, 'presolve': True},
+   'highs': {'threads': None, 'time_limit': 150, 'gap': 0.01, 'presolve': True},
+   'scip': {'threads': None, 'time_limit': 150, 'gap': 0.01, 'presolve': True},
+   'cbc': {'threads': None, 'time_limit': 150, 'gap': 0.01, 'presolve': True},
+   'cp_sat': {'threads': None, 'time_limit': 150, 'gap': 0.01, 'presolve': True},
+}
+NO_THREADS = {'cbc'}
+
+
+_available = None
+
+
+def available_backends(refresh=False):
+   """
+       Probes which backends can actually create a solver on this machine.
+       Done once per process and cached (gurobi needs a license to show up).
+       :param refresh: probe again instead of using the cached result
+       :return: list of backend names, in BACKENDS order
+       """
+   global _available
+   if _available is None or refresh:
+       _available = [b for b in BACKENDS
+                     if pywraplp.Solver.CreateSolver(b) is not None]
+   return list(_available)
+
+
+def solver_settings(backend, solver_opts=None):
+   """
+       Merges the defaults for a backend with user overrides.
+       :param backend: backend name
+       :param solver_opts: flat overrides ({'threads': 4}) applied to every
+           backend, and/or per-backend dicts ({'scip': {'gap': 0.05}})
+       :return: dict with threads, time_limit, gap, presolve
+       """
+   settings = dict(SOLVER_DEFAULTS.get(backend, SOLVER_DEFAULTS['scip']))
+   solver_opts = solver_opts or {}
+   for k, v in solver_opts.items():
+       if k not in SOLVER_DEFAULTS:
+           settings[k] = v
+   settings.update(solver_opts.get(backend, {}))
+   return settings
+
+
+def create_solver(backend='auto', solver_opts=None):
+   """
+       Creates a pywraplp MIP solver with fallback.
+       :param backend: 'auto', a backend name, or a list of names in order of
+           preference; the first one that is available is used
+       :param solver_opts: see solver_settings
+       :return: (solver, MPSolverParameters, backend name)
+       """
+   if backend == 'auto':
+       candidates = available_backends()
+   elif isinstance(backend, str):
+       candidates = [backend]
+   else:
+       candidates = list(backend)
+
+
+   for name in candidates:
+       solver = pywraplp.Solver.CreateSolver(name)
+       if solver is not None:
+           break
+   else:
+       raise RuntimeError(f"No MIP solver available out of {candidates}, "
+                          f"available here: {available_backends()}")
+
+
+   settings = solver_settings(name, solver_opts)
+
+
+   if settings.get('threads') and name not in NO_THREADS:
+       solver.SetNumThreads(int(settings['threads']))
+   if settings.get('time_limit') is not None:
+       solver.set_time_limit(int(settings['time_limit'] * 1000))  # in ms
+
+
+   params = pywraplp.MPSolverParameters()
+   if settings.get('gap') is not None:
+       params.SetDoubleParam(params.RELATIVE_MIP_GAP, settings['gap'])
+   if settings.get('presolve') is not None:
+       params.SetIntegerParam(params.PRESOLVE, params.PRESOLVE_ON if settings['presolve']
+                              else params.PRESOLVE_OFF)
+
+
+   # CP-SAT ignores the generic gap param, it has to go in its own format
+   if name == 'cp_sat' and settings.get('gap') is not None:
+       solver.SetSolverSpecificParametersAsString(
+           f"relative_gap_limit: {settings['gap']}")
+
+
+   return solver, params, name
@@ -0,0 +1,420 @@
+# two-stage stochastic model: buys, seamstress orders and courier trips are
+# decided once for all demand scenarios, the rest (makes, moves, ships and the
+# D_ backlog) is recourse per scenario
+
+
+import multiprocessing
+import time
+import traceback
+
+import numpy as np
+from ortools.linear_solver import linear_solver_pb2, pywraplp
+
+from hw10_data_conversion import OpKind, demand_entries
+from hw10_model import load_data, model_from_data
+from hw10_solver import create_solver
+
+
+# op kinds decided before demand is known (Buy_* includes Buy_JaneyTime/DougTime)
+FIRST_STAGE = (OpKind.BUY, OpKind.SEAMSTRESS, OpKind.TRIP)
+UNCERTAIN = ('Online', 'DogShow')
+
+
+def sample_scenarios(data, n, cv=0.5, customers=UNCERTAIN, seed=0):
+   """
+       Monte Carlo demand scenarios around the point forecast: each demand
+       entry of the uncertain customers is drawn from a gamma distribution
+       with the forecast as mean and coefficient of variation cv, rounded.
+       The other customers keep their forecast.
+       :param data: data set (module like hw10_data_orig or dict)
+       :param n: number of scenarios, equally likely (sample average)
+       :return: list of {'name', 'prob', 'demand': {(item, cust, t): qty}}
+       """
+   data = load_data(data)
+   rng = np.random.default_rng(seed)
+   base = demand_entries(data['demand'], data['TIME'])
+   keys = [key for key in base if key[1] in customers and base[key] > 0]
+   mean = np.array([base[key] for key in keys], dtype=float)
+   scenarios = []
+   for s in range(n):
+       draw = np.round(rng.gamma(1 / cv ** 2, mean * cv ** 2)) if cv > 0 else mean
+       demand = dict(base)
+       demand.update({key: float(q) for key, q in zip(keys, draw)})
+       scenarios.append({'name': f's{s}', 'prob': 1 / n,
+                         'demand': {key: q for key, q in demand.items() if q}})
+   return scenarios
+
+
+def first_stage(model):
+   """
+       The first-stage variables of a built model: z and BinOp of the
+       FIRST_STAGE ops in a fixed order.
+       :return: dict with keys [(family, t, op)], index (solver index per key),
+           binary (mask), min_qty (min_buy lot of z keys, 0 if none), bin_of
+           (index of the BinOp key of the same (t, op), -1 if none) and cost
+           (Money per unit, scales the PH penalty)
+       """
+   table = model.optable
+   ops = {op for op, kind in zip(table.ops, table.kind) if kind in FIRST_STAGE}
+   money = dict(zip(table.ops, table.cost('Money')))
+   keys = sorted((family, t, op) for family in ('z', 'BinOp')
+                 for (t, op) in getattr(model, family) if op in ops)
+   pos = {key: i for i, key in enumerate(keys)}
+   binary = np.array([family == 'BinOp' or table.kind[table.op_id[op]] == OpKind.TRIP
+                      for family, t, op in keys])
+   return {'keys': keys,
+           'index': np.array([getattr(model, family)[t, op].index() for family, t, op in keys]),
+           'binary': binary,
+           'min_qty': np.array([model.min_buy_ops.get(op, 0) if family == 'z' and
+                                ('BinOp', t, op) in pos else 0 for family, t, op in keys]),
+           'bin_of': np.array([pos.get(('BinOp', t, op), -1) if family == 'z' else -1
+                               for family, t, op in keys]),
+           'cost': np.array([money.get(op, 0.0) for family, t, op in keys])}
+
+
+def scenario_protos(data, scenarios, backend='auto', solver_opts=None, **model_opts):
+   """
+       Builds the model once on the envelope (per-entry max) of the scenario
+       demands and exports one MPModelProto per scenario after set_demand.
+       The propagated bounds are kept from the envelope, so they hold for
+       every scenario and the first-stage variables look the same in all.
+       :return: (model, protos, first_stage(model))
+       """
+   data = load_data(data)
+   envelope = {}
+   for sc in scenarios:
+       for key, q in sc['demand'].items():
+           envelope[key] = max(envelope.get(key, 0), q)
+   model = model_from_data(dict(data, demand=envelope), backend, solver_opts, **model_opts)
+   balance = model.constraints['R_Balance']
+   keys = [(item, cust, t) for (item, cust, t) in envelope
+           if (model.TIME[0], f"D_{cust}_{item}") in balance]
+
+
+   protos = []
+   for sc in scenarios:
+       model.set_demand({key: sc['demand'].get(key, 0) for key in keys}, refresh=False)
+       proto = linear_solver_pb2.MPModelProto()
+       model.solver.ExportModelToProto(proto)
+       protos.append(proto)
+   return model, protos, first_stage(model)
+
+
+def extensive_form(protos, probs, index):
+   """
+       Sample-average (deterministic equivalent) model: one copy of the
+       variables and rows per scenario, the objective weighted by prob and
+       the first-stage variables of every scenario tied to scenario 0's.
+       Grows linearly with the scenarios, see progressive_hedging for more.
+       :return: (MPModelProto, variable offset of each scenario)
+       """
+   ef = linear_solver_pb2.MPModelProto()
+   ef.maximize = protos[0].maximize
+   offsets = []
+   for s, (proto, p) in enumerate(zip(protos, probs)):
+       off = len(ef.variable)
+       offsets.append(off)
+       for var in proto.variable:
+           v = ef.variable.add()
+           v.CopyFrom(var)
+           v.name = f'{var.name}[{s}]'
+           v.objective_coefficient = p * var.objective_coefficient
+       for ct in proto.constraint:
+           c = ef.constraint.add()
+           c.name, c.lower_bound, c.upper_bound = f'{ct.name}[{s}]', ct.lower_bound, ct.upper_bound
+           c.var_index.extend(j + off for j in ct.var_index)
+           c.coefficient.extend(ct.coefficient)
+       ef.objective_offset += p * proto.objective_offset
+   for s, off in enumerate(offsets[1:], 1):
+       for k, j in enumerate(index):
+           c = ef.constraint.add()
+           c.name, c.lower_bound, c.upper_bound = f'NonAnticipative[{k},{s}]', 0.0, 0.0
+           c.var_index.extend([int(j) + off, int(j)])
+           c.coefficient.extend([1.0, -1.0])
+   return ef, offsets
+
+
+def _first_stage_dict(keys, x):
+   # {'z': {(t, op): qty}, 'BinOp': {...}}, the shape set_hint takes
+   out = {'z': {}, 'BinOp': {}}
+   for (family, t, op), val in zip(keys, x):
+       out[family][t, op] = float(val)
+   return out
+
+
+def solve_extensive(data, scenarios, backend='auto', solver_opts=None, **model_opts):
+   """
+       Builds and solves the extensive form in one MIP (fine for a handful of
+       scenarios).
+       :param scenarios: see sample_scenarios
+       :param solver_opts: see hw10_solver.solver_settings
+       :return: dict with status, objective (expected), best_bound, first_stage,
+           scenario_objectives, wall_time
+       """
+   start = time.perf_counter()
+   model, protos, fs = scenario_protos(data, scenarios, backend, solver_opts, **model_opts)
+   probs = [sc['prob'] for sc in scenarios]
+   ef, offsets = extensive_form(protos, probs, fs['index'])
+   solver, params, _ = create_solver(backend, solver_opts)
+   solver.LoadModelFromProto(ef)
+   status = solver.Solve(params)
+   result = {'status': status, 'scenarios': len(scenarios),
+             'variables': len(ef.variable), 'rows': len(ef.constraint)}
+   if status in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+       response = linear_solver_pb2.MPSolutionResponse()
+       solver.FillSolutionResponseProto(response)
+       values = np.array(response.variable_value)
+       result.update({'objective': solver.Objective().Value(),
+                      'best_bound': solver.Objective().BestBound(),
+                      'first_stage': _first_stage_dict(fs['keys'], values[fs['index']]),
+                      'scenario_objectives': [
+                          proto.objective_offset + float(np.dot(
+                              [v.objective_coefficient for v in proto.variable],
+                              values[off:off + len(proto.variable)]))
+                          for proto, off in zip(protos, offsets)]})
+   result['wall_time'] = time.perf_counter() - start
+   return result
+
+
+class _ScenarioSub:
+   """
+       One scenario MIP for progressive hedging. The PH terms are
+       -w.x - rho.|x - xbar| on the first-stage x (maximizing), the absolute
+       value through dev variables: dev >= x - xbar, dev >= xbar - x.
+       """
+
+
+   def __init__(self, proto_bytes, index, backend, solver_opts):
+       proto = linear_solver_pb2.MPModelProto.FromString(proto_bytes)
+       n_var, n_row = len(proto.variable), len(proto.constraint)
+       for k, j in enumerate(index):
+           dev = proto.variable.add()
+           dev.name, dev.lower_bound, dev.upper_bound = f'ph_dev[{k}]', 0.0, float('inf')
+           for sign in (-1.0, 1.0):
+               c = proto.constraint.add()  # dev + sign * x >= sign * xbar, off until used
+               c.name, c.lower_bound, c.upper_bound = f'ph_prox[{k},{sign:+.0f}]', -float('inf'), float('inf')
+               c.var_index.extend([n_var + k, int(j)])
+               c.coefficient.extend([1.0, sign])
+       self.solver, self.params, _ = create_solver(backend, solver_opts)
+       self.solver.LoadModelFromProto(proto)
+       variables = self.solver.variables()
+       self.x = [variables[int(j)] for j in index]
+       self.dev = variables[n_var:]
+       self.prox = self.solver.constraints()[n_row:]
+       self.base = np.array([proto.variable[int(j)].objective_coefficient for j in index])
+
+
+   def solve(self, w, xbar, rho, time_limit):
+       objective = self.solver.Objective()
+       w = np.zeros(len(self.x)) if w is None else np.asarray(w)
+       rho = np.zeros(len(self.x)) if rho is None else np.asarray(rho)
+       for var, coef in zip(self.x, self.base - w):
+           objective.SetCoefficient(var, float(coef))
+       for k, var in enumerate(self.dev):
+           objective.SetCoefficient(var, -float(rho[k]))
+           for sign, ct in zip((-1.0, 1.0), self.prox[2 * k:2 * k + 2]):
+               ct.SetLb(sign * float(xbar[k]) if rho[k] > 0 else -self.solver.infinity())
+       self.solver.set_time_limit(int(time_limit * 1000))
+       status = self.solver.Solve(self.params)
+       if status not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+           return {'status': status, 'objective': None, 'bound': None, 'gap': None, 'x': None}
+       x = np.array([var.solution_value() for var in self.x])
+       dev = np.array([var.solution_value() for var in self.dev])
+       value, bound = objective.Value(), objective.BestBound()
+       return {'status': status, 'x': x,
+               'objective': value + float(w @ x) + float(rho @ dev),  # the scenario's own objective
+               'bound': bound,  # of the PH objective
+               'gap': abs(bound - value) / max(abs(value), 1e-9)}
+
+
+   def evaluate(self, x, time_limit):
+       # recourse with the first stage fixed, no PH terms
+       for var, val in zip(self.x, x):
+           var.SetBounds(float(val), float(val))
+       result = self.solve(None, np.zeros(len(self.x)), None, time_limit)
+       result.pop('x')
+       return result
+
+
+def _worker_loop(conn, subs_args):
+   # lives for the whole PH run, keeps its scenario solvers between iterations
+   try:
+       subs = {k: _ScenarioSub(*args) for k, args in subs_args.items()}
+       conn.send('ready')
+   except Exception:
+       conn.send(RuntimeError(traceback.format_exc()))
+       return
+   while True:
+       msg = conn.recv()
+       if msg is None:
+           return
+       cmd, args = msg
+       try:
+           conn.send({k: getattr(subs[k], cmd)(*a) for k, a in args.items()})
+       except Exception:
+           conn.send(RuntimeError(traceback.format_exc()))
+
+
+class _SubPool:
+   # the scenario subproblems, split over worker processes (or all here)
+
+
+   def __init__(self, protos, index, backend, solver_opts, max_workers, processes):
+       n = len(protos)
+       args = {k: (protos[k].SerializeToString(), index, backend, solver_opts) for k in range(n)}
+       self.processes = processes
+       if not processes:
+           self.subs = {k: _ScenarioSub(*a) for k, a in args.items()}
+           return
+       n_workers = min(n, max_workers or multiprocessing.cpu_count())
+       self.groups = [list(range(n))[i::n_workers] for i in range(n_workers)]
+       self.conns, self.procs = [], []
+       for group in self.groups:
+           parent, child = multiprocessing.Pipe()
+           proc = multiprocessing.Process(target=_worker_loop, daemon=True,
+                                          args=(child, {k: args[k] for k in group}))
+           proc.start()
+           self.conns.append(parent)
+           self.procs.append(proc)
+       for conn in self.conns:
+           self._check(conn.recv())
+
+
+   @staticmethod
+   def _check(msg):
+       if isinstance(msg, Exception):
+           raise msg
+       return msg
+
+
+   def call(self, cmd, args):
+       """Runs cmd(*args[k]) on every scenario k, in parallel over the workers."""
+       if not self.processes:
+           return {k: getattr(self.subs[k], cmd)(*a) for k, a in args.items()}
+       for conn, group in zip(self.conns, self.groups):
+           conn.send((cmd, {k: args[k] for k in group}))
+       out = {}
+       for conn in self.conns:
+           out.update(self._check(conn.recv()))
+       return out
+
+
+   def close(self):
+       if self.processes:
+           for conn in self.conns:
+               conn.send(None)
+           for proc in self.procs:
+               proc.join(timeout=10)
+
+
+def _round_first_stage(xbar, fs):
+   # an implementable first stage: binaries at .5, integers to the nearest
+   # lot, buys below their min_buy lot go to 0 or up to the lot
+   x = np.where(fs['binary'], (xbar >= .5).astype(float), np.round(xbar))
+   for k, b in enumerate(fs['bin_of']):
+       if b < 0:
+           continue
+       m = fs['min_qty'][k]
+       if 0 < x[k] < m:
+           x[k] = m if xbar[k] >= m / 2 else 0
+       x[b] = float(x[k] > 0)
+   return x
+
+
+def progressive_hedging(data, scenarios, rho=1.0, iterations=20, tol=1.0, sub_time=10,
+                       eval_time=None, bound=True, max_workers=None, processes=True,
+                       backend='auto', solver_opts=None, callback=None, sub_gap=None,
+                       **model_opts):
+   """
+       Progressive hedging over the scenario MIPs: each scenario is solved on
+       its own with its PH weights w and a proximal term towards the consensus
+       xbar (the probability-weighted mean of the first stages), then
+       w += rho * (x - xbar), until the first stages agree. The scenario
+       solves run in parallel worker processes that keep their solvers.
+       The proximal term is |x - xbar| (the MIP solvers here are linear).
+       The rounded consensus is then fixed and every scenario's recourse
+       solved, which prices the plan. Agreement only counts as convergence
+       when every scenario solve of the iteration is proven: first stages of
+       time-limited incumbents can agree by chance.
+       :param scenarios: see sample_scenarios
+       :param rho: penalty per unit of disagreement, times max(1, Money cost
+           of the op) so it's in the same units as the objective
+       :param iterations: PH iterations after the first independent solves
+       :param tol: stop when sum_s p_s sum_j |x_sj - xbar_j| is below this
+       :param sub_time: time limit of each scenario solve (s)
+       :param eval_time: time limit of the final recourse solves, default sub_time
+       :param bound: also solve with the final w and no proximal term, the
+           weighted best bounds are an upper bound on the stochastic optimum
+       :param max_workers: worker processes, default one per core (at most one per scenario)
+       :param processes: False solves all scenarios in this process
+       :param callback: called with each iteration's history entry
+       :param sub_gap: a FEASIBLE (time-limited) scenario solve within this
+           gap counts as proven too, None for OPTIMAL only
+       :return: dict with objective (expected value of the plan, None if some
+           scenario has no recourse), upper_bound, first_stage,
+           scenario_objectives, infeasible (scenario names), converged,
+           history (spread, objective, scenario statuses and gaps per
+           iteration), wall_time
+       """
+   start = time.perf_counter()
+   model, protos, fs = scenario_protos(data, scenarios, backend, solver_opts, **model_opts)
+   p = np.array([sc['prob'] for sc in scenarios])
+   ks = range(len(scenarios))
+   rho_vec = rho * np.maximum(fs['cost'], 1.0)
+   pool = _SubPool(protos, fs['index'], backend, solver_opts, max_workers, processes)
+   try:
+       def run(w, xbar, r):
+           out = pool.call('solve', {k: (None if w is None else w[k], xbar, r, sub_time) for k in ks})
+           missing = [scenarios[k]['name'] for k in ks if out[k]['x'] is None]
+           if missing:
+               raise RuntimeError(f"scenarios {missing} have no solution in {sub_time}s")
+           return out
+
+
+       out = run(None, None, None)
+       X = np.array([out[k]['x'] for k in ks])
+       xbar = p @ X
+       W = rho_vec * (X - xbar)
+       history, converged = [], False
+       for it in range(iterations + 1):
+           if it > 0:
+               out = run(W, xbar, rho_vec)
+               X = np.array([out[k]['x'] for k in ks])
+               xbar = p @ X
+               W += rho_vec * (X - xbar)
+           spread = float(p @ np.abs(X - xbar).sum(axis=1))
+           proven = all(out[k]['status'] == pywraplp.Solver.OPTIMAL
+                        or (sub_gap is not None and out[k]['gap'] <= sub_gap) for k in ks)
+           entry = {'iteration': it, 'spread': spread,
+                    'objective': float(p @ [out[k]['objective'] for k in ks]),
+                    'statuses': [out[k]['status'] for k in ks], 'gaps': [out[k]['gap'] for k in ks],
+                    'elapsed': time.perf_counter() - start}
+           history.append(entry)
+           if callback:
+               callback(entry)
+           if spread <= tol and proven:
+               converged = True
+               break
+
+
+       result = {'converged': converged, 'history': history, 'upper_bound': None}
+       if bound:
+           # Lagrangian bound: sum_s p_s W_s = 0, so sum_s p_s max(f_s - W_s x)
+           # is above the optimum, if the solves got their bounds right
+           out = run(W, xbar, None)
+           result['upper_bound'] = float(p @ [out[k]['bound'] for k in ks])
+
+
+       x_hat = _round_first_stage(xbar, fs)
+       evals = pool.call('evaluate', {k: (x_hat, eval_time or sub_time) for k in ks})
+   finally:
+       pool.close()
+
+
+   objs = [evals[k]['objective'] for k in ks]
+   infeasible = [scenarios[k]['name'] for k in ks if objs[k] is None]
+   result.update({'first_stage': _first_stage_dict(fs['keys'], x_hat),
+                  'scenario_objectives': objs, 'infeasible': infeasible,
+                  'objective': None if infeasible else float(p @ objs),
+                  'wall_time': time.perf_counter() - start})
+   return result
@@ -0,0 +1,67 @@
+# shared helpers: small instances of the sample data that solve to proven
+# optimality in a few seconds
+
+
+import os
+import sys
+
+import pytest
+from ortools.linear_solver import linear_solver_pb2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hw10_model import load_data, model_from_data  # noqa: E402
+from hw10_solver import available_backends  # noqa: E402
+import hw10_data_orig  # noqa: E402
+
+
+# proven optimum, no gap and room to get there
+EXACT = {'gap': 0, 'time_limit': 120}
+
+
+needs_scip = pytest.mark.skipif('scip' not in available_backends(), reason='needs SCIP')
+
+
+def small_data(demand, drop_supply=(), prices=None):
+   """Sample data with only the given demand {(item, cust, t): qty}."""
+   data = load_data(hw10_data_orig)
+   data['demand'] = dict(demand)
+   data['supply'] = {k: v for k, v in data['supply'].items() if k[0] not in drop_supply}
+   data['baseprice'] = {**data['baseprice'], **(prices or {})}
+   return data
+
+
+# a round trip move beats stocking the rods, and the 'Mesh ' typo in the BOM
+# leaves SMeshTop (and the MeshScrap for bags) free of mesh
+INSTANCES = {
+   'round_trip': small_data({('LargeMMeshBed', 'Store', '5-Dec'): 2},
+                            drop_supply=('30MRods', '36MRods'),
+                            prices={('LargeMMeshBed', 'Store'): 10000}),
+   'bags': small_data({('Bag', 'Store', '6-Dec'): 2, ('Pillow', 'Online', '4-Dec'): 3}),
+}
+
+
+def solve(data, **model_opts):
+   model = model_from_data(data, 'SCIP', EXACT, **model_opts)
+   model.solve()
+   return model
+
+
+def canonical(proto):
+   """
+       A proto by names, so models built in another order compare equal:
+       ({var: (lb, ub, obj, integer)}, {row: (lb, ub, {var: coef})}).
+       """
+   names = [v.name for v in proto.variable]
+   variables = {v.name: (v.lower_bound, v.upper_bound, v.objective_coefficient, v.is_integer)
+                for v in proto.variable}
+   rows = {ct.name: (ct.lower_bound, ct.upper_bound,
+                     {names[j]: a for j, a in zip(ct.var_index, ct.coefficient) if a})
+           for ct in proto.constraint}
+   return variables, rows
+
+
+def proto_of(model):
+   proto = linear_solver_pb2.MPModelProto()
+   model.solver.ExportModelToProto(proto)
+   return proto
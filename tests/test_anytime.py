@@ -0,0 +1,50 @@
+from ortools.linear_solver import pywraplp
+
+from conftest import INSTANCES, needs_scip
+from hw10_model import model_from_data
+
+
+@needs_scip
+def test_incumbents_improve_and_stay():
+   model = model_from_data(INSTANCES['bags'], 'SCIP', {'gap': 0})
+   events = list(model.iter_solve(time_budget=20, first_slice=0.2))
+   assert events
+   objectives = [e['objective'] for e in events]
+   assert objectives == sorted(objectives) and len(set(objectives)) == len(objectives)
+   assert all(e['best_bound'] >= e['objective'] - 1e-6 for e in events)
+   # the kept plan, its status and the KPIs belong together
+   assert model.solution is events[-1]['solution'] or (
+       model.solution.objective == objectives[-1] and model.status == pywraplp.Solver.OPTIMAL)
+   assert model.status == model.solution.stats['status']
+   assert model.kpis()['objective'] == model.solution.objective
+
+
+@needs_scip
+def test_anytime_callback_stops():
+   model = model_from_data(INSTANCES['bags'], 'SCIP', {'gap': 0})
+   seen = []
+   solution = model.solve_anytime(lambda e: seen.append(e) or True, time_budget=20, first_slice=0.2)
+   assert len(seen) == 1 and solution is seen[0]['solution'] is model.solution
+   assert model.status == solution.stats['status']
+
+
+@needs_scip
+def test_status_of_the_kept_incumbent(monkeypatch):
+   # a last slice that runs out of time without a solution mustn't leave its
+   # status next to the earlier incumbent
+   model = model_from_data(INSTANCES['bags'], 'SCIP', {'gap': 0})
+   solve, calls = model.solve, []
+
+
+   def timed_out():
+       calls.append(1)
+       if len(calls) == 1:
+           return solve()
+       model.status = pywraplp.Solver.NOT_SOLVED
+       return model.status
+
+
+   monkeypatch.setattr(model, 'solve', timed_out)
+   events = list(model.iter_solve(time_budget=30, first_slice=1, stop=lambda: len(calls) >= 2))
+   assert len(events) == 1 and model.solution is events[0]['solution']
+   assert model.has_solution() and model.status == model.solution.stats['status']
@@ -0,0 +1,41 @@
+import copy
+import json
+
+from hw10_benchmark import SIZES, compare, print_regressions, run_case, synthetic_data
+
+
+def slowed(report, **times):
+   out = copy.deepcopy(report)
+   out['results'][0]['timings'].update(times)
+   return out
+
+
+def test_compare_flags_a_slowed_phase(tmp_path, capsys):
+   row = run_case('xs', synthetic_data(**SIZES['xs']), 'SCIP', solve=False, trace_memory=False)
+   assert row['timings'] and not row['trace_memory']
+   base = slowed({'results': [row]}, variables=.1, params=.001)
+   path = tmp_path / 'base.json'
+   path.write_text(json.dumps(base))
+
+
+   assert compare(str(path), base) == []
+   assert print_regressions([]) == 0
+   # within tolerance, or too short to time reliably: no regression
+   assert compare(base, slowed(base, variables=.12, params=.04)) == []
+   regressions = compare(str(path), slowed(base, variables=.2))
+   assert [(r['name'], r['metric']) for r in regressions] == [('xs', 'timings.variables')]
+   assert regressions[0]['ratio'] == 2
+   assert print_regressions(regressions) == 1
+   assert 'REGRESSION xs timings.variables: 0.100 -> 0.200 (2.00x)' in capsys.readouterr().out
+   # cases missing from the baseline are skipped
+   assert compare(base, {'results': [dict(row, name='xl', build_time=1e3)]}) == []
+
+
+def test_compare_memory():
+   row = {'name': 'xs', 'timings': {}, 'build_time': 0, 'peak_mb': 10, 'trace_memory': True}
+   base = {'results': [row]}
+   grown = {'results': [dict(row, peak_mb=20)]}
+   assert [r['metric'] for r in compare(base, grown)] == ['peak_mb']
+   # peak memory of a run without tracemalloc isn't comparable
+   untraced = {'results': [dict(row, peak_mb=20, trace_memory=False)]}
+   assert compare(base, untraced) == []
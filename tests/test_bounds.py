@@ -0,0 +1,41 @@
+import pytest
+
+from conftest import INSTANCES, needs_scip, solve
+from hw10_model import model_from_data
+
+
+@needs_scip
+@pytest.mark.parametrize('name', sorted(INSTANCES))
+def test_tightening_keeps_optimum(name):
+   loose = solve(INSTANCES[name], tighten_bigm=False)
+   tight = solve(INSTANCES[name], tighten_bigm=True)
+   assert loose.status == tight.status == 0
+   assert tight.solution.objective == pytest.approx(loose.solution.objective, abs=1e-6)
+
+
+def test_forward_bounds_skip_inputs_without_a_row():
+   # 'Mesh ' isn't a resource of the model, so it can't stop Make_SMeshTop
+   model = model_from_data(INSTANCES['bags'], 'SCIP')
+   assert ('SMeshTop', 'Mesh ') in model.usage
+   assert max(model.op_ub[t, 'Make_SMeshTop'] for t in model.TIME) > 0
+
+
+def test_demand_bounds_keep_min_lots():
+   model = model_from_data(INSTANCES['round_trip'], 'SCIP', tighten_bigm='demand')
+   forward = model_from_data(INSTANCES['round_trip'], 'SCIP')
+   for (t, op), ub in model.op_ub.items():
+       lot = model.min_buy_ops.get(op, 0)
+       assert ub >= min(lot, forward.op_ub[t, op])
+
+
+def test_unknown_tightening():
+   with pytest.raises(ValueError):
+       model_from_data(INSTANCES['bags'], 'SCIP', tighten_bigm='yes')
+
+
+def test_forward_bounds_not_negative():
+   # money owed at the start: nothing can be bought, but the bounds stay valid
+   model = model_from_data(INSTANCES['bags'], 'SCIP')
+   model.set_supply('Money', model.TIME[1], -1e6)
+   assert min(model.op_ub.values()) >= 0
+   assert min(var.ub() for var in model.z.values()) >= 0
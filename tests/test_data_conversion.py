@@ -0,0 +1,114 @@
+import os
+
+import pytest
+
+import hw10_data_conversion
+import hw10_data_orig
+from conftest import INSTANCES
+from hw10_data_conversion import (cached_data_to_op, clear_op_cache, compile_op_table, demand_entries,
+                                  op_cache_stats)
+from hw10_model import load_data
+
+
+TIME = ['3-Dec', '4-Dec', '5-Dec']
+
+
+def test_dense_rows():
+   demand = {('Bag', 'Store'): [0, 2, 1]}
+   assert demand_entries(demand, TIME) == {('Bag', 'Store', '4-Dec'): 2, ('Bag', 'Store', '5-Dec'): 1}
+
+
+@pytest.mark.parametrize('row', [[1, 2], [1, 2, 3, 4]])
+def test_dense_row_length(row):
+   with pytest.raises(ValueError, match='needs 3 periods, got'):
+       demand_entries({('Bag', 'Store'): row}, TIME)
+
+
+def ops_of(data, **kw):
+   return cached_data_to_op(data['MATERIAL'], data['CAPACITY'], data['CUSTOMER'], data['NO_LATE'],
+                            data['TIME'], data['usage'], data['sub_usage'], data['ord_cost'],
+                            data['ord_qty'], data['demand'], data['baseprice'], data['supply'], **kw)
+
+
+def test_op_cache_hit_is_a_copy():
+   clear_op_cache()
+   first = ops_of(INSTANCES['bags'])
+   assert op_cache_stats['last'] == 'miss'
+   second = ops_of(INSTANCES['bags'])
+   assert op_cache_stats['last'] == 'memory'
+   assert second == first
+   assert all(a is not b for a, b in zip(first, second))
+
+
+def test_op_cache_not_poisoned():
+   clear_op_cache()
+   OPERATIONS, BOP, BOR, usage_param = ops_of(INSTANCES['bags'])[:4]
+   OPERATIONS.add('Make_Nothing')
+   BOR.clear()
+   usage_param['Make_Pillow', 'DougTime'] = 99
+   again = ops_of(INSTANCES['bags'])
+   assert 'Make_Nothing' not in again[0] and again[2]
+   assert again[3]['Make_Pillow', 'DougTime'] == 3
+
+
+def test_op_cache_on_disk(tmp_path):
+   clear_op_cache()
+   first = ops_of(INSTANCES['bags'], cache_dir=str(tmp_path))
+   files = os.listdir(tmp_path)
+   # written in one go: the pickle only, no temp file left behind
+   assert len(files) == 1 and files[0].startswith('ops_') and files[0].endswith('.pkl')
+   clear_op_cache()
+   assert ops_of(INSTANCES['bags'], cache_dir=str(tmp_path)) == first
+   assert op_cache_stats['last'] == 'disk'
+   # a broken file is built again and replaced
+   (tmp_path / files[0]).write_bytes(b'half a pickle')
+   clear_op_cache()
+   assert ops_of(INSTANCES['bags'], cache_dir=str(tmp_path)) == first
+   assert op_cache_stats['last'] == 'miss'
+   clear_op_cache()
+   ops_of(INSTANCES['bags'], cache_dir=str(tmp_path))
+   assert op_cache_stats['last'] == 'disk'
+
+
+def test_op_cache_lru(monkeypatch):
+   monkeypatch.setattr(hw10_data_conversion, 'OP_CACHE_SIZE', 2)
+   clear_op_cache()
+   for name in ('bags', 'round_trip', 'bags'):
+       ops_of(INSTANCES[name])
+   ops_of(dict(INSTANCES['bags'], demand={('Pillow', 'Store', '5-Dec'): 4}))
+   # bags was used last, so round_trip is the one dropped
+   ops_of(INSTANCES['bags'])
+   assert op_cache_stats['last'] == 'memory'
+   ops_of(INSTANCES['round_trip'])
+   assert op_cache_stats['last'] == 'miss'
+
+
+def test_op_table_rebuilds_bom():
+   OPERATIONS, BOP, BOR, usage, produce, offset, MATERIAL, CAPACITY = ops_of(load_data(hw10_data_orig))
+   table = compile_op_table(OPERATIONS, MATERIAL, CAPACITY, BOR, BOP, usage, produce, offset)
+   assert set(table.ops) == OPERATIONS and set(table.resources) == MATERIAL | CAPACITY
+
+
+   def rows(ptr, res, *cols):
+       return {(table.ops[i], table.resources[res[k]]): tuple(c[k] for c in cols)
+               for i in range(len(table.ops)) for k in range(ptr[i], ptr[i + 1])}
+
+
+   # the 'Mesh ' typo is no resource, so its entries are left out
+   def rebuilt(pairs, *params):
+       return {(op, r): tuple(p.get((op, r), 0) for p in params) for (op, r) in pairs
+               if r in MATERIAL | CAPACITY}
+
+
+   assert rows(table.use_ptr, table.use_res, table.use_qty) == rebuilt(BOR, usage)
+   assert (rows(table.prod_ptr, table.prod_res, table.prod_qty, table.prod_off)
+           == rebuilt(BOP, produce, offset))
+   # resource-major, the same entries in op order
+   for which, pairs, params in (('use', BOR, (usage,)), ('prod', BOP, (produce, offset))):
+       ptr, op, qty, off = table.by_resource(which)
+       by_res = {}
+       for r in range(len(table.resources)):
+           assert list(op[ptr[r]:ptr[r + 1]]) == sorted(op[ptr[r]:ptr[r + 1]])
+           for k in range(ptr[r], ptr[r + 1]):
+               by_res[table.ops[op[k]], table.resources[r]] = (qty[k], off[k])[:len(params)]
+       assert by_res == rebuilt(pairs, *params)
@@ -0,0 +1,19 @@
+import warnings
+
+import numpy as np
+from ortools.linear_solver import linear_solver_pb2
+
+from conftest import INSTANCES
+from hw10_decomposition import implied_upper_bounds
+from hw10_model import model_from_data
+
+
+def test_implied_bounds_without_warnings():
+   model = model_from_data(INSTANCES['bags'], 'SCIP', tighten_bigm=False)
+   proto = linear_solver_pb2.MPModelProto()
+   model.solver.ExportModelToProto(proto)
+   with warnings.catch_warnings():
+       warnings.simplefilter('error')
+       ub = implied_upper_bounds(proto)
+   assert np.all(ub >= [v.lower_bound for v in proto.variable])
+   assert np.isfinite(ub).sum() > np.isfinite([v.upper_bound for v in proto.variable]).sum()
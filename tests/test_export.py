@@ -0,0 +1,44 @@
+import pytest
+from ortools.linear_solver import linear_solver_pb2
+
+from conftest import EXACT, INSTANCES, canonical, needs_scip, solve
+from hw10_export import compact_names, export_model, load_file, solve_file
+from hw10_model import model_from_data
+
+
+@pytest.fixture
+def model():
+   return model_from_data(INSTANCES['round_trip'], 'SCIP')
+
+
+def test_mps_round_trip(model, tmp_path):
+   path = str(tmp_path / 'plan.mps')
+   export_model(model, path)
+   proto = linear_solver_pb2.MPModelProto()
+   model.solver.ExportModelToProto(proto)
+   var_names, row_names, _ = compact_names(model)
+   for var, name in zip(proto.variable, var_names):
+       var.name = name
+   for ct, name in zip(proto.constraint, row_names):
+       ct.name = name
+   assert canonical(load_file(path)) == canonical(proto)
+
+
+@needs_scip
+def test_solve_saved_model(tmp_path):
+   model = solve(INSTANCES['round_trip'])
+   path = str(tmp_path / 'plan.mps')
+   export_model(model, path)
+   result = solve_file(path, 'SCIP', EXACT)
+   assert result['status'] == 0
+   assert result['objective'] == pytest.approx(model.solution.objective, abs=1e-6)
+   # the name map takes the values back to the model keys
+   assert set(result['warm_start']['z']) == set(model.z)
+   assert model.set_hint(result['warm_start']) == model.solver.NumVariables()
+
+
+def test_lp_files_not_loaded(model, tmp_path):
+   path = str(tmp_path / 'plan.lp')
+   export_model(model, path)
+   with pytest.raises(ValueError):
+       load_file(path)
@@ -0,0 +1,59 @@
+import pytest
+from ortools.linear_solver import pywraplp
+
+import hw10_data_orig
+import hw10_fast
+from conftest import INSTANCES, needs_scip, solve
+from hw10_model import load_data, model_from_data
+
+
+@needs_scip
+def test_fast_plan_on_sample_data():
+   model = model_from_data(load_data(hw10_data_orig), 'SCIP')
+   result = model.solve_fast()
+   assert result['status'] in (0, 1)
+   assert result['objective'] <= result['lp_bound'] + 1e-6
+   assert result['gap'] < 0.5
+   assert model.solution.objective == pytest.approx(result['objective'])
+   # the fix-up MIP has its own small budget, not the model's time limit
+   assert result['timings']['fix'] < 5
+
+
+@needs_scip
+def test_fast_plan_not_above_optimum():
+   data = INSTANCES['round_trip']
+   result = model_from_data(data, 'SCIP').solve_fast()
+   assert result['objective'] <= solve(data).solution.objective + 1e-6
+
+
+def test_fast_plan_infeasible_lp():
+   model = model_from_data(INSTANCES['bags'], 'SCIP')
+   model.set_supply('Money', model.TIME[0], -1e6)
+   result = model.solve_fast()
+   assert result['status'] == pywraplp.Solver.INFEASIBLE
+   assert result['lp_bound'] is None and model.solution is None
+
+
+def test_fast_plan_invalid_model():
+   # GLOP won't load it, and mustn't report the empty model as optimal
+   model = model_from_data(INSTANCES['bags'], 'SCIP')
+   next(iter(model.z.values())).SetBounds(1, 0)
+   result = model.solve_fast()
+   assert result['status'] == pywraplp.Solver.MODEL_INVALID
+   assert result['lp_bound'] is None and model.solution is None
+
+
+def test_fix_up_uses_the_solver_opts(monkeypatch):
+   made = []
+   create_solver = hw10_fast.create_solver
+
+
+   def record(backend, solver_opts=None):
+       made.append(solver_opts)
+       return create_solver(backend, solver_opts)
+
+
+   monkeypatch.setattr(hw10_fast, 'create_solver', record)
+   opts = {'gap': 0, 'threads': 1, 'presolve': False}
+   model_from_data(INSTANCES['bags'], 'SCIP', opts).solve_fast()
+   assert made and all(o == opts for o in made)
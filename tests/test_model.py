@@ -0,0 +1,41 @@
+import pytest
+
+from conftest import INSTANCES, canonical, needs_scip, proto_of, solve
+from hw10_model import model_from_data
+
+
+# Hw9_model at the baseline commit on the same instances (gurobi swapped for
+# SCIP at gap 0): optimum, variables, rows
+BASELINE = {'round_trip': (1519.0, 1968, 666), 'bags': (1517.5, 1986, 672)}
+
+
+@needs_scip
+@pytest.mark.parametrize('name', sorted(BASELINE))
+def test_plain_model_matches_baseline(name):
+   model = solve(INSTANCES[name], tighten_bigm=False, presolve=False)
+   objective, n_var, n_row = BASELINE[name]
+   assert model.status == 0
+   assert model.solution.objective == pytest.approx(objective, abs=1e-6)
+   assert (model.solver.NumVariables(), model.solver.NumConstraints()) == (n_var, n_row)
+
+
+@pytest.mark.parametrize('tighten', [False, True])
+def test_sparse_assembly_same_model(tighten):
+   data = INSTANCES['bags']
+   scalar = model_from_data(data, 'SCIP', tighten_bigm=tighten)
+   sparse = model_from_data(data, 'SCIP', tighten_bigm=tighten, assembly='sparse')
+   assert canonical(proto_of(sparse)) == canonical(proto_of(scalar))
+
+
+@needs_scip
+def test_sparse_assembly_same_optimum():
+   data = INSTANCES['round_trip']
+   scalar, sparse = solve(data), solve(data, assembly='sparse')
+   assert scalar.status == sparse.status == 0
+   assert sparse.solution.objective == pytest.approx(scalar.solution.objective, abs=1e-6)
+   assert sparse.solution.kpis == pytest.approx(scalar.solution.kpis)
+
+
+def test_unknown_assembly():
+   with pytest.raises(ValueError):
+       model_from_data(INSTANCES['bags'], 'SCIP', assembly='dense')
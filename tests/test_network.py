@@ -0,0 +1,52 @@
+from conftest import INSTANCES, canonical, proto_of
+from hw10_data_conversion import DEFAULT_LANES, DEFAULT_LOCATIONS, DEFAULT_WORKERS
+from hw10_model import model_from_data
+from hw10_solution import move_sort_key
+
+
+# the Garage/Studio pair plus a shop that only sells bags and pillows
+SHOP = {'LOCATIONS': ['Garage', 'Studio', 'Shop'],
+       'LANES': {**DEFAULT_LANES, ('Studio', 'Shop'): {'cost': 20, 'offset': 1, 'capacity': 40}},
+       'STOCKED': {'Shop': ['Bag', 'Pillow']}}
+
+
+def test_default_network():
+   data = INSTANCES['bags']
+   default = model_from_data(data, 'SCIP')
+   explicit = model_from_data(dict(data, LOCATIONS=DEFAULT_LOCATIONS, LANES=DEFAULT_LANES,
+                                   WORKERS=DEFAULT_WORKERS), 'SCIP')
+   assert canonical(proto_of(default)) == canonical(proto_of(explicit))
+   # the names the Garage/Studio ops always had
+   transfers = {op for op in default.OPERATIONS if op.startswith(('Move_', 'Op_Trip_'))}
+   assert {'Op_Trip_Garage_to_Studio', 'Op_Trip_Studio_to_Garage'} < transfers
+   assert all(op.endswith(('_Garage_to_Studio', '_Studio_to_Garage')) for op in transfers)
+   assert {'Transport_G2S', 'Transport_S2G'} < default.RESOURCE
+
+
+def test_third_location():
+   model = model_from_data(dict(INSTANCES['bags'], **SHOP), 'SCIP')
+   shop_ops = {op for op in model.OPERATIONS if 'Shop' in op}
+   assert shop_ops == {'Move_Bag_Studio_to_Shop', 'Move_Pillow_Studio_to_Shop',
+                       'Op_Trip_Studio_to_Shop'}
+   assert {r for r in model.RESOURCE if 'Shop' in r} == {'Bag_Shop', 'Pillow_Shop',
+                                                         'Transport_Studio_to_Shop'}
+   move = 'Move_Bag_Studio_to_Shop'
+   assert model.usage_param[move, 'Bag_Studio'] == 1
+   assert model.usage_param[move, 'Transport_Studio_to_Shop'] == 1
+   assert (model.produce_param[move, 'Bag_Shop'], model.offset_param[move, 'Bag_Shop']) == (1, 1)
+   # one trip pays the lane cost and carries up to its capacity
+   trip = 'Op_Trip_Studio_to_Shop'
+   assert model.usage_param[trip, 'Money'] == 20
+   assert model.produce_param[trip, 'Transport_Studio_to_Shop'] == 40
+   assert model.network.location('Bag_Shop') == 'Shop'
+
+
+def test_moves_in_lane_order():
+   model = model_from_data(dict(INSTANCES['bags'], **SHOP), 'SCIP')
+   ops = [('Move_Bag_Studio_to_Shop', 1), ('Move_Bag_Studio_to_Garage', 1),
+          ('Move_Bag_Garage_to_Studio', 1), ('Make_Bag', 1)]
+   ordered = sorted(ops, key=lambda x: move_sort_key(x, model.network))
+   assert [op for op, _ in ordered] == ['Move_Bag_Garage_to_Studio', 'Move_Bag_Studio_to_Garage',
+                                        'Move_Bag_Studio_to_Shop', 'Make_Bag']
+   # without a network, the Garage/Studio order
+   assert sorted(ops[1:], key=move_sort_key)[0][0] == 'Move_Bag_Garage_to_Studio'
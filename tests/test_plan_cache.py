@@ -0,0 +1,46 @@
+from ortools.linear_solver import pywraplp
+
+from conftest import EXACT, INSTANCES, needs_scip
+from hw10_plan_cache import PlanCache, fingerprint
+
+
+@needs_scip
+def test_hit_warm_and_miss():
+   data = INSTANCES['round_trip']
+   with PlanCache(':memory:') as cache:
+       first = cache.plan(data, 'SCIP', EXACT)
+       assert first['cache'] == 'miss' and first['status'] == 0
+       assert cache.plan(data, 'SCIP', EXACT)['cache'] == 'hit'
+       other = dict(data, demand={k: v + 1 for k, v in data['demand'].items()})
+       assert cache.plan(other, 'SCIP', EXACT)['cache'] == 'warm'
+       assert cache.stats['hits'] == cache.stats['warm'] == cache.stats['misses'] == 1
+
+
+@needs_scip
+def test_prior_without_warm_start_is_a_miss():
+   data = INSTANCES['round_trip']
+   other = dict(data, demand={k: v + 1 for k, v in data['demand'].items()})
+   with PlanCache(':memory:') as cache:
+       key, structure = fingerprint(other, 'SCIP', EXACT)
+       cache.put(key, structure, {'status': 0})
+       assert cache.plan(data, 'SCIP', EXACT)['cache'] == 'miss'
+
+
+@needs_scip
+def test_time_limited_plan_not_stored():
+   data = INSTANCES['bags']
+   with PlanCache(':memory:') as cache:
+       # (a fast machine may prove it in time, then it's a plain hit)
+       result = cache.plan(data, 'SCIP', {'gap': 0, 'time_limit': 0.5})
+       stored = result['status'] == pywraplp.Solver.OPTIMAL
+       assert len(cache) == stored and cache.stats['not_stored'] == (not stored)
+       again = cache.plan(data, 'SCIP', {'gap': 0, 'time_limit': 0.5})
+       assert (again['cache'] == 'hit') == stored
+
+
+def test_storable():
+   feasible = {'status': pywraplp.Solver.FEASIBLE, 'stats': {'gap': 0.02}}
+   assert PlanCache(':memory:').storable({'status': pywraplp.Solver.OPTIMAL})
+   assert not PlanCache(':memory:').storable(feasible)
+   assert PlanCache(':memory:', max_gap=0.05).storable(feasible)
+   assert not PlanCache(':memory:', max_gap=0.01).storable(feasible)
@@ -0,0 +1,49 @@
+import pytest
+
+from conftest import INSTANCES, needs_scip, small_data, solve
+from hw10_model import model_from_data
+
+
+@needs_scip
+@pytest.mark.parametrize('name', sorted(INSTANCES))
+def test_presolve_keeps_optimum(name):
+   full = solve(INSTANCES[name])
+   reduced = solve(INSTANCES[name], presolve=True)
+   assert full.status == reduced.status == 0
+   assert reduced.solution.objective == pytest.approx(full.solution.objective, abs=1e-6)
+   assert reduced.OPERATIONS < full.OPERATIONS
+
+
+
+@needs_scip
+@pytest.mark.parametrize('doug', [3, 5])
+def test_dominated_recipe_keeps_optimum(doug):
+   # Pillow "substituting" its DougTime with as much (equivalent) or more
+   # (dominated) DougTime, on an instance that makes pillows
+   data = small_data({('Pillow', 'Store', '5-Dec'): 4}, prices={('Pillow', 'Store'): 500})
+   data['sub_usage'] = {**data['sub_usage'], ('Pillow', 'DougTime', 'DougTime'): doug}
+   full = solve(data)
+   reduced = solve(data, presolve=True)
+   assert reduced.replaced == {'Make_Pillow_with_DougTime': 'Make_Pillow'}
+   assert 'Make_Pillow_with_DougTime' not in reduced.OPERATIONS
+   assert full.status == reduced.status == 0
+   assert reduced.solution.objective == pytest.approx(full.solution.objective, abs=1e-6)
+   assert any(op == 'Make_Pillow' for (t, op) in reduced.solution.plan)
+
+def test_set_supply_refuses_to_revive():
+   model = model_from_data(INSTANCES['bags'], 'SCIP', presolve=True)
+   assert 'FabricBundle' not in model.RESOURCE
+   with pytest.raises(ValueError, match='rebuild'):
+       model.set_supply('FabricBundle', '3-Dec', 5)
+   # no JaneyTime on the first day, so her recipes were fixed to 0 there
+   assert ('3-Dec', 'Make_Bag_with_JaneyTime') in model.dead
+   with pytest.raises(ValueError, match='Make_Bag_with_JaneyTime in 3-Dec'):
+       model.set_supply('JaneyTime', '3-Dec', 10)
+
+
+def test_set_supply_inside_presolve():
+   model = model_from_data(INSTANCES['bags'], 'SCIP', presolve=True)
+   qty = model.supply.get(('Casing', '3-Dec'), 0)
+   model.set_supply('Casing', '3-Dec', qty + 10)
+   assert model.supply['Casing', '3-Dec'] == qty + 10
+   model.set_supply('Casing', '3-Dec', 0)  # less never needs a rebuild
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from conftest import EXACT, INSTANCES, needs_scip
+from hw10_benchmark import PHASES
+from hw10_model import model_from_data
+from hw10_profile import Profile
+
+
+def test_phase_adds_up():
+   seen = []
+   profile = Profile(callback=lambda name, entry: seen.append((name, entry)))
+   for n in (1, 2):
+       with profile.phase('build') as ph:
+           ph['rows'] = n
+   with pytest.raises(KeyError):
+       with profile.phase('solve'):
+           raise KeyError('x')
+   # a second call adds its time, the counts are the last ones reported
+   assert profile.phases['build']['calls'] == 2 and profile.phases['build']['rows'] == 2
+   assert profile.phases['solve']['calls'] == 1
+   assert profile.timings()['build'] == profile.phases['build']['time'] > 0
+   assert [(name, e['calls']) for name, e in seen] == [('build', 1), ('build', 2), ('solve', 1)]
+   # the callback gets copies
+   assert seen[0][1]['rows'] == 1 and seen[0][1] is not profile.phases['build']
+
+
+def test_phase_json(tmp_path):
+   profile = Profile()
+   with profile.phase('build') as ph:
+       ph['rows'] = 3
+   path = tmp_path / 'profile.json'
+   assert json.loads(profile.to_json(str(path))) == json.loads(path.read_text()) == profile.to_dict()
+
+
+@needs_scip
+def test_model_profile():
+   seen = []
+   profile = Profile(callback=lambda name, entry: seen.append(name))
+   model = model_from_data(INSTANCES['round_trip'], 'SCIP', EXACT, profile=profile)
+   model.solve()
+   phases = profile.to_dict()
+   # one entry per phase, in the order they ran
+   assert seen == list(phases) == [p for p in PHASES if p in phases]
+   assert {'data_to_op', 'params', 'index', 'variables', 'R_Balance', 'objective',
+           'solve', 'extract'} <= set(phases)
+   assert model.timings == profile.timings()
+
+
+   # what each phase reports is what it built
+   v = phases['variables']
+   assert sum(v[k] for k in ('Scrap', 'Stock', 'z_int', 'z_bool', 'BinOp')) == model.solver.NumVariables()
+   assert phases['R_Balance']['rows'] == len(model.constraints['R_Balance'])
+   assert phases['LimitScrap']['rows'] == len(model.constraints['LimitScrap'])
+   assert phases['ForceBinOp']['rows'] == (len(model.constraints['ForceBinOp'])
+                                           + len(model.constraints['ForceMinOp']))
+   assert phases['solve']['status'] == model.status
+   assert phases['solve']['objective'] == model.solution.objective
+   assert phases['extract']['values'] == model.solver.NumVariables()
@@ -0,0 +1,52 @@
+import pytest
+
+import hw10_data_orig
+from conftest import INSTANCES, canonical, needs_scip, proto_of, small_data, solve
+from hw10_model import load_data, model_from_data
+
+
+def changed(data, demand, prices):
+   # the data set a replan with these changes should amount to
+   new = dict(data, demand={**data['demand'], **demand})
+   new['baseprice'] = {**data['baseprice'], **prices}
+   return new
+
+
+@pytest.mark.parametrize('tighten', [False, True])
+def test_replan_edits_match_a_build(tighten):
+   data = load_data(hw10_data_orig)
+   demand = {('Pillow', 'Store', '8-Dec'): 9, ('LargeMMeshBed', 'Store', '5-Dec'): 0}
+   prices = {('Bag', 'DogShow'): 60, ('Pillow', 'Online'): 33}
+   model = model_from_data(data, 'SCIP', tighten_bigm=tighten)
+   model.set_demand(demand, refresh=False)
+   model.set_prices(prices, refresh=False)
+   model._refresh_bounds()
+   fresh = model_from_data(changed(data, demand, prices), 'SCIP', tighten_bigm=tighten)
+   assert canonical(proto_of(model)) == canonical(proto_of(fresh))
+
+
+@needs_scip
+@pytest.mark.parametrize('opts', [{'tighten_bigm': False}, {}, {'presolve': True},
+                                 {'assembly': 'sparse'}])
+def test_replan_matches_rebuild(opts):
+   # priced so the pillows ship, before and after
+   data = small_data({('Pillow', 'Store', '5-Dec'): 4}, prices={('Pillow', 'Store'): 500})
+   demand = {('Pillow', 'Store', '5-Dec'): 2, ('Pillow', 'Store', '6-Dec'): 3}
+   prices = {('Pillow', 'Store'): 400}
+   model = solve(data, **opts)
+   before = model.solution.objective
+   assert model.replan(demand, prices) == 0
+   rebuilt = solve(changed(data, demand, prices), **opts)
+   assert rebuilt.status == 0
+   assert model.solution.objective == pytest.approx(rebuilt.solution.objective, abs=1e-6)
+   assert model.solution.objective != pytest.approx(before)
+
+
+def test_set_demand_needs_a_rebuild():
+   model = model_from_data(INSTANCES['bags'], 'SCIP', presolve=True)
+   # Bag is only ordered for 6-Dec, presolve dropped the earlier ships
+   assert ('3-Dec', 'Ship_Store_Bag') in model.dead
+   with pytest.raises(KeyError, match='removed by presolve in period 3-Dec'):
+       model.set_demand({('Bag', 'Store', '3-Dec'): 1})
+   with pytest.raises(KeyError, match='rebuild it to add one'):
+       model.set_demand({('Bag', 'Online', '6-Dec'): 1})
@@ -0,0 +1,50 @@
+import pytest
+
+from conftest import EXACT, INSTANCES, needs_scip, small_data
+from hw10_model import model_from_data
+from hw10_rolling import rolling_horizon, window_data
+
+
+@needs_scip
+def test_stitched_plan_feasible():
+   # pillows made on one day and shipped the next cross the window edges
+   data = small_data({('Pillow', 'Store', '5-Dec'): 4, ('Pillow', 'Store', '7-Dec'): 3},
+                     prices={('Pillow', 'Store'): 500})
+   result = rolling_horizon(data, W=3, K=2, backend='SCIP', solver_opts=EXACT, monolithic=True)
+   assert [w['start'] for w in result['windows']] == ['3-Dec', '5-Dec', '7-Dec']
+   assert all(w['status'] == 0 for w in result['windows'])
+   # objective is the stitched plan scored in the full model, None if infeasible
+   assert result['objective'] is not None
+   assert result['loss'] >= -1e-6
+   assert any(op.startswith('Ship_') for (t, op) in result['plan'])
+
+
+
+def test_window_carries_backlog_and_stock():
+   data = INSTANCES['bags']
+   wdata = window_data(data, 2, 3, {('Fleece', '5-Dec'): 10, ('Fleece', '3-Dec'): 99},
+                       {('Pillow', 'Online'): 3}, 1234.5)
+   assert wdata['TIME'] == ['5-Dec', '6-Dec', '7-Dec'] and wdata['init_funds'] == 1234.5
+   # the backlog comes due on the first day, stock before the window is dropped
+   assert wdata['demand'] == {('Bag', 'Store', '6-Dec'): 2, ('Pillow', 'Online', '5-Dec'): 3}
+   assert wdata['supply'][('Fleece', '5-Dec')] == data['supply'].get(('Fleece', '5-Dec'), 0) + 10
+   assert not any(t == '3-Dec' for (r, t) in wdata['supply'])
+   assert all(len(mb) == 3 for mb in wdata['max_buy'].values())
+
+def test_bad_commit_length():
+   with pytest.raises(ValueError):
+       rolling_horizon(INSTANCES['bags'], W=2, K=3)
+
+
+@pytest.mark.parametrize('assembly', ['scalar', 'sparse'])
+def test_either_or_without_friday(assembly):
+   # a horizon without the friday label: no either/or rows on their own,
+   # every day as a rolling window
+   data = dict(INSTANCES['bags'], friday='1-Dec')
+   alone = model_from_data(data, 'SCIP', assembly=assembly)
+   window = model_from_data(data, 'SCIP', assembly=assembly, window=True)
+   assert not alone.constraints['Doug_EitherOr']
+   assert sorted(window.constraints['Doug_EitherOr']) == sorted(data['TIME'])
+   with_friday = model_from_data(INSTANCES['bags'], 'SCIP', assembly=assembly, window=True)
+   assert sorted(with_friday.constraints['Doug_EitherOr']) == sorted(
+       set(data['TIME']) - {INSTANCES['bags']['friday']})
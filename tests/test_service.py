@@ -0,0 +1,24 @@
+import asyncio
+import time
+
+import hw10_data_orig
+from conftest import needs_scip
+from hw10_model import load_data
+from hw10_service import PlanningService
+
+
+@needs_scip
+def test_cancel_stops_anytime_plan():
+   # the full sample data doesn't solve in 40 s, so only the cancel ends it
+   async def run():
+       async with PlanningService(1, processes=False) as svc:
+           task = asyncio.ensure_future(svc.plan(load_data(hw10_data_orig), 'SCIP', time_budget=40))
+           await asyncio.sleep(3)
+           start = time.perf_counter()
+           task.cancel()
+           try:
+               await task
+           except asyncio.CancelledError:
+               pass
+           return time.perf_counter() - start
+   assert asyncio.run(run()) < 5
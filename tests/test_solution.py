@@ -0,0 +1,28 @@
+import pytest
+
+from conftest import needs_scip, small_data, solve
+
+
+@needs_scip
+def test_kpis_match_the_solver():
+   model = solve(small_data({('Pillow', 'Store', '5-Dec'): 4, ('Pillow', 'Online', '4-Dec'): 2},
+                            prices={('Pillow', 'Store'): 500}))
+   # summed straight from the variables, the way the report used to do it
+   revenue = spend = 0.0
+   for (t, op), var in model.z.items():
+       qty = var.solution_value()
+       if qty <= 1e-6:
+           continue
+       if op.startswith('Ship_'):
+           _, cust, item = op.split('_', 2)
+           revenue += (qty * model.mult[cust] * model.baseprice.get((item, cust), 0.0)
+                       * (1.0 - model.p_disc) ** model.TIME.index(t))
+       if (op, 'Money') in model.BOR:
+           spend += qty * model.usage_param[op, 'Money']
+   kpis = model.solution.kpis
+   assert revenue > 0 and spend > 0
+   assert kpis == pytest.approx({'objective': model.solver.Objective().Value(),
+                                 'final_money': model.Stock[model.TIME[-1], 'Money'].solution_value(),
+                                 'revenue': revenue,
+                                 'spend': spend,
+                                 'profit': revenue - spend})
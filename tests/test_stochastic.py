@@ -0,0 +1,39 @@
+import pytest
+from ortools.linear_solver import pywraplp
+
+from conftest import INSTANCES, needs_scip
+from hw10_stochastic import progressive_hedging, sample_scenarios
+
+
+def hedge(sub_time, **kwargs):
+   # identical scenarios, proven ones agree right away
+   data = INSTANCES['round_trip']
+   return progressive_hedging(data, sample_scenarios(data, 2, cv=0), iterations=1,
+                              sub_time=sub_time, bound=False, processes=False,
+                              backend='SCIP', solver_opts={'gap': 0}, **kwargs)
+
+
+@needs_scip
+def test_agreement_of_incumbents_is_not_convergence():
+   # time-limited incumbents may or may not agree, only proven agreement stops
+   result = hedge(0.3)
+   for entry in result['history']:
+       proven = all(s == pywraplp.Solver.OPTIMAL for s in entry['statuses'])
+       stops = entry['spread'] <= 1.0 and proven
+       assert stops == (result['converged'] and entry is result['history'][-1])
+
+
+@needs_scip
+def test_sub_gap_accepts_incumbents():
+   result = hedge(0.3, sub_gap=float('inf'))
+   agreed = [entry['spread'] <= 1.0 for entry in result['history']]
+   assert result['converged'] == any(agreed)
+   assert not any(agreed[:-1])
+
+
+@needs_scip
+def test_converged_when_proven():
+   result = hedge(60)
+   assert result['converged']
+   assert result['history'][0]['statuses'] == [pywraplp.Solver.OPTIMAL] * 2
+   assert result['history'][0]['gaps'] == pytest.approx([0, 0], abs=1e-6)